@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Notification
+from .models import Notification, UserNotificationState
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
@@ -10,3 +10,9 @@ class NotificationAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('recipient', 'sender')
+
+@admin.register(UserNotificationState)
+class UserNotificationStateAdmin(admin.ModelAdmin):
+    list_display = ['user', 'unread_count', 'reconciled_at']
+    search_fields = ['user__username']
+    readonly_fields = ['unread_count', 'reconciled_at']
@@ -3,6 +3,7 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
 from .models import Notification
+from .counters import get_unread_count, mark_all_read, mark_object_read
 
 class NotificationConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -45,6 +46,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             await self.mark_notification_as_read(notification_id)
         elif message_type == 'mark_all_as_read':
             await self.mark_all_as_read()
+        elif message_type == 'mark_object_as_read':
+            await self.mark_object_as_read(data.get('object_id'))
 
     # Receive message from room group
     async def notification_message(self, event):
@@ -52,7 +55,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def get_unread_count(self):
-        return Notification.objects.filter(recipient=self.user, is_read=False).count()
+        return get_unread_count(self.user.id)
 
     @database_sync_to_async
     def mark_notification_as_read(self, notification_id):
@@ -65,8 +68,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def mark_all_as_read(self):
-        unread_notifications = Notification.objects.filter(recipient=self.user, is_read=False)
-        count = unread_notifications.count()
-        for notification in unread_notifications:
-            notification.mark_as_read()
-        return count
+        return mark_all_read(self.user.id)
+
+    @database_sync_to_async
+    def mark_object_as_read(self, object_id):
+        return mark_object_read(self.user.id, object_id)
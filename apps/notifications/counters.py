@@ -0,0 +1,148 @@
+"""
+Per-user unread notification counters.
+
+UserNotificationState.unread_count is adjusted with F() updates whenever notifications are
+created or read, so pushes, WebSocket connects and the notification list never run a COUNT.
+A user without a row gets one initialized from a real count on first read. Paths that bypass
+these helpers (deleting unread notifications from the admin, raw SQL) can leave drift behind;
+reconcile_unread_counts repairs it periodically.
+
+"Mark all as read" only moves the user's notifications_read_through watermark: a notification
+is unread when it is not individually read and was created after the watermark.
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Notification, UserNotificationState
+import logging
+
+logger = logging.getLogger(__name__)
+
+def unread_notifications():
+    """Notifications not individually read and newer than their recipient's read watermark"""
+    return Notification.objects.filter(is_read=False).filter(
+        Q(recipient__notification_state__notifications_read_through__isnull=True) |
+        Q(created_at__gt=F('recipient__notification_state__notifications_read_through'))
+    )
+
+def count_unread(user_ids):
+    """Real unread totals per user id, in one grouped query"""
+    counts = dict.fromkeys(user_ids, 0)
+    counts.update(
+        unread_notifications().filter(recipient_id__in=user_ids)
+        .values('recipient_id')
+        .annotate(count=Count('id'))
+        .values_list('recipient_id', 'count')
+    )
+    return counts
+
+def get_unread_counts(user_ids):
+    """Unread totals per user id from the counters, initializing missing rows from a real count"""
+    user_ids = set(user_ids)
+    counts = dict(
+        UserNotificationState.objects.filter(user_id__in=user_ids).values_list('user_id', 'unread_count')
+    )
+    missing = user_ids - counts.keys()
+    if missing:
+        counts.update(initialize_unread_counts(missing))
+    return counts
+
+def initialize_unread_counts(user_ids):
+    """
+    Creates the counter rows of `user_ids` and sets them from a real count. The rows exist and
+    are locked before counting: an adjustment committed earlier is part of the count, a later
+    one waits for the lock and applies on top of it. Writers insert (or mark read) and adjust
+    in one transaction, so a counted notification is never adjusted twice.
+    """
+    with transaction.atomic():
+        UserNotificationState.objects.bulk_create(
+            [UserNotificationState(user_id=user_id, unread_count=0) for user_id in user_ids],
+            ignore_conflicts=True
+        )
+        list(UserNotificationState.objects.select_for_update().filter(user_id__in=user_ids).values_list('pk'))
+        counts = count_unread(user_ids)
+
+        user_ids_by_count = defaultdict(list)
+        for user_id, count in counts.items():
+            user_ids_by_count[count].append(user_id)
+        for count, ids in user_ids_by_count.items():
+            UserNotificationState.objects.filter(user_id__in=ids).update(unread_count=count)
+    return counts
+
+def get_unread_count(user_id):
+    return get_unread_counts([user_id])[user_id]
+
+def adjust_unread_counts(deltas):
+    """
+    Applies {user_id: delta} to the counters with one UPDATE per distinct delta. Users without a
+    row are skipped: their first read counts the notifications that already exist. Call it in
+    the same transaction as the change it accounts for (see initialize_unread_counts).
+    """
+    user_ids_by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            user_ids_by_delta[delta].append(user_id)
+
+    for delta, user_ids in user_ids_by_delta.items():
+        UserNotificationState.objects.filter(user_id__in=user_ids).update(
+            unread_count=Greatest(F('unread_count') + delta, 0)
+        )
+
+def mark_all_read(user_id, now=None):
+    """
+    Marks every notification of the user as read by moving the read watermark: a single-row
+    update, however many notifications are unread. Returns how many were unread.
+    """
+    now = now or timezone.now()
+    unread_count = get_unread_count(user_id)
+    UserNotificationState.objects.filter(user_id=user_id).update(notifications_read_through=now, unread_count=0)
+    return unread_count
+
+def mark_object_read(user_id, object_id):
+    """Marks the user's unread notifications about one object (e.g. a ticket) as read with one UPDATE"""
+    with transaction.atomic(savepoint=False):
+        updated = unread_notifications().filter(recipient_id=user_id, object_id=object_id).update(
+            is_read=True, read_at=timezone.now()
+        )
+        adjust_unread_counts({user_id: -updated})
+    return updated
+
+def reconcile_unread_counts(batch_size=None):
+    """
+    Compares every counter with a real count, in chunks of `batch_size`
+    (NOTIFICATION_RECONCILE_BATCH_SIZE), and repairs the ones that drifted.
+    Returns the number of counters repaired.
+    """
+    batch_size = batch_size or getattr(settings, 'NOTIFICATION_RECONCILE_BATCH_SIZE', 1000)
+    now = timezone.now()
+    repaired_count = 0
+    last_user_id = 0
+
+    while True:
+        chunk = dict(
+            UserNotificationState.objects.filter(user_id__gt=last_user_id)
+            .order_by('user_id')
+            .values_list('user_id', 'unread_count')[:batch_size]
+        )
+        if not chunk:
+            break
+        last_user_id = max(chunk)
+
+        for user_id, count in count_unread(chunk.keys()).items():
+            if count == chunk[user_id]:
+                continue
+            # Only if the counter did not move meanwhile; otherwise the next run checks it again
+            repaired = UserNotificationState.objects.filter(user_id=user_id, unread_count=chunk[user_id]).update(
+                unread_count=count, reconciled_at=now
+            )
+            if repaired:
+                logger.warning(f"Unread counter for user {user_id} drifted: {chunk[user_id]} -> {count}")
+                repaired_count += 1
+
+        if len(chunk) < batch_size:
+            break
+
+    return repaired_count
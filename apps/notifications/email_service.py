@@ -182,6 +182,29 @@ class EmailService:
         except Exception as e:
             logger.error(f"Error sending escalation warning email: {e}")
     
+    @staticmethod
+    def send_escalation_warning_digest(user, warnings):
+        """Send a single email listing every ticket about to escalate for this user"""
+        if not settings.EMAIL_NOTIFICATIONS_ENABLED or not warnings:
+            return
+            
+        try:
+            subject = (
+                f'⚠️ Ticket será escalado pronto: {warnings[0]["title"]}' if len(warnings) == 1
+                else f'⚠️ {len(warnings)} tickets serán escalados pronto'
+            )
+            EmailService._send_email_to_user(
+                user=user,
+                template_name='emails/escalation_warning_digest',
+                subject=subject,
+                context={
+                    'warnings': warnings,
+                    'user': user
+                }
+            )
+        except Exception as e:
+            logger.error(f"Error sending escalation warning digest: {e}")
+    
     @staticmethod
     def send_escalation_notification_email(ticket, escalation_rule, previous_assigned):
         """Send email when ticket is escalated"""
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('ticket_created', 'Ticket Creado'), ('ticket_assigned', 'Ticket Asignado'), ('ticket_updated', 'Ticket Actualizado'), ('ticket_closed', 'Ticket Cerrado'), ('ticket_reopened', 'Ticket Reabierto'), ('comment_added', 'Comentario Agregado'), ('ticket_escalated', 'Ticket Escalado'), ('sla_breach', 'SLA Incumplido'), ('system', 'Sistema')], max_length=20),
+        ),
+    ]
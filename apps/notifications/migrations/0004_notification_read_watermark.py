@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_usernotificationstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usernotificationstate',
+            name='notifications_read_through',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'object_id'], name='notification_recipient_obj_idx'),
+        ),
+    ]
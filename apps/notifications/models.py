@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings  # Added settings import
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -12,6 +12,7 @@ class Notification(models.Model):
         ('ticket_reopened', 'Ticket Reabierto'),
         ('comment_added', 'Comentario Agregado'),
         ('ticket_escalated', 'Ticket Escalado'),  # Agregado tipo de notificación para escalamiento
+        ('sla_breach', 'SLA Incumplido'),
         ('system', 'Sistema'),
     ]
     
@@ -33,13 +34,53 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=['recipient', '-created_at']),
             models.Index(fields=['is_read']),
+            # Bulk "mark read by object" for one recipient
+            models.Index(fields=['recipient', 'object_id'], name='notification_recipient_obj_idx'),
         ]
     
     def __str__(self):
         return f"{self.recipient.username} - {self.verb}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Loaded read state, so saves that toggle is_read can adjust the unread counter
+        if 'is_read' not in instance.get_deferred_fields():
+            instance._loaded_is_read = instance.is_read
+        return instance
+    
+    @property
+    def is_unread(self):
+        """Not individually read and newer than the recipient's read watermark (annotated as read_through)"""
+        read_through = getattr(self, 'read_through', None)
+        return not self.is_read and (read_through is None or self.created_at > read_through)
+    
     def mark_as_read(self):
-        if not self.is_read:
-            self.is_read = True
-            self.read_at = timezone.now()
-            self.save()
+        """Marks the notification as read with a conditional update; returns True if it was unread"""
+        from .counters import adjust_unread_counts, unread_notifications
+        
+        if self.is_read:
+            return False
+        self.is_read = True
+        self.read_at = timezone.now()
+        self._loaded_is_read = True
+        # Notifications behind the read watermark are already read: no counter change
+        with transaction.atomic(savepoint=False):
+            updated = unread_notifications().filter(pk=self.pk).update(is_read=True, read_at=self.read_at)
+            if updated:
+                adjust_unread_counts({self.recipient_id: -1})
+        return bool(updated)
+
+class UserNotificationState(models.Model):
+    """
+    Per-user notification counters, updated atomically with F() expressions so unread totals
+    never need a COUNT. Rows are created lazily from a real count and repaired periodically.
+    Notifications created up to notifications_read_through count as read ("mark all as read").
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='notification_state')
+    unread_count = models.IntegerField(default=0)
+    notifications_read_through = models.DateTimeField(null=True, blank=True)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.unread_count} unread"
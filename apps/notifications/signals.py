@@ -0,0 +1,22 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import Notification
+from .counters import adjust_unread_counts
+
+@receiver(post_save, sender=Notification)
+def update_unread_count_on_save(sender, instance, created, raw=False, **kwargs):
+    """Keeps the recipient's unread counter in step with single-row creates and is_read changes"""
+    if raw:
+        return
+    
+    if created:
+        delta = 0 if instance.is_read else 1
+    elif hasattr(instance, '_loaded_is_read'):
+        delta = int(instance.is_read is False) - int(instance._loaded_is_read is False)
+    else:
+        # Unknown previous state: left to reconcile_unread_counts
+        delta = 0
+    instance._loaded_is_read = instance.is_read
+    
+    if delta:
+        adjust_unread_counts({instance.recipient_id: delta})
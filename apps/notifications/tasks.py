@@ -1,10 +1,13 @@
 from celery import shared_task
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+from django.db.models import F, Q
 from datetime import timedelta
+from collections import Counter
 from .models import Notification
 from .email_service import EmailService
 from apps.tickets.models import Ticket, EscalationRule, EscalationLog
+from apps.tickets.locks import single_instance
 import logging
 
 logger = logging.getLogger(__name__)
@@ -57,6 +60,15 @@ def send_email_notification_async(notification_type, **kwargs):
             escalation_rule = EscalationRule.objects.get(id=escalation_rule_id)
             EmailService.send_escalation_warning_email(ticket, escalation_rule, time_remaining)
             
+        elif notification_type == 'escalation_warning_digest':
+            # One task per run of apps.tickets.escalation_warnings.send_escalation_warnings
+            digests = kwargs.get('digests', [])
+            recipients = User.objects.in_bulk([digest['recipient_id'] for digest in digests])
+            for digest in digests:
+                recipient = recipients.get(digest['recipient_id'])
+                if recipient:
+                    EmailService.send_escalation_warning_digest(recipient, digest['warnings'])
+            
         elif notification_type == 'ticket_escalated':
             ticket_id = kwargs.get('ticket_id')
             escalation_rule_id = kwargs.get('escalation_rule_id')
@@ -72,6 +84,17 @@ def send_email_notification_async(notification_type, **kwargs):
             ticket = Ticket.objects.get(id=ticket_id)
             EmailService.send_sla_breach_notification(ticket, sla_info)
             
+        elif notification_type == 'sla_breaches':
+            # One task per batch of breaches detected by apps.tickets.sla.detect_sla_breaches
+            breaches = kwargs.get('breaches', [])
+            tickets = Ticket.objects.select_related('assigned_to', 'company').in_bulk(
+                [breach['ticket_id'] for breach in breaches]
+            )
+            for breach in breaches:
+                ticket = tickets.get(breach['ticket_id'])
+                if ticket:
+                    EmailService.send_sla_breach_notification(ticket, breach['sla_info'])
+            
         logger.info(f"Email notification sent successfully: {notification_type}")
         
     except Exception as e:
@@ -79,15 +102,66 @@ def send_email_notification_async(notification_type, **kwargs):
         raise
 
 @shared_task
+def create_notifications_batch(notifications):
+    """
+    Creates a batch of notifications (dicts with recipient_id, notification_type, verb,
+    description and object_id) with one insert, then pushes them over WebSocket in one
+    pipelined round
+    """
+    from .counters import adjust_unread_counts
+    from .utils import send_real_time_notifications
+    
+    recipient_ids = set(User.objects.filter(id__in={item['recipient_id'] for item in notifications}).values_list('id', flat=True))
+    objects = [
+        Notification(
+            recipient_id=item['recipient_id'],
+            notification_type=item['notification_type'],
+            verb=item['verb'],
+            description=item.get('description'),
+            object_id=item.get('object_id'),
+        )
+        for item in notifications
+        if item['recipient_id'] in recipient_ids
+    ]
+    created = Notification.objects.bulk_create(objects)
+    adjust_unread_counts(Counter(notification.recipient_id for notification in created))
+    
+    send_real_time_notifications(created)
+    
+    logger.info(f"Created {len(created)} notifications in batch")
+    return len(created)
+
+@shared_task
+@single_instance()
+def reconcile_unread_notification_counts():
+    """
+    Repairs per-user unread counters that drifted from the real unread totals
+    """
+    from .counters import reconcile_unread_counts
+    
+    try:
+        repaired_count = reconcile_unread_counts()
+        
+        logger.info(f"Reconciled {repaired_count} unread notification counters")
+        return f"Reconciled {repaired_count} unread notification counters"
+        
+    except Exception as e:
+        logger.error(f"Error reconciling unread notification counters: {e}")
+        raise
+
+@shared_task
+@single_instance()
 def cleanup_old_notifications():
     """
     Clean up old notifications (older than 30 days)
     """
     try:
         cutoff_date = timezone.now() - timedelta(days=30)
-        deleted_count = Notification.objects.filter(
-            created_at__lt=cutoff_date,
-            is_read=True
+        # Only read notifications (individually or behind the read watermark) are removed,
+        # so the unread counters are unaffected
+        deleted_count = Notification.objects.filter(created_at__lt=cutoff_date).filter(
+            Q(is_read=True) |
+            Q(created_at__lte=F('recipient__notification_state__notifications_read_through'))
         ).delete()[0]
         
         logger.info(f"Cleaned up {deleted_count} old notifications")
@@ -98,6 +172,7 @@ def cleanup_old_notifications():
         raise
 
 @shared_task
+@single_instance()
 def send_daily_summary():
     """
     Send daily summary emails to administrators
@@ -128,54 +203,16 @@ def send_daily_summary():
         raise
 
 @shared_task
+@single_instance()
 def send_escalation_warnings():
     """
-    Envía advertencias antes de que ocurra el escalamiento
-    Se ejecuta cada 30 minutos para verificar tickets próximos a escalar
+    Sends pre-escalation warnings for tickets within their rule's warning lead time
+    Runs every 30 minutes; see apps.tickets.escalation_warnings
     """
+    from apps.tickets.escalation_warnings import send_escalation_warnings as warn_upcoming_escalations
+
     try:
-        now = timezone.now()
-        warning_time = now + timedelta(hours=1)  # Advertir 1 hora antes
-        
-        # Buscar tickets que escalarán en la próxima hora
-        tickets_to_warn = Ticket.objects.filter(
-            status__in=['OPEN', 'IN_PROGRESS'],
-            escalation_paused=False,
-            next_escalation_at__lte=warning_time,
-            next_escalation_at__gt=now,
-            escalation_warning_sent=False
-        ).select_related('company', 'assigned_to')
-        
-        warned_count = 0
-        
-        for ticket in tickets_to_warn:
-            try:
-                # Obtener la regla de escalamiento
-                from apps.tickets.tasks import get_escalation_rule
-                next_level = ticket.escalation_level + 1
-                escalation_rule = get_escalation_rule(ticket, next_level)
-                
-                if escalation_rule:
-                    time_remaining = ticket.next_escalation_at - now
-                    
-                    # Enviar advertencia por email
-                    send_email_notification_async.delay(
-                        'escalation_warning',
-                        ticket_id=ticket.id,
-                        escalation_rule_id=escalation_rule.id,
-                        time_remaining=str(time_remaining)
-                    )
-                    
-                    # Marcar como advertencia enviada
-                    ticket.escalation_warning_sent = True
-                    ticket.save()
-                    
-                    warned_count += 1
-                    
-            except Exception as e:
-                logger.error(f"Error enviando advertencia para ticket {ticket.reference}: {e}")
-        
-        logger.info(f"Enviadas {warned_count} advertencias de escalamiento")
+        warned_count = warn_upcoming_escalations()
         return f"Enviadas {warned_count} advertencias"
         
     except Exception as e:
@@ -183,6 +220,7 @@ def send_escalation_warnings():
         raise
 
 @shared_task
+@single_instance()
 def send_escalation_summary_reports():
     """
     Envía reportes de resumen de escalamientos a los administradores
@@ -270,53 +308,16 @@ def send_escalation_summary_reports():
         raise
 
 @shared_task
+@single_instance()
 def check_sla_breaches():
     """
-    Verifica tickets que han incumplido SLA y envía notificaciones
+    Flags tickets whose SLA due time has passed and notifies them in batches.
+    Due times come from the SLA policies (apps/tickets/sla.py)
     """
+    from apps.tickets.sla import detect_sla_breaches
+    
     try:
-        now = timezone.now()
-        breached_count = 0
-        
-        # Buscar tickets que han superado el tiempo de SLA
-        # Esto es un ejemplo básico, puedes ajustar según tus reglas de SLA
-        sla_hours = {
-            'CRITICAL': 2,
-            'HIGH': 8,
-            'MEDIUM': 24,
-            'LOW': 72
-        }
-        
-        for priority, hours in sla_hours.items():
-            sla_deadline = now - timedelta(hours=hours)
-            
-            breached_tickets = Ticket.objects.filter(
-                priority=priority,
-                status__in=['OPEN', 'IN_PROGRESS'],
-                created_at__lt=sla_deadline,
-                sla_breach_notified=False
-            )
-            
-            for ticket in breached_tickets:
-                sla_info = {
-                    'priority': priority,
-                    'sla_hours': hours,
-                    'breach_time': now - ticket.created_at,
-                    'created_at': ticket.created_at
-                }
-                
-                # Enviar notificación de incumplimiento de SLA
-                send_email_notification_async.delay(
-                    'sla_breach',
-                    ticket_id=ticket.id,
-                    sla_info=sla_info
-                )
-                
-                # Marcar como notificado
-                ticket.sla_breach_notified = True
-                ticket.save()
-                
-                breached_count += 1
+        breached_count = detect_sla_breaches()
         
         logger.info(f"Detectados {breached_count} incumplimientos de SLA")
         return f"Detectados {breached_count} incumplimientos de SLA"
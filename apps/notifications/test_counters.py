@@ -0,0 +1,74 @@
+"""
+Tests for the per-user unread notification counter
+"""
+from unittest import mock
+from django.test import TestCase
+from django.urls import reverse
+from apps.users.models import User
+from apps.notifications.counters import get_unread_count, reconcile_unread_counts
+from apps.notifications.models import Notification, UserNotificationState
+from apps.notifications.tasks import create_notifications_batch, cleanup_old_notifications
+from apps.notifications.utils import create_notifications_bulk
+
+
+class UnreadCounterTestCase(TestCase):
+    """Test that the counter follows creates, reads and mark-all, and that drift is repaired"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tech', password='x', role='TECHNICIAN')
+        self.other = User.objects.create_user(username='boss', password='x', role='SUPERADMIN')
+        patcher = mock.patch('apps.notifications.utils.get_channel_layer', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_counter_is_initialized_then_maintained(self):
+        """Test lazy initialization from a real count and F() updates afterwards"""
+        Notification.objects.create(recipient=self.user, notification_type='system', verb='Uno')
+        self.assertFalse(UserNotificationState.objects.exists())
+        self.assertEqual(get_unread_count(self.user.id), 1)
+
+        create_notifications_bulk([self.user, self.other], 'system', 'Dos')
+        create_notifications_batch([
+            {'recipient_id': self.user.id, 'notification_type': 'system', 'verb': 'Tres'},
+            {'recipient_id': self.user.id, 'notification_type': 'system', 'verb': 'Cuatro'},
+        ])
+        Notification.objects.create(recipient=self.user, notification_type='system', verb='Leída', is_read=True)
+        self.assertEqual(UserNotificationState.objects.get(user=self.user).unread_count, 4)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_unread_count(self.user.id), 4)
+
+    def test_reads_decrement_the_counter(self):
+        """Test mark as read (once), saving is_read and the mark-all view"""
+        get_unread_count(self.user.id)
+        notifications = create_notifications_bulk([self.user], 'system', 'Uno') + create_notifications_bulk([self.user], 'system', 'Dos')
+        create_notifications_bulk([self.user], 'system', 'Tres')
+
+        self.assertTrue(notifications[0].mark_as_read())
+        self.assertFalse(Notification.objects.get(pk=notifications[0].pk).mark_as_read())
+        self.assertEqual(get_unread_count(self.user.id), 2)
+
+        notification = Notification.objects.get(pk=notifications[1].pk)
+        notification.is_read = True
+        notification.save()
+        self.assertEqual(get_unread_count(self.user.id), 1)
+
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('notifications:mark_all_as_read'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_unread_count(self.user.id), 0)
+
+        cleanup_old_notifications()
+        self.assertEqual(get_unread_count(self.user.id), 0)
+
+    def test_reconciliation_repairs_drift(self):
+        """Test that drifted counters are reset to the real unread total"""
+        create_notifications_bulk([self.user, self.other], 'system', 'Uno')
+        get_unread_count(self.user.id)
+        get_unread_count(self.other.id)
+        UserNotificationState.objects.filter(user=self.user).update(unread_count=7)
+
+        self.assertEqual(reconcile_unread_counts(batch_size=1), 1)
+        self.assertEqual(get_unread_count(self.user.id), 1)
+        self.assertIsNotNone(UserNotificationState.objects.get(user=self.user).reconciled_at)
+        self.assertEqual(reconcile_unread_counts(), 0)
@@ -0,0 +1,65 @@
+"""
+Tests for bulk notification fan-out
+"""
+from unittest import mock
+from django.test import TestCase
+from apps.companies.models import Company
+from apps.users.models import User
+from apps.tickets.models import Ticket
+from apps.notifications.counters import get_unread_counts
+from apps.notifications.models import Notification
+from apps.notifications.utils import create_notifications_bulk, notify_ticket_created
+
+
+class NotificationFanoutTestCase(TestCase):
+    """Test one insert, one counter update and one round of channel sends per fan-out"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='Acme', slug='acme')
+        self.employee = User.objects.create_user(username='emp', password='x', company=self.company)
+        self.admin = User.objects.create_user(username='boss', password='x', role='COMPANY_ADMIN', company=self.company)
+        self.techs = [User.objects.create_user(username=f'tech{i}', password='x', role='TECHNICIAN') for i in range(3)]
+        self.superadmin = User.objects.create_user(username='root', password='x', role='SUPERADMIN')
+
+        self.channel_layer = mock.Mock()
+        self.channel_layer.group_send = mock.AsyncMock()
+        patcher = mock.patch('apps.notifications.utils.get_channel_layer', return_value=self.channel_layer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sent_unread_counts(self):
+        return {
+            call.args[0]: call.args[1]['unread_count']
+            for call in self.channel_layer.group_send.call_args_list
+        }
+
+    def test_bulk_create_and_grouped_unread_counts(self):
+        """Test a single insert and counter update, with per-recipient unread totals in the push"""
+        Notification.objects.create(recipient=self.admin, notification_type='system', verb='Anterior')
+        get_unread_counts([self.admin.id, self.techs[0].id])
+        recipients = [self.admin, self.techs[0].id, self.admin]
+
+        with self.assertNumQueries(3):
+            notifications = create_notifications_bulk(recipients, 'system', 'Aviso', sender=self.superadmin)
+
+        self.assertEqual([notification.recipient_id for notification in notifications], [self.admin.id, self.techs[0].id])
+        self.assertEqual(self.sent_unread_counts(), {
+            f'notifications_{self.admin.id}': 2,
+            f'notifications_{self.techs[0].id}': 1,
+        })
+        self.assertEqual(self.channel_layer.group_send.call_args.args[1]['notification']['sender'], 'root')
+
+    def test_notify_ticket_created_fans_out_in_bulk(self):
+        """Test that a new ticket notifies admins, technicians and superadmins with constant queries"""
+        with mock.patch('apps.notifications.utils.EmailService.send_ticket_created_email'), \
+                mock.patch('apps.tickets.tasks.dispatch_due_escalations.apply_async'):
+            ticket = Ticket.objects.create(
+                reference='TKT-1', title='Correo', description='d', company=self.company, created_by=self.employee
+            )
+            get_unread_counts(User.objects.values_list('id', flat=True))
+            with self.assertNumQueries(4):
+                notify_ticket_created(ticket)
+
+        expected = {self.admin.id, self.superadmin.id, *(tech.id for tech in self.techs)}
+        self.assertEqual(set(Notification.objects.filter(object_id=ticket.id).values_list('recipient_id', flat=True)), expected)
+        self.assertEqual(self.channel_layer.group_send.call_count, len(expected))
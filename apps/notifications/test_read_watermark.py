@@ -0,0 +1,100 @@
+"""
+Tests for the per-user read watermark and bulk mark-read by object
+"""
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from apps.users.models import User
+from apps.notifications import counters
+from apps.notifications.counters import get_unread_count, mark_all_read, mark_object_read, reconcile_unread_counts
+from apps.notifications.models import Notification
+from apps.notifications.tasks import cleanup_old_notifications
+from apps.notifications.utils import create_notifications_bulk
+
+
+class ReadWatermarkTestCase(TestCase):
+    """Test that mark-all moves a watermark and mark-by-object is one UPDATE"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tech', password='x', role='TECHNICIAN')
+        patcher = mock.patch('apps.notifications.utils.get_channel_layer', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        get_unread_count(self.user.id)
+
+    def notify(self, object_id=None, count=1):
+        return [
+            create_notifications_bulk([self.user], 'system', f'Aviso {i}', object_id=object_id)[0]
+            for i in range(count)
+        ]
+
+    def test_mark_all_is_a_single_row_update(self):
+        """Test constant queries regardless of how many notifications are unread"""
+        self.notify(count=5)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(mark_all_read(self.user.id), 5)
+
+        self.assertEqual(get_unread_count(self.user.id), 0)
+        self.assertEqual(Notification.objects.filter(is_read=False).count(), 5)
+        self.assertEqual(reconcile_unread_counts(), 0)
+
+    def test_unread_means_newer_than_watermark(self):
+        """Test reads behind the watermark, later notifications and the list flag"""
+        old = self.notify()[0]
+        mark_all_read(self.user.id)
+        self.assertFalse(Notification.objects.get(pk=old.pk).mark_as_read())
+
+        new = self.notify()[0]
+        Notification.objects.filter(pk=new.pk).update(created_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(get_unread_count(self.user.id), 1)
+        self.assertEqual(reconcile_unread_counts(), 0)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('notifications:notification_list'))
+        flags = {notification.pk: notification.is_unread for notification in response.context['object_list']}
+        self.assertEqual(flags, {old.pk: False, new.pk: True})
+
+    def test_mark_read_by_object(self):
+        """Test one UPDATE for every unread notification about an object"""
+        self.notify(object_id=42, count=3)
+        self.notify(object_id=7)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(mark_object_read(self.user.id, 42), 3)
+        self.assertEqual(get_unread_count(self.user.id), 1)
+
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('notifications:mark_object_as_read', args=[7]))
+        self.assertEqual(response.json(), {'status': 'success', 'count': 1, 'unread_count': 0})
+
+    def test_cleanup_removes_notifications_behind_watermark(self):
+        """Test that old notifications read through the watermark are cleaned up"""
+        old = self.notify()[0]
+        Notification.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=40))
+        unread_old = self.notify()[0]
+        Notification.objects.filter(pk=unread_old.pk).update(created_at=timezone.now() - timedelta(days=40))
+        mark_all_read(self.user.id, now=timezone.now() - timedelta(days=35))
+        Notification.objects.filter(pk=unread_old.pk).update(created_at=timezone.now() - timedelta(days=31))
+
+        cleanup_old_notifications()
+        self.assertEqual(list(Notification.objects.values_list('pk', flat=True)), [unread_old.pk])
+
+    def test_first_read_does_not_lose_a_concurrent_notification(self):
+        """Test a notification created while a missing counter row is being initialized"""
+        other = User.objects.create_user(username='other', password='x', role='TECHNICIAN')
+        create_notifications_bulk([other], 'system', 'Antes')
+        real_count_unread = counters.count_unread
+
+        def count_with_concurrent_notification(user_ids):
+            # The row already exists: this adjustment lands on it and the count includes the insert
+            create_notifications_bulk([other], 'system', 'Durante')
+            return real_count_unread(user_ids)
+
+        with mock.patch('apps.notifications.counters.count_unread', side_effect=count_with_concurrent_notification):
+            self.assertEqual(get_unread_count(other.id), 2)
+        create_notifications_bulk([other], 'system', 'Después')
+        self.assertEqual(get_unread_count(other.id), 3)
+        self.assertEqual(reconcile_unread_counts(), 0)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import NotificationListView, MarkAsReadView, MarkAllAsReadView
+from .views import NotificationListView, MarkAsReadView, MarkAllAsReadView, MarkObjectAsReadView
 
 app_name = 'notifications'
 
@@ -7,4 +7,5 @@ urlpatterns = [
     path('', NotificationListView.as_view(), name='notification_list'),
     path('mark-read/<int:notification_id>/', MarkAsReadView.as_view(), name='mark_as_read'),
     path('mark-all-read/', MarkAllAsReadView.as_view(), name='mark_all_as_read'),
+    path('mark-object-read/<int:object_id>/', MarkObjectAsReadView.as_view(), name='mark_object_as_read'),
 ]
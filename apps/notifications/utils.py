@@ -1,54 +1,104 @@
+from django.db import transaction
 from .models import Notification
+from .counters import adjust_unread_counts, get_unread_counts
 from .email_service import EmailService
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+import asyncio
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 def create_notification(recipient, notification_type, verb, sender=None, description=None, object_id=None):
     """
     Utility function to create notifications easily
     """
-    notification = Notification.objects.create(
-        recipient=recipient,
-        sender=sender,
-        notification_type=notification_type,
-        verb=verb,
-        description=description,
-        object_id=object_id
+    notifications = create_notifications_bulk(
+        [recipient], notification_type, verb,
+        sender=sender, description=description, object_id=object_id
     )
+    return notifications[0]
+
+def create_notifications_bulk(recipients, notification_type, verb, sender=None, description=None, object_id=None):
+    """
+    Creates the same notification for many recipients (users or user ids) with one insert,
+    one unread counter update and one pipelined round of WebSocket sends
+    """
+    recipient_ids = list(dict.fromkeys(getattr(recipient, 'pk', recipient) for recipient in recipients))
+    if not recipient_ids:
+        return []
+    
+    # Insert and counter update commit together (see counters.initialize_unread_counts)
+    with transaction.atomic(savepoint=False):
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                recipient_id=recipient_id,
+                sender=sender,
+                notification_type=notification_type,
+                verb=verb,
+                description=description,
+                object_id=object_id
+            )
+            for recipient_id in recipient_ids
+        ])
+        adjust_unread_counts(dict.fromkeys(recipient_ids, 1))
     
-    send_real_time_notification(notification)
+    send_real_time_notifications(notifications)
     
-    return notification
+    return notifications
 
 def send_real_time_notification(notification):
     """Send notification via WebSocket"""
+    send_real_time_notifications([notification])
+
+def send_real_time_notifications(notifications):
+    """
+    Send notifications via WebSocket: unread counts come from the per-user counters and all
+    group sends run concurrently in a single event loop round-trip
+    """
+    if not notifications:
+        return
+    
     channel_layer = get_channel_layer()
-    group_name = f"notifications_{notification.recipient.id}"
-    
-    # Get unread count for the user
-    unread_count = Notification.objects.filter(
-        recipient=notification.recipient, 
-        is_read=False
-    ).count()
-    
-    async_to_sync(channel_layer.group_send)(
-        group_name,
-        {
-            'type': 'notification_message',
-            'message_type': 'new_notification',
-            'notification': {
-                'id': notification.id,
-                'verb': notification.verb,
-                'description': notification.description,
-                'notification_type': notification.notification_type,
-                'sender': notification.sender.username if notification.sender else None,
-                'created_at': notification.created_at.isoformat(),
-                'is_read': notification.is_read,
-            },
-            'unread_count': unread_count
-        }
+    if channel_layer is None:
+        return
+    
+    unread_counts = get_unread_counts({notification.recipient_id for notification in notifications})
+    messages = [
+        (
+            f"notifications_{notification.recipient_id}",
+            {
+                'type': 'notification_message',
+                'message_type': 'new_notification',
+                'notification': {
+                    'id': notification.id,
+                    'verb': notification.verb,
+                    'description': notification.description,
+                    'notification_type': notification.notification_type,
+                    'sender': notification.sender.username if notification.sender_id else None,
+                    'created_at': notification.created_at.isoformat(),
+                    'is_read': notification.is_read,
+                },
+                'unread_count': unread_counts[notification.recipient_id]
+            }
+        )
+        for notification in notifications
+    ]
+    
+    try:
+        async_to_sync(_group_send_many)(channel_layer, messages)
+    except Exception as e:
+        logger.error(f"Error sending {len(messages)} real-time notifications: {e}")
+
+async def _group_send_many(channel_layer, messages):
+    results = await asyncio.gather(
+        *(channel_layer.group_send(group_name, message) for group_name, message in messages),
+        return_exceptions=True
     )
+    for (group_name, message), result in zip(messages, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error sending real-time notification to {group_name}: {result}")
 
 def notify_ticket_created(ticket, sender=None):
     """Create notification and send email when a ticket is created"""
@@ -67,22 +117,21 @@ def notify_ticket_created(ticket, sender=None):
         global_users = users_to_notify.filter(role__in=['TECHNICIAN', 'SUPERADMIN'])
         users_to_notify = company_users.union(global_users)
     
-    for user in users_to_notify:
-        create_notification(
-            recipient=user,
-            sender=sender or ticket.created_by,
-            notification_type='ticket_created',
-            verb=f'Nuevo ticket creado: {ticket.title}',
-            description=f'Se ha creado un nuevo ticket con prioridad {ticket.get_priority_display()}',
-            object_id=ticket.id
-        )
+    create_notifications_bulk(
+        users_to_notify.values_list('id', flat=True),
+        sender=sender or ticket.created_by,
+        notification_type='ticket_created',
+        verb=f'Nuevo ticket creado: {ticket.title}',
+        description=f'Se ha creado un nuevo ticket con prioridad {ticket.get_priority_display()}',
+        object_id=ticket.id
+    )
     
     EmailService.send_ticket_created_email(ticket)
 
 def notify_ticket_assigned(ticket, assigned_to, sender=None):
     """Create notification and send email when a ticket is assigned"""
-    create_notification(
-        recipient=assigned_to,
+    create_notifications_bulk(
+        [assigned_to],
         sender=sender,
         notification_type='ticket_assigned',
         verb=f'Te han asignado el ticket: {ticket.title}',
@@ -101,24 +150,22 @@ def notify_ticket_updated(ticket, sender=None):
     if ticket.assigned_to and ticket.assigned_to != ticket.created_by:
         users_to_notify.append(ticket.assigned_to)
     
-    for user in users_to_notify:
-        if user != sender:  # Don't notify the person who made the update
-            create_notification(
-                recipient=user,
-                sender=sender,
-                notification_type='ticket_updated',
-                verb=f'Ticket actualizado: {ticket.title}',
-                description=f'El ticket ha sido actualizado',
-                object_id=ticket.id
-            )
+    create_notifications_bulk(
+        [user for user in users_to_notify if user != sender],  # Don't notify the person who made the update
+        sender=sender,
+        notification_type='ticket_updated',
+        verb=f'Ticket actualizado: {ticket.title}',
+        description=f'El ticket ha sido actualizado',
+        object_id=ticket.id
+    )
     
     EmailService.send_ticket_updated_email(ticket, sender)
 
 def notify_ticket_resolved(ticket, sender=None):
     """Create notification and send email when a ticket is resolved"""
     if ticket.created_by and ticket.created_by != sender:
-        create_notification(
-            recipient=ticket.created_by,
+        create_notifications_bulk(
+            [ticket.created_by],
             sender=sender,
             notification_type='ticket_resolved',
             verb=f'Ticket resuelto: {ticket.title}',
@@ -140,15 +187,14 @@ def notify_message_added(ticket, message, sender):
     # Remove sender from participants
     users_to_notify.discard(sender)
     
-    for user in users_to_notify:
-        create_notification(
-            recipient=user,
-            sender=sender,
-            notification_type='message_added',
-            verb=f'Nuevo mensaje en: {ticket.title}',
-            description=f'{sender.get_full_name() or sender.username} agregó un mensaje',
-            object_id=ticket.id
-        )
+    create_notifications_bulk(
+        users_to_notify,
+        sender=sender,
+        notification_type='message_added',
+        verb=f'Nuevo mensaje en: {ticket.title}',
+        description=f'{sender.get_full_name() or sender.username} agregó un mensaje',
+        object_id=ticket.id
+    )
     
     EmailService.send_message_added_email(ticket, message, sender)
 
@@ -164,13 +210,14 @@ def notify_user_created(user, password=None, sender=None):
     if user.company:
         admins = admins.filter(company=user.company)
     
-    for admin in admins:
-        if admin != sender:
-            create_notification(
-                recipient=admin,
-                sender=sender,
-                notification_type='user_created',
-                verb=f'Nuevo usuario creado: {user.get_full_name() or user.username}',
-                description=f'Se ha creado una nueva cuenta de usuario',
-                object_id=user.id
-            )
+    if sender:
+        admins = admins.exclude(id=sender.id)
+    
+    create_notifications_bulk(
+        admins.values_list('id', flat=True),
+        sender=sender,
+        notification_type='user_created',
+        verb=f'Nuevo usuario creado: {user.get_full_name() or user.username}',
+        description=f'Se ha creado una nueva cuenta de usuario',
+        object_id=user.id
+    )
@@ -7,22 +7,29 @@ from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
 from django.views import View
 from .models import Notification
+from django.db.models import F
+from .counters import get_unread_count, mark_all_read, mark_object_read
+from apps.tickets.pagination import CursorPaginationMixin
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
-class NotificationListView(LoginRequiredMixin, ListView):
+class NotificationListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     model = Notification
     template_name = 'notifications/list.html'
     context_object_name = 'object_list'
     login_url = '/users/login/'
     paginate_by = 20
+    cursor_ordering = '-created_at'
     
     def get_queryset(self):
-        return Notification.objects.filter(recipient=self.request.user).order_by('-created_at')
+        # read_through lets Notification.is_unread honor the "mark all as read" watermark
+        return Notification.objects.filter(recipient=self.request.user).annotate(
+            read_through=F('recipient__notification_state__notifications_read_through')
+        ).order_by('-created_at')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['unread_count'] = self.get_queryset().filter(is_read=False).count()
+        context['unread_count'] = get_unread_count(self.request.user.id)
         return context
 
 @method_decorator(login_required, name='dispatch')
@@ -32,7 +39,7 @@ class MarkAsReadView(View):
         notification.mark_as_read()
         
         channel_layer = get_channel_layer()
-        unread_count = Notification.objects.filter(recipient=request.user, is_read=False).count()
+        unread_count = get_unread_count(request.user.id)
         
         async_to_sync(channel_layer.group_send)(
             f"notifications_{request.user.id}",
@@ -48,11 +55,7 @@ class MarkAsReadView(View):
 @method_decorator(login_required, name='dispatch')
 class MarkAllAsReadView(View):
     def post(self, request):
-        unread_notifications = Notification.objects.filter(recipient=request.user, is_read=False)
-        count = unread_notifications.count()
-        
-        for notification in unread_notifications:
-            notification.mark_as_read()
+        count = mark_all_read(request.user.id)
         
         channel_layer = get_channel_layer()
         async_to_sync(channel_layer.group_send)(
@@ -65,3 +68,22 @@ class MarkAllAsReadView(View):
         )
         
         return JsonResponse({'status': 'success', 'count': count, 'unread_count': 0})
+
+@method_decorator(login_required, name='dispatch')
+class MarkObjectAsReadView(View):
+    """Marks every notification of the user about one object (e.g. a ticket) as read"""
+    def post(self, request, object_id):
+        count = mark_object_read(request.user.id, object_id)
+        unread_count = get_unread_count(request.user.id)
+        
+        channel_layer = get_channel_layer()
+        async_to_sync(channel_layer.group_send)(
+            f"notifications_{request.user.id}",
+            {
+                'type': 'notification_message',
+                'message_type': 'unread_count',
+                'count': unread_count
+            }
+        )
+        
+        return JsonResponse({'status': 'success', 'count': count, 'unread_count': unread_count})
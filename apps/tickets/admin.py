@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Ticket, TicketMessage, TicketAttachment, SavedFilter, EscalationRule, EscalationLog, EscalationSettings
+from .models import Ticket, TicketMessage, TicketAttachment, SavedFilter, EscalationRule, EscalationLog, EscalationSettings, SLAPolicy
 
 
 @admin.register(EscalationRule)
@@ -43,3 +43,9 @@ class EscalationSettingsAdmin(admin.ModelAdmin):
             'fields': ('auto_assign_on_escalation', 'pause_on_response', 'email_notifications')
         }),
     )
+
+@admin.register(SLAPolicy)
+class SLAPolicyAdmin(admin.ModelAdmin):
+    list_display = ['company', 'priority', 'first_response_hours', 'resolution_hours', 'business_hours_only', 'is_active']
+    list_filter = ['company', 'priority', 'business_hours_only', 'is_active']
+    ordering = ['company', 'priority']
@@ -1,14 +1,19 @@
-from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
+from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.shortcuts import redirect, get_object_or_404
 from django.contrib import messages
 from django.http import JsonResponse
 from django.urls import reverse_lazy
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.core.cache import cache
 from django.db.models import Q, Count, Avg
 from datetime import timedelta
 from .models import EscalationRule, EscalationSettings, EscalationLog, Ticket, EmailLog
-from .forms import EscalationRuleForm, EscalationSettingsForm
+from .forms import EscalationRuleForm, EscalationSettingsForm, EscalationSimulationForm
+from .pagination import CursorPaginationMixin
+from .escalation import BULK_ACTIONS, PROPAGATION_PROGRESS_KEY, bulk_escalation_action
+from .simulation import simulate_escalations
 from apps.companies.models import Company
 from django.contrib.auth import get_user_model
 import socket
@@ -24,11 +29,12 @@ class SuperAdminRequiredMixin(UserPassesTestMixin):
         messages.error(self.request, 'No tienes permisos para acceder a esta sección.')
         return redirect('dashboard:dashboard')
 
-class EscalationDashboardView(SuperAdminRequiredMixin, ListView):
+class EscalationDashboardView(SuperAdminRequiredMixin, CursorPaginationMixin, ListView):
     """Dashboard principal de administración de escalamiento"""
     template_name = 'tickets/admin/escalation_dashboard.html'
     context_object_name = 'escalation_logs'
     paginate_by = 20
+    cursor_ordering = '-created_at'
     
     def get_queryset(self):
         return EscalationLog.objects.select_related(
@@ -71,10 +77,26 @@ class EscalationDashboardView(SuperAdminRequiredMixin, ListView):
             # Configuraciones activas
             'active_settings': EscalationSettings.objects.filter(enabled=True).count(),
             'active_rules': EscalationRule.objects.filter(is_active=True).count(),
+            
+            # Última propagación de cambios de reglas o configuración
+            'propagation': self.get_propagation_progress(),
         })
         
         return context
     
+    def get_propagation_progress(self):
+        """Progreso de la última propagación de cambios a los tickets, o None"""
+        progress = cache.get(PROPAGATION_PROGRESS_KEY)
+        if not progress:
+            return None
+        
+        progress = dict(progress)
+        progress['percent'] = int(progress['processed'] * 100 / progress['total']) if progress['total'] else 100
+        progress['started_at'] = parse_datetime(progress['started_at'])
+        if progress['finished_at']:
+            progress['finished_at'] = parse_datetime(progress['finished_at'])
+        return progress
+    
     def get_company_escalation_stats(self):
         """Obtiene estadísticas de escalamiento por empresa"""
         last_30_days = timezone.now() - timedelta(days=30)
@@ -235,11 +257,12 @@ class EscalationLogDetailView(SuperAdminRequiredMixin, DetailView):
         
         return context
 
-class EscalationReportView(SuperAdminRequiredMixin, ListView):
+class EscalationReportView(SuperAdminRequiredMixin, CursorPaginationMixin, ListView):
     """Vista de reportes de escalamiento"""
     template_name = 'tickets/admin/escalation_reports.html'
     context_object_name = 'logs'
     paginate_by = 50
+    cursor_ordering = '-created_at'
     
     def get_queryset(self):
         # Filtros de fecha
@@ -360,22 +383,22 @@ def bulk_escalation_actions(request):
         if not action or not ticket_ids:
             return JsonResponse({'error': 'Acción o tickets no especificados'}, status=400)
         
-        tickets = Ticket.objects.filter(id__in=ticket_ids)
-        count = 0
+        if action not in BULK_ACTIONS:
+            return JsonResponse({'error': 'Acción no válida'}, status=400)
+        
+        try:
+            ticket_ids = [int(ticket_id) for ticket_id in ticket_ids]
+        except ValueError:
+            return JsonResponse({'error': 'Identificadores de ticket no válidos'}, status=400)
+        
+        # Una transacción: vencimientos recalculados, registros creados y conteo exacto
+        count = bulk_escalation_action(action, ticket_ids, user=request.user)
         
         if action == 'pause_escalation':
-            tickets.update(escalation_paused=True)
-            count = tickets.count()
             messages.success(request, f'Escalamiento pausado para {count} tickets.')
-            
         elif action == 'resume_escalation':
-            tickets.update(escalation_paused=False)
-            count = tickets.count()
             messages.success(request, f'Escalamiento reanudado para {count} tickets.')
-            
-        elif action == 'reset_escalation':
-            tickets.update(escalation_level=0, escalation_paused=False, next_escalation_at=None)
-            count = tickets.count()
+        else:
             messages.success(request, f'Escalamiento reiniciado para {count} tickets.')
         
         return JsonResponse({
@@ -386,6 +409,38 @@ def bulk_escalation_actions(request):
     
     return JsonResponse({'error': 'Método no permitido'}, status=405)
 
+class EscalationSimulationView(SuperAdminRequiredMixin, TemplateView):
+    """Simulador: proyecta los escalamientos del historial con reglas y configuración candidatas"""
+    template_name = 'tickets/admin/escalation_simulation.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        
+        # La simulación no modifica datos: los parámetros van por GET para poder compartir el enlace
+        form = EscalationSimulationForm(self.request.GET if 'months' in self.request.GET else None)
+        context['form'] = form
+        
+        if form.is_bound and form.is_valid():
+            company = form.cleaned_data.get('company')
+            try:
+                result = simulate_escalations(
+                    timezone.now() - timedelta(days=30 * form.cleaned_data['months']),
+                    rule_hours=form.cleaned_data['rules'],
+                    settings_overrides=form.get_settings_overrides(),
+                    company_id=company.id if company else None
+                )
+            except ValueError as e:
+                # Calendario candidato inválido
+                form.add_error(None, str(e))
+            else:
+                peak = max(result['by_hour']) or 1
+                result['by_hour'] = [
+                    (hour, count, int(count * 100 / peak)) for hour, count in enumerate(result['by_hour'])
+                ]
+                context['result'] = result
+        
+        return context
+
 class EmailTestView(SuperAdminRequiredMixin, ListView):
     """Vista para probar el sistema de emails en desarrollo"""
     template_name = 'tickets/admin/email_test.html'
@@ -1,4 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+def ensure_fts_index(sender, using, **kwargs):
+    """
+    Reinstala el índice FTS5 después de cada migrate: SQLite elimina los triggers
+    de tickets_ticket cuando una migración reconstruye la tabla.
+    """
+    from django.db import connections
+    from .fts import fts_index_exists, install_fts_index
+
+    connection = connections[using]
+    if fts_index_exists(connection):
+        install_fts_index(connection)
 
 class TicketsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
@@ -6,3 +19,4 @@ class TicketsConfig(AppConfig):
     
     def ready(self):
         import apps.tickets.signals
+        post_migrate.connect(ensure_fts_index, sender=self)
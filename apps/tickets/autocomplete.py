@@ -0,0 +1,191 @@
+from django.conf import settings
+from django.db import connection
+from .models import Ticket
+from .search import get_search_backend
+from .stats import get_stats_scope
+from bisect import bisect_left
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+def normalize_text(text):
+    """Minúsculas y sin acentos, para comparar prefijos"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+def tokenize(text):
+    return re.findall(r'\w+', normalize_text(text))
+
+class PrefixIndex:
+    """
+    Índice de prefijos en memoria sobre las palabras de la referencia y el título de cada ticket.
+
+    Las entradas (palabra, id) se guardan ordenadas y cada prefijo se resuelve con dos búsquedas
+    binarias; el alcance (empresa / creador) se filtra sobre los datos guardados junto al id,
+    sin consultar la base de datos.
+    """
+
+    def __init__(self, rows, truncated=False):
+        # rows: (id, reference, title, company_id, created_by_id)
+        self.truncated = truncated
+        self.tickets = {}
+        entries = []
+        for ticket_id, reference, title, company_id, created_by_id in rows:
+            self.tickets[ticket_id] = (reference, title, company_id, created_by_id)
+            for token in set(tokenize(f'{reference} {title}')):
+                entries.append((token, ticket_id))
+        entries.sort()
+        self.tokens = [token for token, _ in entries]
+        self.ids = [ticket_id for _, ticket_id in entries]
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.tickets)
+
+    def prefix_ids(self, prefix):
+        start = bisect_left(self.tokens, prefix)
+        end = bisect_left(self.tokens, prefix + '\uffff', lo=start)
+        return set(self.ids[start:end])
+
+    def search(self, query_text, scope=('global', None), limit=5):
+        """Tickets del alcance cuyo título/referencia contiene todas las palabras como prefijo"""
+        candidates = None
+        for word in tokenize(query_text):
+            ids = self.prefix_ids(word)
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return []
+        if not candidates:
+            return []
+
+        scope_name, scope_id = scope
+        if scope_name == 'company':
+            candidates = [i for i in candidates if self.tickets[i][2] == scope_id]
+        elif scope_name == 'creator':
+            candidates = [i for i in candidates if self.tickets[i][3] == scope_id]
+
+        # Los ids más altos son los tickets más recientes
+        return [
+            {'id': ticket_id, 'reference': self.tickets[ticket_id][0], 'title': self.tickets[ticket_id][1]}
+            for ticket_id in heapq.nlargest(limit, candidates)
+        ]
+
+_index = None
+_index_stale = False
+_index_rebuilding = False
+_index_lock = threading.Lock()
+
+def build_prefix_index(limit=None):
+    """
+    Construye el índice con todos los tickets. Si hay más de `limit`, retorna un índice vacío
+    marcado como truncado tras leer un solo id: la instalación usa el índice de la base de datos.
+    """
+    queryset = Ticket.objects.order_by().values_list('id', 'reference', 'title', 'company_id', 'created_by_id')
+    if limit is not None and list(queryset.values_list('id', flat=True)[limit:limit + 1]):
+        logger.info(f'Autocompletado: más de {limit} tickets, se usa el índice de la base de datos')
+        return PrefixIndex([], truncated=True)
+    return PrefixIndex(queryset)
+
+def prefix_index_due(index):
+    """Indica si el índice debe reconstruirse (por antigüedad o por cambios)"""
+    age = time.monotonic() - index.built_at
+    if index.truncated:
+        # La decisión "demasiado grande" se mantiene; los cambios de tickets no la revisan
+        return age >= getattr(settings, 'TICKET_AUTOCOMPLETE_SIZE_RECHECK', 3600)
+    refresh = getattr(settings, 'TICKET_AUTOCOMPLETE_REFRESH', 60)
+    min_refresh = getattr(settings, 'TICKET_AUTOCOMPLETE_MIN_REFRESH', 5)
+    return age >= refresh or (_index_stale and age >= min_refresh)
+
+def rebuild_prefix_index(limit=None, background=False):
+    """Reemplaza el índice por uno nuevo; mientras se construye se sigue usando el anterior"""
+    global _index, _index_rebuilding
+    try:
+        index = build_prefix_index(limit)
+        with _index_lock:
+            _index = index
+    except Exception as e:
+        logger.error(f'Error reconstruyendo el índice de autocompletado: {e}')
+    finally:
+        _index_rebuilding = False
+        if background:
+            # El hilo tiene su propia conexión: se cierra al terminar
+            connection.close()
+
+def get_prefix_index(limit=None):
+    """
+    Retorna el índice en memoria del proceso. La primera vez se construye en la petición; luego
+    se reconstruye en un hilo cada TICKET_AUTOCOMPLETE_REFRESH segundos (o antes, si un ticket
+    cambió) y mientras tanto se sirve el anterior. Retorna None si la instalación supera `limit`
+    tickets y debe usarse el índice de la base de datos.
+    """
+    global _index, _index_stale, _index_rebuilding
+
+    index = _index
+    if index is None:
+        with _index_lock:
+            if _index is None:
+                _index_stale = False
+                _index = build_prefix_index(limit)
+            index = _index
+    elif prefix_index_due(index):
+        with _index_lock:
+            start = not _index_rebuilding and _index is index
+            if start:
+                _index_rebuilding = True
+                _index_stale = False
+        if start:
+            if getattr(settings, 'TICKET_AUTOCOMPLETE_BACKGROUND_REFRESH', True):
+                threading.Thread(
+                    target=rebuild_prefix_index, args=(limit, True), name='autocomplete-index', daemon=True
+                ).start()
+            else:
+                rebuild_prefix_index(limit)
+                index = _index
+
+    return None if index.truncated else index
+
+def mark_prefix_index_stale():
+    """Marca el índice en memoria para reconstruirse en la próxima consulta (tras el intervalo mínimo)"""
+    global _index_stale
+    _index_stale = True
+
+def reset_prefix_index():
+    global _index, _index_stale, _index_rebuilding
+    with _index_lock:
+        _index = None
+        _index_stale = False
+        _index_rebuilding = False
+
+def get_scoped_queryset(user):
+    """Tickets visibles para el usuario según su alcance"""
+    scope_name, scope_id = get_stats_scope(user)
+    queryset = Ticket.objects.all()
+    if scope_name == 'company':
+        return queryset.filter(company_id=scope_id)
+    if scope_name == 'creator':
+        return queryset.filter(created_by_id=scope_id)
+    return queryset
+
+def autocomplete_tickets(user, query_text, limit=5):
+    """
+    Sugerencias de tickets (id, reference, title) para el texto escrito, limitadas al alcance
+    del usuario. TICKET_AUTOCOMPLETE_INDEX elige el índice: 'memory', 'database' o 'auto'
+    (memoria mientras la instalación no supere TICKET_AUTOCOMPLETE_MEMORY_LIMIT tickets).
+    """
+    query_text = (query_text or '').strip()
+    if len(query_text) < 2:
+        return []
+
+    mode = getattr(settings, 'TICKET_AUTOCOMPLETE_INDEX', 'auto')
+    if mode != 'database':
+        memory_limit = None if mode == 'memory' else getattr(settings, 'TICKET_AUTOCOMPLETE_MEMORY_LIMIT', 20000)
+        index = get_prefix_index(memory_limit)
+        if index is not None:
+            return index.search(query_text, get_stats_scope(user), limit)
+
+    return get_search_backend().autocomplete(get_scoped_queryset(user), query_text, limit)
@@ -0,0 +1,207 @@
+"""
+Calendario laboral para el escalamiento.
+
+Se compila una vez por fila de EscalationSettings: días laborales como máscara de bits, ventana
+horaria, feriados ordenados y zona horaria de la empresa. Sumar horas laborales y buscar el
+próximo instante laboral se resuelve con aritmética de semanas completas más un ajuste por los
+feriados del rango, sin recorrer el calendario día por día.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+def parse_holidays(text):
+    """Fechas YYYY-MM-DD separadas por comas, espacios o saltos de línea"""
+    return sorted({date.fromisoformat(item) for item in (text or '').replace(',', ' ').split()})
+
+class BusinessCalendar:
+    """
+    Horario laboral de una configuración de escalamiento.
+
+    Las horas laborales se cuentan en la hora local de `timezone_name`; los resultados se
+    devuelven en la zona horaria del instante recibido.
+    """
+
+    def __init__(self, business_days, start_hour, end_hour, holidays=(), timezone_name='UTC'):
+        self.weekday_mask = 0
+        for day in business_days:
+            if not 1 <= day <= 7:
+                raise ValueError(f'Día laboral inválido: {day}')
+            self.weekday_mask |= 1 << (day - 1)
+        if not self.weekday_mask:
+            raise ValueError('El calendario laboral necesita al menos un día laboral')
+        if not 0 <= start_hour < end_hour <= 24:
+            raise ValueError(f'Horario laboral inválido: {start_hour}-{end_hour}')
+
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+        self.day_length = timedelta(hours=end_hour - start_hour)
+        self.tz = ZoneInfo(timezone_name or 'UTC')
+        self.days_per_week = bin(self.weekday_mask).count('1')
+
+        # Solo importan los feriados que caen en día laboral
+        self.holidays = sorted(day for day in set(holidays) if self.is_business_weekday(day))
+        self.holiday_set = frozenset(self.holidays)
+
+        # offsets[w][n]: días de calendario desde el día de semana w (0=lunes) hasta el día laboral n+1 siguiente
+        self.offsets = []
+        for weekday in range(7):
+            offsets = []
+            offset = 0
+            while len(offsets) < self.days_per_week:
+                offset += 1
+                if self.weekday_mask & (1 << ((weekday + offset) % 7)):
+                    offsets.append(offset)
+            self.offsets.append(offsets)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            settings.get_business_days_list(),
+            settings.business_start_hour,
+            settings.business_end_hour,
+            parse_holidays(settings.holidays),
+            settings.timezone
+        )
+
+    def is_business_weekday(self, day):
+        return bool(self.weekday_mask & (1 << day.weekday()))
+
+    def is_business_day(self, day):
+        return self.is_business_weekday(day) and day not in self.holiday_set
+
+    def is_business_time(self, moment):
+        local = moment.astimezone(self.tz)
+        return self.is_business_day(local.date()) and self.start_hour <= local.hour < self.end_hour
+
+    def next_business_day(self, day, n=1):
+        """El n-ésimo día laboral posterior a `day` (n >= 1)"""
+        while True:
+            weeks, index = divmod(n - 1, self.days_per_week)
+            candidate = day + timedelta(days=weeks * 7 + self.offsets[day.weekday()][index])
+            # Cada feriado del rango (day, candidate] desplaza el resultado un día laboral más
+            skipped = bisect_right(self.holidays, candidate) - bisect_right(self.holidays, day)
+            if not skipped:
+                return candidate
+            day, n = candidate, skipped
+
+    def next_business_instant(self, moment):
+        """`moment` si está en horario laboral; si no, el inicio del próximo horario laboral"""
+        local = moment.astimezone(self.tz)
+        day = local.date()
+        if self.is_business_day(day):
+            if local < self._day_start(day):
+                return self._day_start(day).astimezone(moment.tzinfo)
+            if local < self._day_end(day):
+                return moment
+        return self._day_start(self.next_business_day(day)).astimezone(moment.tzinfo)
+
+    def add_business_hours(self, moment, hours):
+        """Instante en que se cumplen `hours` horas laborales contadas desde `moment`"""
+        remaining = timedelta(hours=hours)
+        current = self.next_business_instant(moment).astimezone(self.tz)
+        if remaining <= timedelta(0):
+            return current.astimezone(moment.tzinfo)
+
+        day = current.date()
+        available = self._day_end(day) - current
+        if remaining <= available:
+            return (current + remaining).astimezone(moment.tzinfo)
+
+        full_days, rest = divmod(remaining - available, self.day_length)
+        if not rest:
+            # Termina justo al cierre de un día laboral, no al inicio del siguiente
+            full_days, rest = full_days - 1, self.day_length
+        target = self.next_business_day(day, full_days + 1)
+        return (self._day_start(target) + rest).astimezone(moment.tzinfo)
+
+    def add_business_hours_many(self, moments, hours):
+        """
+        add_business_hours sobre una lista de instantes (reprogramación por lotes). `hours` puede
+        ser un número para todos o una lista paralela a `moments`.
+
+        Los días laborales del rango del lote y sus horarios se calculan una sola vez; cada
+        instante se resuelve con una búsqueda binaria en esa tabla.
+        """
+        if isinstance(hours, (int, float)):
+            hours = [hours] * len(moments)
+        table = self._business_day_table(moments, max(hours, default=0))
+        if table is None:
+            return [self.add_business_hours(moment, amount) for moment, amount in zip(moments, hours)]
+
+        days, starts, ends = table
+        results = []
+        for moment, amount in zip(moments, hours):
+            index, current = self._locate(moment.astimezone(self.tz), days, starts, ends)
+            remaining = timedelta(hours=amount)
+            available = ends[index] - current
+            if remaining <= available:
+                results.append((current + max(remaining, timedelta(0))).astimezone(moment.tzinfo))
+                continue
+            full_days, rest = divmod(remaining - available, self.day_length)
+            if not rest:
+                # Termina justo al cierre de un día laboral, no al inicio del siguiente
+                full_days, rest = full_days - 1, self.day_length
+            results.append((starts[index + full_days + 1] + rest).astimezone(moment.tzinfo))
+        return results
+
+    def next_business_instant_many(self, moments):
+        """next_business_instant sobre una lista de instantes, con la tabla de días compartida"""
+        table = self._business_day_table(moments, 0)
+        if table is None:
+            return [self.next_business_instant(moment) for moment in moments]
+        days, starts, ends = table
+        results = []
+        for moment in moments:
+            local = moment.astimezone(self.tz)
+            _, current = self._locate(local, days, starts, ends)
+            results.append(moment if current is local else current.astimezone(moment.tzinfo))
+        return results
+
+    def _business_day_table(self, moments, max_hours):
+        """
+        Días laborales desde el primer día local del lote hasta el último, más los necesarios para
+        sumar `max_hours`, con el inicio y el fin de cada uno. None si el lote está tan disperso
+        que recorrer su rango costaría más que resolver cada instante por separado.
+        """
+        if not moments:
+            return None
+        local_days = [moment.astimezone(self.tz).date() for moment in moments]
+        first, last = min(local_days), max(local_days)
+        if (last - first).days > 8 * len(moments):
+            return None
+
+        days = []
+        day = first
+        while day <= last:
+            if self.is_business_day(day):
+                days.append(day)
+            day += timedelta(days=1)
+        # Un instante puede pasar al día laboral siguiente a `last` y luego sumar días completos
+        extra = int(timedelta(hours=max(max_hours, 0)) / self.day_length) + 3
+        anchor = days[-1] if days else last
+        for _ in range(extra):
+            anchor = self.next_business_day(anchor)
+            days.append(anchor)
+        return days, [self._day_start(day) for day in days], [self._day_end(day) for day in days]
+
+    def _instant(self, local):
+        # Normaliza una hora local inexistente (cambio de horario) como lo hace ir y volver de UTC
+        return local.astimezone(dt_timezone.utc).astimezone(self.tz)
+
+    def _locate(self, local, days, starts, ends):
+        """(índice en la tabla, próximo instante laboral) para un instante local"""
+        index = bisect_left(days, local.date())
+        if days[index] == local.date():
+            if local < starts[index]:
+                return index, self._instant(starts[index])
+            if local < ends[index]:
+                return index, local
+            index += 1
+        return index, self._instant(starts[index])
+
+    def _day_start(self, day):
+        return datetime.combine(day, time(0), tzinfo=self.tz) + timedelta(hours=self.start_hour)
+
+    def _day_end(self, day):
+        return datetime.combine(day, time(0), tzinfo=self.tz) + timedelta(hours=self.end_hour)
@@ -0,0 +1,545 @@
+"""
+Motor de escalamiento por lotes.
+
+Procesa los tickets vencidos en bloques: la configuración y las reglas se resuelven desde la
+configuración compilada (escalation_config.py), los cambios de cada bloque se aplican con un
+bulk_update, los registros con un bulk_create y las notificaciones se encolan en una sola tarea
+por bloque. Con ESCALATION_FANOUT_ENABLED los vencidos se reparten por empresa entre los workers,
+cada partición bajo una concesión en caché. Los cambios de reglas y configuración se propagan
+a los tickets afectados en segundo plano (propagate_escalation_change).
+"""
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from .models import Ticket, EscalationLog, EscalationRule
+from .escalation_config import EscalationConfig, get_escalation_config
+from .read_model import get_user_display
+from .scheduler import get_deadline_scheduler, schedule_deadlines
+from .search_cache import invalidate_search_cache
+from .stats import get_ticket_stats_state
+from .tasks import get_escalation_settings, calculate_next_escalation_time
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ['OPEN', 'IN_PROGRESS']
+
+# Campos necesarios para calcular el vencimiento de un ticket
+SCHEDULE_FIELDS = [
+    'id', 'company_id', 'priority', 'status', 'escalation_level', 'escalation_paused',
+    'last_response_at', 'created_at', 'next_escalation_at',
+]
+
+# Posición del barrido de conciliación entre ejecuciones
+SWEEP_CURSOR_KEY = 'escalation_sweep:last_id'
+
+# Progreso de la última propagación de cambios de reglas o configuración
+PROPAGATION_PROGRESS_KEY = 'escalation_propagation:progress'
+
+# Acciones masivas: acción del registro y nota
+BULK_ACTIONS = {
+    'pause_escalation': ('paused', "Escalamiento pausado por acción masiva"),
+    'resume_escalation': ('resumed', "Escalamiento reanudado por acción masiva"),
+    'reset_escalation': ('reset', "Escalamiento reiniciado por acción masiva"),
+}
+BULK_ACTION_FIELDS = ['escalation_level', 'escalation_paused', 'next_escalation_at', 'updated_at']
+
+# Concesiones por partición y métricas de la última ejecución en paralelo
+PARTITION_LEASE_PREFIX = 'escalation_partition'
+PARTITION_METRICS_KEY = 'escalation_partition:last_run'
+
+# Campos que el escalamiento modifica en cada ticket
+ESCALATION_UPDATE_FIELDS = [
+    'escalation_level', 'assigned_to', 'assignee_display', 'next_escalation_at',
+    'last_response_at', 'escalation_paused', 'updated_at',
+]
+
+def compute_escalation_deadline(ticket, config=None):
+    """
+    Próximo vencimiento de escalamiento del ticket según su configuración y la regla del
+    siguiente nivel, o None si no corresponde escalarlo
+    """
+    if ticket.status not in ACTIVE_STATUSES or ticket.escalation_paused:
+        return None
+    config = config or get_escalation_config()
+    settings = config.get_settings(ticket.company_id)
+    if settings is None or not settings.enabled:
+        return None
+    rule = config.get_rule(ticket.company_id, ticket.priority, ticket.escalation_level + 1)
+    if not rule:
+        return None
+    return calculate_next_escalation_time(ticket, rule, settings)
+
+def schedule_escalation(ticket, responded_at=None):
+    """
+    Calcula y guarda el vencimiento de un solo ticket (creación, respuesta, reanudación) sin
+    recorrer la tabla. `ticket` puede ser la instancia o su id; `responded_at` reinicia además
+    el tiempo de respuesta. Retorna el nuevo vencimiento.
+    """
+    if not isinstance(ticket, Ticket):
+        ticket = Ticket.objects.only(*SCHEDULE_FIELDS).get(pk=ticket)
+
+    previous = ticket.next_escalation_at
+    changes = {}
+    if responded_at is not None:
+        ticket.last_response_at = changes['last_response_at'] = responded_at
+
+    deadline = compute_escalation_deadline(ticket)
+    if deadline == previous and not changes:
+        return deadline
+
+    ticket.next_escalation_at = deadline
+    Ticket.objects.filter(pk=ticket.pk).update(next_escalation_at=deadline, **changes)
+    # El cambio ya se publica aquí; la señal post_save no debe repetirlo
+    ticket._escalation_deadline = deadline
+    schedule_deadlines([(ticket.pk, deadline)])
+    return deadline
+
+def reconcile_escalation_deadlines(batch_size=None, max_batches=None):
+    """
+    Barrido de conciliación en bloques acotados: calcula el vencimiento de los tickets activos
+    que no lo tienen y vuelve a publicar los existentes en el planificador. Cada ejecución
+    procesa como máximo `max_batches` bloques y continúa donde quedó la anterior.
+    Retorna (tickets con vencimiento nuevo, tickets revisados).
+    """
+    batch_size = batch_size or getattr(django_settings, 'ESCALATION_BATCH_SIZE', 500)
+    max_batches = max_batches or getattr(django_settings, 'ESCALATION_SWEEP_MAX_BATCHES', 20)
+    stores_deadlines = get_deadline_scheduler().stores_deadlines
+    config = get_escalation_config()
+
+    pending = Ticket.objects.filter(status__in=ACTIVE_STATUSES, escalation_paused=False).only(*SCHEDULE_FIELDS)
+    last_id = cache.get(SWEEP_CURSOR_KEY, 0)
+    updated_count = 0
+    checked_count = 0
+
+    for _ in range(max_batches):
+        chunk = list(pending.filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not chunk:
+            last_id = 0
+            break
+        last_id = chunk[-1].id
+        checked_count += len(chunk)
+
+        missing = []
+        for ticket in chunk:
+            if ticket.next_escalation_at is None:
+                ticket.next_escalation_at = compute_escalation_deadline(ticket, config)
+                if ticket.next_escalation_at is not None:
+                    missing.append(ticket)
+        if missing:
+            Ticket.objects.bulk_update(missing, ['next_escalation_at'])
+            updated_count += len(missing)
+
+        published = chunk if stores_deadlines else missing
+        schedule_deadlines((ticket.id, ticket.next_escalation_at) for ticket in published if ticket.next_escalation_at)
+
+    cache.set(SWEEP_CURSOR_KEY, last_id, timeout=None)
+    return updated_count, checked_count
+
+def get_propagation_scopes(instance):
+    """
+    Alcances (empresa, prioridad, nivel) afectados al guardar o eliminar una regla o una
+    configuración; prioridad y nivel None abarcan todos. Incluye el alcance con el que se cargó
+    la instancia, por si se editó la empresa, la prioridad o el nivel.
+    """
+    if isinstance(instance, EscalationRule):
+        scopes = {(instance.company_id, instance.priority, instance.level)}
+    else:
+        scopes = {(instance.company_id, None, None)}
+    loaded = getattr(instance, '_propagation_scope', None)
+    if loaded:
+        scopes.add(loaded)
+    return [list(scope) for scope in sorted(scopes, key=str)]
+
+def get_scope_filter(company_id, priority, level, config):
+    """Filtro de los tickets cuyo vencimiento depende del alcance"""
+    condition = Q()
+    if company_id is not None:
+        condition &= Q(company_id=company_id)
+    elif priority is None:
+        # Configuración global: las empresas con configuración propia no la usan
+        condition &= ~Q(company_id__in=list(config.settings_by_company))
+    else:
+        # Regla global: las empresas que la redefinen no la usan
+        overridden = [
+            company_id for company_id, rules in config.rules_by_company.items()
+            if (priority, level) in rules and rules[(priority, level)].company_id is not None
+        ]
+        condition &= ~Q(company_id__in=overridden)
+    if priority is not None:
+        condition &= Q(priority=priority)
+    if level is not None:
+        # La regla de nivel N define el vencimiento de los tickets en el nivel N-1
+        condition &= Q(escalation_level=level - 1)
+    return condition
+
+def propagate_escalation_change(scopes, batch_size=None):
+    """
+    Recalcula el vencimiento de los tickets activos afectados por un cambio de reglas o
+    configuración, en bloques por id con un bulk_update por bloque. El progreso se publica en
+    PROPAGATION_PROGRESS_KEY para el panel de escalamiento. Retorna el progreso final.
+    """
+    batch_size = batch_size or getattr(django_settings, 'ESCALATION_BATCH_SIZE', 500)
+    # Recién cargada: la copia del proceso puede ser anterior al cambio
+    config = EscalationConfig.load()
+
+    condition = Q()
+    for company_id, priority, level in scopes:
+        condition |= get_scope_filter(company_id, priority, level, config)
+    tickets = Ticket.objects.filter(
+        condition, status__in=ACTIVE_STATUSES, escalation_paused=False
+    ).only(*SCHEDULE_FIELDS)
+
+    progress = {
+        'job_id': uuid.uuid4().hex,
+        'status': 'running',
+        'scopes': len(scopes),
+        'total': tickets.count(),
+        'processed': 0,
+        'updated': 0,
+        'started_at': timezone.now().isoformat(),
+        'finished_at': None,
+    }
+    cache.set(PROPAGATION_PROGRESS_KEY, progress, timeout=None)
+
+    last_id = 0
+    try:
+        while True:
+            chunk = list(tickets.filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+
+            changed = []
+            for ticket in chunk:
+                deadline = compute_escalation_deadline(ticket, config)
+                if deadline != ticket.next_escalation_at:
+                    ticket.next_escalation_at = deadline
+                    changed.append(ticket)
+            if changed:
+                Ticket.objects.bulk_update(changed, ['next_escalation_at'])
+                schedule_deadlines((ticket.id, ticket.next_escalation_at) for ticket in changed)
+
+            progress['processed'] += len(chunk)
+            progress['updated'] += len(changed)
+            cache.set(PROPAGATION_PROGRESS_KEY, progress, timeout=None)
+    except Exception as e:
+        progress.update(status='failed', error=str(e), finished_at=timezone.now().isoformat())
+        cache.set(PROPAGATION_PROGRESS_KEY, progress, timeout=None)
+        raise
+
+    progress.update(status='done', finished_at=timezone.now().isoformat())
+    cache.set(PROPAGATION_PROGRESS_KEY, progress, timeout=None)
+    logger.info(
+        f"Propagación de cambios de escalamiento: {progress['updated']} vencimientos recalculados "
+        f"de {progress['processed']} tickets"
+    )
+    return progress
+
+def bulk_escalation_action(action, ticket_ids, user=None, batch_size=None):
+    """
+    Pausa, reanuda o reinicia el escalamiento de un conjunto de tickets en una sola transacción.
+    Los vencimientos se recalculan en memoria con la configuración compilada, los cambios se
+    escriben con bulk_update y los registros con bulk_create, por bloques de `batch_size`.
+    Retorna el número de tickets modificados (los que ya estaban en el estado pedido no cuentan).
+    """
+    if action not in BULK_ACTIONS:
+        raise ValueError(f"Acción masiva desconocida: {action}")
+
+    log_action, notes = BULK_ACTIONS[action]
+    batch_size = batch_size or getattr(django_settings, 'ESCALATION_BATCH_SIZE', 500)
+    config = get_escalation_config()
+    now = timezone.now()
+    ticket_ids = sorted(set(ticket_ids))
+
+    queryset = Ticket.objects.only(*SCHEDULE_FIELDS)
+    if action == 'pause_escalation':
+        queryset = queryset.filter(escalation_paused=False)
+    elif action == 'resume_escalation':
+        queryset = queryset.filter(escalation_paused=True)
+
+    changed_count = 0
+    with transaction.atomic():
+        for start in range(0, len(ticket_ids), batch_size):
+            tickets = list(queryset.filter(id__in=ticket_ids[start:start + batch_size]))
+            for ticket in tickets:
+                if action == 'pause_escalation':
+                    ticket.escalation_paused = True
+                    ticket.next_escalation_at = None
+                else:
+                    if action == 'reset_escalation':
+                        ticket.escalation_level = 0
+                    ticket.escalation_paused = False
+                    ticket.next_escalation_at = compute_escalation_deadline(ticket, config)
+                ticket.updated_at = now
+
+            Ticket.objects.bulk_update(tickets, BULK_ACTION_FIELDS)
+            EscalationLog.objects.bulk_create([
+                EscalationLog(ticket=ticket, action=log_action, level=ticket.escalation_level, notes=notes, created_by=user)
+                for ticket in tickets
+            ])
+            schedule_deadlines((ticket.id, ticket.next_escalation_at) for ticket in tickets)
+            changed_count += len(tickets)
+
+    logger.info(f"Acción masiva {action}: {changed_count} de {len(ticket_ids)} tickets modificados")
+    return changed_count
+
+def get_due_tickets(now):
+    """Tickets activos con escalamiento vencido (índice parcial ticket_pending_escalation_idx)"""
+    return Ticket.objects.filter(
+        status__in=ACTIVE_STATUSES,
+        escalation_paused=False,
+        next_escalation_at__lte=now
+    ).defer('description', 'search_document')
+
+def process_due_escalations(now=None, batch_size=None, ticket_ids=None, company_id=None):
+    """
+    Escala todos los tickets vencidos en bloques de `batch_size` (ESCALATION_BATCH_SIZE), o solo
+    los de `ticket_ids` que sigan vencidos (los entregados por el planificador) o los de la
+    empresa `company_id` (una partición del modo en paralelo).
+    Retorna el número de tickets escalados.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or getattr(django_settings, 'ESCALATION_BATCH_SIZE', 500)
+    # Garantiza que exista la configuración global por defecto
+    get_escalation_settings(None)
+    config = get_escalation_config()
+
+    due_tickets = get_due_tickets(now)
+    if ticket_ids is not None:
+        due_tickets = due_tickets.filter(id__in=ticket_ids)
+    if company_id is not None:
+        due_tickets = due_tickets.filter(company_id=company_id)
+
+    escalated_count = 0
+    last_id = 0
+    while True:
+        chunk = None
+        try:
+            with transaction.atomic():
+                # Recorrido por id: los tickets reprogramados en esta ejecución no se vuelven a leer.
+                # Filas bloqueadas hasta el bulk_update: otra ejecución simultánea las salta
+                chunk = list(
+                    due_tickets.filter(id__gt=last_id).select_for_update(skip_locked=True).order_by('id')[:batch_size]
+                )
+                if chunk:
+                    last_id = chunk[-1].id
+                    escalated_count += escalate_chunk(chunk, config, now)
+        except Exception as e:
+            logger.error(f"Error escalando bloque de tickets hasta id {last_id}: {e}")
+        if not chunk:
+            break
+
+    return escalated_count
+
+def get_due_partitions(now, company_ids=None):
+    """
+    Particiones del modo en paralelo: una por empresa con tickets vencidos (o solo las de
+    `company_ids`), las más atrasadas primero
+    """
+    due_tickets = get_due_tickets(now)
+    if company_ids is not None:
+        due_tickets = due_tickets.filter(company_id__in=company_ids)
+    return list(
+        due_tickets.order_by().values('company_id')
+        .annotate(due=Count('id'), oldest=Min('next_escalation_at'))
+        .order_by('oldest')
+    )
+
+def dispatch_partitions(now, company_ids=None):
+    """
+    Reparte los vencidos entre los workers: una tarea escalate_company_partition por partición
+    y el callback que agrega sus métricas (chord de Celery). Retorna cuántas se despacharon.
+    """
+    from celery import chord
+    from .tasks import escalate_company_partition, collect_escalation_partitions
+
+    partitions = get_due_partitions(now, company_ids)
+    if partitions:
+        chord(
+            escalate_company_partition.s(partition['company_id'], now.isoformat())
+            for partition in partitions
+        )(collect_escalation_partitions.s(now.isoformat()))
+    logger.info(f"Escalamiento en paralelo: {len(partitions)} particiones despachadas")
+    return len(partitions)
+
+def acquire_partition_lease(company_id, timeout=None):
+    """
+    Toma la concesión de la partición de una empresa (cache.add es atómico); retorna el token
+    o None si otro worker la tiene. La concesión expira sola si el worker muere.
+    """
+    timeout = timeout or getattr(django_settings, 'ESCALATION_PARTITION_LEASE', 600)
+    token = uuid.uuid4().hex
+    if cache.add(f'{PARTITION_LEASE_PREFIX}:{company_id}', token, timeout=timeout):
+        return token
+    return None
+
+def release_partition_lease(company_id, token):
+    key = f'{PARTITION_LEASE_PREFIX}:{company_id}'
+    # Solo se libera si sigue siendo nuestra (pudo expirar y tomarla otro worker)
+    if cache.get(key) == token:
+        cache.delete(key)
+
+def escalate_partition(company_id, now):
+    """
+    Procesa la partición de una empresa bajo su concesión. Retorna las métricas de la partición:
+    tickets vencidos y escalados, atraso del vencimiento más antiguo al empezar (lag) y duración.
+    """
+    token = acquire_partition_lease(company_id)
+    if token is None:
+        logger.info(f"Partición de escalamiento de la empresa {company_id} ya en proceso, se omite")
+        return {'company_id': company_id, 'skipped': True}
+
+    try:
+        started = timezone.now()
+        pending = get_due_tickets(now).filter(company_id=company_id).aggregate(due=Count('id'), oldest=Min('next_escalation_at'))
+        escalated_count = process_due_escalations(now=now, company_id=company_id)
+        return {
+            'company_id': company_id,
+            'skipped': False,
+            'due': pending['due'],
+            'escalated': escalated_count,
+            'lag_seconds': (started - pending['oldest']).total_seconds() if pending['oldest'] else 0.0,
+            'duration_seconds': (timezone.now() - started).total_seconds(),
+        }
+    finally:
+        release_partition_lease(company_id, token)
+
+def summarize_partitions(results, started_at):
+    """
+    Agrega las métricas de las particiones de una ejecución. `fairness` es el índice de Jain
+    sobre el lag por empresa: 1.0 si todas esperaron lo mismo, cercano a 1/n si una acaparó
+    la espera. El resumen se guarda en caché para el panel de escalamiento.
+    """
+    processed = [result for result in results if not result.get('skipped')]
+    lags = [result['lag_seconds'] for result in processed]
+    squares = sum(lag * lag for lag in lags)
+    summary = {
+        'started_at': started_at,
+        'finished_at': timezone.now().isoformat(),
+        'partitions': len(results),
+        'skipped': len(results) - len(processed),
+        'escalated': sum(result['escalated'] for result in processed),
+        'max_lag_seconds': max(lags, default=0.0),
+        'fairness': (sum(lags) ** 2 / (len(lags) * squares)) if squares else 1.0,
+        'companies': {str(result['company_id']): result for result in processed},
+    }
+    cache.set(PARTITION_METRICS_KEY, summary, timeout=None)
+    logger.info(
+        f"Escalamiento en paralelo: {summary['escalated']} escalados en {summary['partitions']} particiones "
+        f"({summary['skipped']} omitidas), lag máximo {summary['max_lag_seconds']:.0f}s, equidad {summary['fairness']:.2f}"
+    )
+    return summary
+
+def escalate_chunk(tickets, config, now):
+    """
+    Aplica el escalamiento a un bloque de tickets ya cargados (y bloqueados por la transacción
+    de process_due_escalations); retorna cuántos se escalaron. Los tickets que ya no pueden
+    escalar quedan sin vencimiento para no volver a leerse en cada ejecución.
+    """
+    changed = []
+    logs = []
+    notifications = []
+    previous_states = []
+    reschedule_at = {}
+    escalated_count = 0
+
+    for ticket in tickets:
+        settings = config.get_settings(ticket.company_id)
+        if settings is None or not settings.enabled:
+            # Igual que compute_escalation_deadline: sin configuración activa no hay vencimiento
+            ticket.next_escalation_at = None
+            changed.append(ticket)
+            continue
+
+        # Fuera de horario laboral: reprogramar para el próximo horario
+        if settings.business_hours_only and not settings.is_business_time(now):
+            if settings.pk not in reschedule_at:
+                reschedule_at[settings.pk] = settings.get_calendar().next_business_instant(now)
+            ticket.next_escalation_at = reschedule_at[settings.pk]
+            ticket.updated_at = now
+            changed.append(ticket)
+            continue
+
+        next_level = ticket.escalation_level + 1
+        rule = config.get_rule(ticket.company_id, ticket.priority, next_level)
+        if not rule or next_level > settings.max_escalation_level:
+            if not rule:
+                logger.warning(f"No hay regla de escalamiento para ticket {ticket.reference} nivel {next_level}")
+            ticket.next_escalation_at = None
+            changed.append(ticket)
+            continue
+
+        previous_states.append(get_ticket_stats_state(ticket))
+        previous_assigned_id = ticket.assigned_to_id
+        ticket.escalation_level = next_level
+        ticket.updated_at = now
+
+        if settings.auto_assign_on_escalation and rule.escalate_to_id != previous_assigned_id:
+            ticket.assigned_to = rule.escalate_to
+            ticket.assignee_display = get_user_display(rule.escalate_to)
+            # Igual que al reasignar manualmente: el tiempo de respuesta se reinicia
+            ticket.last_response_at = now
+            ticket.escalation_paused = False
+
+        # Después de la reasignación: el plazo cuenta desde la nueva base con la regla del siguiente nivel
+        ticket.next_escalation_at = compute_escalation_deadline(ticket, config)
+
+        changed.append(ticket)
+        logs.append(EscalationLog(
+            ticket=ticket,
+            escalation_rule=rule,
+            action='escalated',
+            from_user_id=previous_assigned_id,
+            to_user_id=rule.escalate_to_id,
+            level=next_level,
+            notes=f"Escalamiento automático después de {rule.hours_to_escalate} horas sin respuesta"
+        ))
+        notifications.extend(build_escalation_notifications(ticket, rule))
+        escalated_count += 1
+
+    with transaction.atomic():
+        Ticket.objects.bulk_update(changed, ESCALATION_UPDATE_FIELDS)
+        EscalationLog.objects.bulk_create(logs)
+        if notifications:
+            transaction.on_commit(lambda: dispatch_escalation_notifications(notifications))
+
+    # bulk_update no emite señales: invalidar la caché de búsqueda (filtro por asignado)
+    # y registrar los nuevos vencimientos en el planificador
+    invalidate_search_cache(*previous_states)
+    schedule_deadlines((ticket.id, ticket.next_escalation_at) for ticket in changed)
+    logger.info(f"Bloque de escalamiento: {escalated_count} escalados, {len(changed) - escalated_count} reprogramados o sin vencimiento")
+    return escalated_count
+
+def build_escalation_notifications(ticket, rule):
+    """Notificaciones (serializables) para el nuevo asignado y el creador del ticket"""
+    notifications = []
+    if rule.escalate_to_id:
+        notifications.append({
+            'recipient_id': rule.escalate_to_id,
+            'notification_type': 'ticket_escalated',
+            'verb': f"Ticket escalado: {ticket.title}",
+            'description': rule.notification_template or f"Ticket escalado a nivel {ticket.escalation_level}: {ticket.title}",
+            'object_id': ticket.id,
+        })
+    if ticket.created_by_id:
+        notifications.append({
+            'recipient_id': ticket.created_by_id,
+            'notification_type': 'ticket_escalated',
+            'verb': f"Tu ticket ha sido escalado: {ticket.title}",
+            'description': f"El ticket ha sido escalado a nivel {ticket.escalation_level}",
+            'object_id': ticket.id,
+        })
+    return notifications
+
+def dispatch_escalation_notifications(notifications):
+    """Encola las notificaciones de un bloque en una sola tarea"""
+    from apps.notifications.tasks import create_notifications_batch
+
+    try:
+        create_notifications_batch.delay(notifications)
+    except Exception as e:
+        logger.error(f"Error encolando {len(notifications)} notificaciones de escalamiento: {e}")
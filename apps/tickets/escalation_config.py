@@ -0,0 +1,125 @@
+"""
+Configuración, reglas de escalamiento y políticas de SLA compiladas en memoria.
+
+EscalationRule, EscalationSettings y SLAPolicy cambian muy rara vez, pero se consultan en cada ticket
+guardado, cada mensaje y cada paso de escalamiento. Se cargan una vez por proceso en tablas
+con la precedencia empresa → global ya resuelta; un sello de versión en la caché compartida
+(incrementado por señales al guardar o eliminar) indica a cada proceso cuándo recompilar.
+"""
+from django.conf import settings
+from django.core.cache import cache
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'escalation_config:version'
+
+class EscalationConfig:
+    """Tablas de búsqueda de una versión de la configuración de escalamiento"""
+
+    def __init__(self, settings_list, rules, version=None, sla_policies=()):
+        self.version = version
+        self.global_settings = None
+        self.settings_by_company = {}
+        for item in settings_list:
+            if item.company_id is None:
+                self.global_settings = item
+            else:
+                self.settings_by_company[item.company_id] = item
+
+        # (prioridad, nivel) -> regla; las empresas con reglas propias heredan las globales que no redefinen
+        self.global_rules = {}
+        company_rules = {}
+        for rule in rules:
+            if rule.company_id is None:
+                self.global_rules[(rule.priority, rule.level)] = rule
+            else:
+                company_rules.setdefault(rule.company_id, {})[(rule.priority, rule.level)] = rule
+        self.rules_by_company = {
+            company_id: {**self.global_rules, **overrides}
+            for company_id, overrides in company_rules.items()
+        }
+
+        # Mayor antelación de advertencia: define la ventana de la consulta de advertencias
+        self.max_warning_minutes = max((rule.warning_minutes for rule in rules), default=0)
+
+        # (empresa o None, prioridad) -> política de SLA
+        self.sla_policies = {(policy.company_id, policy.priority): policy for policy in sla_policies}
+
+    @classmethod
+    def load(cls, version=None):
+        from .models import EscalationRule, EscalationSettings, SLAPolicy
+
+        return cls(
+            list(EscalationSettings.objects.all()),
+            list(EscalationRule.objects.filter(is_active=True).select_related('escalate_to')),
+            version,
+            list(SLAPolicy.objects.filter(is_active=True))
+        )
+
+    def get_settings(self, company_id):
+        """Configuración de la empresa o la global (None si no hay ninguna)"""
+        return self.settings_by_company.get(company_id, self.global_settings)
+
+    def get_rule(self, company_id, priority, level):
+        """Regla activa de la empresa para la prioridad y el nivel, o la global"""
+        return self.rules_by_company.get(company_id, self.global_rules).get((priority, level))
+
+    def get_sla_policy(self, company_id, priority):
+        """Política de SLA activa de la empresa para la prioridad, o la global"""
+        return self.sla_policies.get((company_id, priority)) or self.sla_policies.get((None, priority))
+
+_config = None
+_checked_at = 0
+_config_lock = threading.Lock()
+
+def get_escalation_config():
+    """
+    Retorna la configuración compilada del proceso. La versión compartida se consulta como
+    máximo cada ESCALATION_CONFIG_CHECK_INTERVAL segundos; los cambios hechos en este mismo
+    proceso se ven de inmediato.
+    """
+    global _config, _checked_at
+    interval = getattr(settings, 'ESCALATION_CONFIG_CHECK_INTERVAL', 5)
+
+    config = _config
+    if config is not None and time.monotonic() - _checked_at < interval:
+        return config
+
+    version = _get_version()
+    with _config_lock:
+        if _config is None or _config.version != version:
+            _config = EscalationConfig.load(version)
+            logger.debug(f'Configuración de escalamiento compilada (versión {version})')
+        _checked_at = time.monotonic()
+        return _config
+
+def warm_escalation_config(**kwargs):
+    """Compila la configuración al iniciar un proceso worker"""
+    try:
+        reset_escalation_config()
+        get_escalation_config()
+    except Exception as e:
+        logger.error(f'Error precargando la configuración de escalamiento: {e}')
+
+def invalidate_escalation_config():
+    """Incrementa la versión compartida y descarta la copia de este proceso"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _new_version(), timeout=None)
+    reset_escalation_config()
+
+def reset_escalation_config():
+    global _config
+    with _config_lock:
+        _config = None
+
+def _new_version():
+    # Basada en el tiempo para que una versión expulsada de la caché no se reutilice
+    return int(time.time() * 1000)
+
+def _get_version():
+    return cache.get_or_set(VERSION_KEY, _new_version, timeout=None)
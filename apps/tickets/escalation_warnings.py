@@ -0,0 +1,150 @@
+"""
+Advertencias previas al escalamiento.
+
+Cada regla define con cuántos minutos de antelación (warning_minutes) se advierte al responsable
+de que el ticket va a escalar al nivel de la regla. Los candidatos salen de una consulta por rango
+sobre next_escalation_at (índice parcial ticket_pending_escalation_idx) con la mayor antelación
+configurada como ventana; la regla de cada ticket se resuelve con la configuración compilada.
+El barrido es periódico (ESCALATION_WARNING_INTERVAL): se advierte a todo ticket cuya antelación
+empieza antes del siguiente barrido, de modo que las antelaciones más cortas que el intervalo
+no se pierden entre dos ejecuciones.
+escalation_warning_sent_for guarda el vencimiento advertido: si el ticket se reprograma, deja de
+coincidir con next_escalation_at y la advertencia se vuelve a enviar para el nuevo vencimiento.
+Las marcas se guardan con un bulk_update por bloque y cada destinatario recibe un solo email por
+ejecución con todos sus tickets.
+"""
+from datetime import timedelta
+from django.conf import settings as django_settings
+from django.contrib.auth import get_user_model
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Ticket
+from .escalation_config import get_escalation_config
+import logging
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ['OPEN', 'IN_PROGRESS']
+
+# Campos necesarios para decidir y redactar una advertencia
+WARNING_FIELDS = [
+    'id', 'reference', 'title', 'company_id', 'priority', 'assigned_to_id',
+    'escalation_level', 'next_escalation_at', 'escalation_warning_sent_for',
+]
+
+def get_warning_candidates(now, window_end):
+    """Tickets que escalan entre `now` y `window_end` sin advertencia enviada para ese vencimiento"""
+    return Ticket.objects.filter(
+        status__in=ACTIVE_STATUSES,
+        escalation_paused=False,
+        next_escalation_at__gt=now,
+        next_escalation_at__lte=window_end,
+    ).filter(
+        Q(escalation_warning_sent_for__isnull=True) | ~Q(escalation_warning_sent_for=F('next_escalation_at'))
+    )
+
+def get_warning_rule(ticket, horizon, config):
+    """Regla del próximo nivel si su antelación de advertencia empieza antes de `horizon`, o None"""
+    rule = config.get_rule(ticket.company_id, ticket.priority, ticket.escalation_level + 1)
+    if rule is None or not rule.warning_minutes:
+        return None
+    if ticket.next_escalation_at - timedelta(minutes=rule.warning_minutes) > horizon:
+        return None
+    return rule
+
+def send_escalation_warnings(now=None, batch_size=None):
+    """
+    Advierte de los escalamientos próximos en bloques de `batch_size` (ESCALATION_BATCH_SIZE) y
+    encola un solo envío con un email por destinatario. Retorna el número de tickets advertidos.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or getattr(django_settings, 'ESCALATION_BATCH_SIZE', 500)
+    if not getattr(django_settings, 'ESCALATION_WARNINGS_ENABLED', True):
+        return 0
+
+    config = get_escalation_config()
+    if not config.max_warning_minutes:
+        return 0
+
+    # Horizonte: el siguiente barrido, que llegaría tarde a las antelaciones que empiezan antes
+    horizon = now + timedelta(seconds=getattr(django_settings, 'ESCALATION_WARNING_INTERVAL', 1800))
+    candidates = get_warning_candidates(now, horizon + timedelta(minutes=config.max_warning_minutes))
+    digests = {}
+    warned_count = 0
+    last = None
+    while True:
+        # Recorrido por (next_escalation_at, id): los candidatos aún fuera de su antelación no se marcan
+        chunk_qs = candidates
+        if last is not None:
+            chunk_qs = chunk_qs.filter(
+                Q(next_escalation_at__gt=last[0]) | Q(next_escalation_at=last[0], id__gt=last[1])
+            )
+        chunk = list(chunk_qs.order_by('next_escalation_at', 'id').only(*WARNING_FIELDS)[:batch_size])
+        if not chunk:
+            break
+        last = (chunk[-1].next_escalation_at, chunk[-1].id)
+
+        warned = []
+        for ticket in chunk:
+            rule = get_warning_rule(ticket, horizon, config)
+            if rule is not None:
+                warned.append((ticket, rule))
+
+        if warned:
+            add_warnings_to_digests(digests, warned, now)
+            for ticket, rule in warned:
+                # El vencimiento leído: si cambió mientras tanto, la advertencia queda rearmada
+                ticket.escalation_warning_sent_for = ticket.next_escalation_at
+            Ticket.objects.bulk_update([ticket for ticket, rule in warned], ['escalation_warning_sent_for'])
+            warned_count += len(warned)
+
+        if len(chunk) < batch_size:
+            break
+
+    if digests:
+        dispatch_warning_digests(digests)
+    logger.info(f"Advertencias de escalamiento: {warned_count} tickets, {len(digests)} destinatarios")
+    return warned_count
+
+def add_warnings_to_digests(digests, warned, now):
+    """
+    Agrega las advertencias de un bloque al resumen de cada destinatario: el asignado o, si el
+    ticket no tiene asignado, los administradores de su empresa y los superadmins
+    """
+    company_admins = {}
+    superadmin_ids = []
+    unassigned_companies = {ticket.company_id for ticket, rule in warned if not ticket.assigned_to_id}
+    if unassigned_companies:
+        User = get_user_model()
+        for user_id, company_id in User.objects.filter(
+            role='COMPANY_ADMIN', is_active=True, company_id__in=unassigned_companies
+        ).values_list('id', 'company_id'):
+            company_admins.setdefault(company_id, []).append(user_id)
+        # Los superadmins no pertenecen a ninguna empresa
+        superadmin_ids = list(User.objects.filter(role='SUPERADMIN', is_active=True).values_list('id', flat=True))
+
+    for ticket, rule in warned:
+        recipients = [ticket.assigned_to_id] if ticket.assigned_to_id else company_admins.get(ticket.company_id, []) + superadmin_ids
+        warning = {
+            'ticket_id': ticket.id,
+            'reference': ticket.reference,
+            'title': ticket.title,
+            'level': rule.level,
+            'escalate_to': str(rule.escalate_to) if rule.escalate_to_id else '',
+            'escalate_at': ticket.next_escalation_at.isoformat(),
+            'minutes_remaining': int((ticket.next_escalation_at - now).total_seconds() // 60),
+        }
+        for recipient_id in recipients:
+            digests.setdefault(recipient_id, []).append(warning)
+
+def dispatch_warning_digests(digests):
+    """Encola los resúmenes de advertencias de la ejecución en una sola tarea de email"""
+    from apps.notifications.tasks import send_email_notification_async
+
+    try:
+        send_email_notification_async.delay(
+            'escalation_warning_digest',
+            digests=[{'recipient_id': recipient_id, 'warnings': warnings} for recipient_id, warnings in digests.items()]
+        )
+    except Exception as e:
+        logger.error(f"Error encolando advertencias de escalamiento para {len(digests)} destinatarios: {e}")
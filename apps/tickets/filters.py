@@ -1,8 +1,7 @@
 import django_filters
 from django import forms
-from django.db.models import Q
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
 from .models import Ticket
+from .search import TicketSearchEngine
 from apps.companies.models import Company
 from apps.users.models import User
 
@@ -11,6 +10,8 @@ class TicketFilter(django_filters.FilterSet):
         method='filter_search',
         widget=forms.TextInput(attrs={
             'placeholder': 'Buscar en título, descripción, referencia o mensajes...',
+            'list': 'ticket-autocomplete',
+            'autocomplete': 'off',
             'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent'
         })
     )
@@ -63,40 +64,26 @@ class TicketFilter(django_filters.FilterSet):
         model = Ticket
         fields = ['search', 'status', 'priority', 'company', 'assigned_to', 'created_at', 'updated_at']
 
+    def filter_queryset(self, queryset):
+        """
+        Aplica la búsqueda después de los demás filtros, de modo que el resultado
+        (ids ordenados por relevancia) pueda cachearse por combinación de filtros
+        """
+        for name, value in self.form.cleaned_data.items():
+            if name != 'search':
+                queryset = self.filters[name].filter(queryset, value)
+        return self.filter_search(queryset, 'search', self.form.cleaned_data.get('search'))
+
     def filter_search(self, queryset, name, value):
         """
-        Búsqueda inteligente con PostgreSQL full-text search y fallback para SQLite
+        Búsqueda inteligente delegada al backend de búsqueda configurado
         """
         if not value:
             return queryset
         
-        # Detectar si estamos usando PostgreSQL
-        from django.conf import settings
-        db_engine = settings.DATABASES['default']['ENGINE']
-        
-        if 'postgresql' in db_engine:
-            search_vector = SearchVector(
-                title='A',
-                description='B', 
-                reference='A',
-                messages__content='C'
-            )
-            search_query = SearchQuery(value)
-            
-            return queryset.annotate(
-                search=search_vector,
-                rank=SearchRank(search_vector, search_query)
-            ).filter(
-                search=search_query
-            ).order_by('-rank', '-updated_at').distinct()
-        else:
-            # Fallback para SQLite con búsqueda básica
-            return queryset.filter(
-                Q(title__icontains=value) |
-                Q(description__icontains=value) |
-                Q(reference__icontains=value) |
-                Q(messages__content__icontains=value)
-            ).distinct()
+        user = self.request.user if self.request and self.request.user.is_authenticated else None
+        filters = {key: val for key, val in self.form.cleaned_data.items() if key != 'search'}
+        return TicketSearchEngine.search(queryset, value, user=user, filters=filters)
 
     def __init__(self, data=None, queryset=None, *, request=None, prefix=None):
         super().__init__(data, queryset, request=request, prefix=prefix)
@@ -1,6 +1,9 @@
 from django import forms
+from zoneinfo import available_timezones
 from django.contrib.auth import get_user_model
 from .models import EscalationRule, EscalationSettings
+from .business_calendar import parse_holidays
+from .simulation import parse_rule_overrides
 from apps.companies.models import Company
 
 User = get_user_model()
@@ -9,7 +12,7 @@ class EscalationRuleForm(forms.ModelForm):
     class Meta:
         model = EscalationRule
         fields = [
-            'company', 'priority', 'level', 'hours_to_escalate', 
+            'company', 'priority', 'level', 'hours_to_escalate', 'warning_minutes',
             'escalate_to', 'notification_template', 'is_active'
         ]
         widgets = {
@@ -30,6 +33,11 @@ class EscalationRuleForm(forms.ModelForm):
                 'min': '0.5',
                 'step': '0.5'
             }),
+            'warning_minutes': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': '0',
+                'step': '15'
+            }),
             'escalate_to': forms.Select(attrs={
                 'class': 'form-control'
             }),
@@ -58,6 +66,7 @@ class EscalationRuleForm(forms.ModelForm):
         # Ayuda contextual
         self.fields['level'].help_text = "Nivel de escalamiento (1 = primer escalamiento)"
         self.fields['hours_to_escalate'].help_text = "Horas sin respuesta antes de escalar"
+        self.fields['warning_minutes'].help_text = "Minutos antes del escalamiento para advertir al responsable (0 = sin advertencia)"
         self.fields['notification_template'].help_text = "Mensaje personalizado para notificaciones (opcional)"
 
 class EscalationSettingsForm(forms.ModelForm):
@@ -82,7 +91,7 @@ class EscalationSettingsForm(forms.ModelForm):
         model = EscalationSettings
         fields = [
             'company', 'enabled', 'business_hours_only', 'business_start_hour',
-            'business_end_hour', 'business_days', 'max_escalation_level',
+            'business_end_hour', 'business_days', 'timezone', 'holidays', 'max_escalation_level',
             'auto_assign_on_escalation', 'pause_on_response', 'email_notifications'
         ]
         widgets = {
@@ -105,6 +114,14 @@ class EscalationSettingsForm(forms.ModelForm):
                 'min': '0',
                 'max': '23'
             }),
+            'timezone': forms.Select(attrs={
+                'class': 'form-control'
+            }),
+            'holidays': forms.Textarea(attrs={
+                'class': 'form-control',
+                'rows': 4,
+                'placeholder': '2026-12-25'
+            }),
             'max_escalation_level': forms.NumberInput(attrs={
                 'class': 'form-control',
                 'min': '1',
@@ -138,12 +155,42 @@ class EscalationSettingsForm(forms.ModelForm):
             if self.instance.business_days:
                 self.fields['business_days'].initial = self.instance.get_business_days_list()
         
+        # Zonas horarias disponibles en el sistema
+        self.fields['timezone'].widget.choices = [(name, name) for name in sorted(available_timezones())]
+        
         # Ayuda contextual
         self.fields['business_hours_only'].help_text = "Solo escalar durante horario laboral"
         self.fields['max_escalation_level'].help_text = "Nivel máximo de escalamiento permitido"
         self.fields['auto_assign_on_escalation'].help_text = "Asignar automáticamente al usuario del escalamiento"
         self.fields['pause_on_response'].help_text = "Pausar escalamiento cuando hay respuesta"
     
+    def clean_timezone(self):
+        timezone_name = self.cleaned_data.get('timezone')
+        if timezone_name not in available_timezones():
+            raise forms.ValidationError("Zona horaria no válida")
+        return timezone_name
+    
+    def clean_holidays(self):
+        holidays = self.cleaned_data.get('holidays', '')
+        try:
+            dates = parse_holidays(holidays)
+        except ValueError:
+            raise forms.ValidationError("Use fechas en formato AAAA-MM-DD, una por línea")
+        return '\n'.join(day.isoformat() for day in dates)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        start_hour = cleaned_data.get('business_start_hour')
+        end_hour = cleaned_data.get('business_end_hour')
+        
+        if cleaned_data.get('business_hours_only'):
+            if start_hour is not None and end_hour is not None and start_hour >= end_hour:
+                self.add_error('business_end_hour', "La hora de fin debe ser posterior a la hora de inicio")
+            if not cleaned_data.get('business_days'):
+                self.add_error('business_days', "Seleccione al menos un día laboral")
+        
+        return cleaned_data
+    
     def save(self, commit=True):
         instance = super().save(commit=False)
         
@@ -155,3 +202,67 @@ class EscalationSettingsForm(forms.ModelForm):
             instance.save()
         
         return instance
+
+
+class EscalationSimulationForm(forms.Form):
+    """Parámetros candidatos del simulador de escalamiento"""
+    months = forms.IntegerField(
+        min_value=1, max_value=24, initial=3,
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+        help_text="Meses de historial a reproducir"
+    )
+    company = forms.ModelChoiceField(
+        queryset=Company.objects.all(), required=False, empty_label="Todas las empresas",
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    rules = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 4, 'placeholder': 'HIGH:1:8'}),
+        help_text="Horas candidatas por regla: PRIORIDAD:NIVEL:HORAS, una por línea"
+    )
+    max_escalation_level = forms.IntegerField(
+        min_value=1, max_value=10, required=False,
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+        help_text="Vacío para mantener el de cada configuración"
+    )
+    business_hours = forms.ChoiceField(
+        choices=[('', 'Según configuración'), ('on', 'Solo horario laboral'), ('off', '24x7')],
+        required=False, widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    business_start_hour = forms.IntegerField(
+        min_value=0, max_value=23, required=False,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    business_end_hour = forms.IntegerField(
+        min_value=1, max_value=24, required=False,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    
+    def clean_rules(self):
+        try:
+            return parse_rule_overrides(self.cleaned_data.get('rules', ''))
+        except ValueError as e:
+            raise forms.ValidationError(str(e))
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        start_hour = cleaned_data.get('business_start_hour')
+        end_hour = cleaned_data.get('business_end_hour')
+        
+        if start_hour is not None and end_hour is not None and start_hour >= end_hour:
+            self.add_error('business_end_hour', "La hora de fin debe ser posterior a la hora de inicio")
+        
+        return cleaned_data
+    
+    def get_settings_overrides(self):
+        """Campos de EscalationSettings que la simulación reemplaza en todas las configuraciones"""
+        overrides = {}
+        if self.cleaned_data.get('max_escalation_level') is not None:
+            overrides['max_escalation_level'] = self.cleaned_data['max_escalation_level']
+        if self.cleaned_data.get('business_hours'):
+            overrides['business_hours_only'] = self.cleaned_data['business_hours'] == 'on'
+        if self.cleaned_data.get('business_start_hour') is not None:
+            overrides['business_start_hour'] = self.cleaned_data['business_start_hour']
+        if self.cleaned_data.get('business_end_hour') is not None:
+            overrides['business_end_hour'] = self.cleaned_data['business_end_hour']
+        return overrides
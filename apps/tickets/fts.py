@@ -0,0 +1,123 @@
+"""
+Índice de búsqueda FTS5 para SQLite (modo DEBUG e instalaciones pequeñas).
+
+La tabla virtual `tickets_ticket_fts` guarda una fila por ticket (rowid = id del ticket) con la
+referencia, el título, la descripción y el texto concatenado de sus mensajes, y se mantiene
+sincronizada mediante triggers sobre tickets_ticket y tickets_ticketmessage.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'tickets_ticket_fts'
+
+FTS_TRIGGERS = {
+    'tickets_ticket_fts_insert': f"""
+        CREATE TRIGGER IF NOT EXISTS tickets_ticket_fts_insert AFTER INSERT ON tickets_ticket BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, reference, title, description, messages)
+            VALUES (NEW.id, NEW.reference, NEW.title, NEW.description, '');
+        END
+    """,
+    'tickets_ticket_fts_update': f"""
+        CREATE TRIGGER IF NOT EXISTS tickets_ticket_fts_update
+        AFTER UPDATE OF reference, title, description ON tickets_ticket
+        WHEN OLD.reference IS NOT NEW.reference OR OLD.title IS NOT NEW.title OR OLD.description IS NOT NEW.description
+        BEGIN
+            UPDATE {FTS_TABLE}
+            SET reference = NEW.reference, title = NEW.title, description = NEW.description
+            WHERE rowid = NEW.id;
+        END
+    """,
+    'tickets_ticket_fts_delete': f"""
+        CREATE TRIGGER IF NOT EXISTS tickets_ticket_fts_delete AFTER DELETE ON tickets_ticket BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;
+        END
+    """,
+    'tickets_ticketmessage_fts_insert': f"""
+        CREATE TRIGGER IF NOT EXISTS tickets_ticketmessage_fts_insert AFTER INSERT ON tickets_ticketmessage BEGIN
+            UPDATE {FTS_TABLE} SET messages = messages || ' ' || NEW.content WHERE rowid = NEW.ticket_id;
+        END
+    """,
+    'tickets_ticketmessage_fts_update': f"""
+        CREATE TRIGGER IF NOT EXISTS tickets_ticketmessage_fts_update
+        AFTER UPDATE OF content, ticket_id ON tickets_ticketmessage BEGIN
+            UPDATE {FTS_TABLE}
+            SET messages = coalesce(
+                (SELECT group_concat(content, ' ') FROM tickets_ticketmessage WHERE ticket_id = {FTS_TABLE}.rowid), ''
+            )
+            WHERE rowid IN (OLD.ticket_id, NEW.ticket_id);
+        END
+    """,
+    'tickets_ticketmessage_fts_delete': f"""
+        CREATE TRIGGER IF NOT EXISTS tickets_ticketmessage_fts_delete AFTER DELETE ON tickets_ticketmessage BEGIN
+            UPDATE {FTS_TABLE}
+            SET messages = coalesce(
+                (SELECT group_concat(content, ' ') FROM tickets_ticketmessage WHERE ticket_id = OLD.ticket_id), ''
+            )
+            WHERE rowid = OLD.ticket_id;
+        END
+    """,
+}
+
+def fts5_available(connection):
+    """Indica si la conexión es SQLite compilado con FTS5"""
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+
+def fts_index_exists(connection):
+    """Indica si la tabla virtual FTS5 de tickets existe"""
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+def install_fts_index(connection, rebuild=False):
+    """
+    Crea (si falta) la tabla FTS5 y sus triggers. Es idempotente: se ejecuta en la migración y
+    después de cada `migrate`, ya que SQLite elimina los triggers al reconstruir tickets_ticket.
+
+    Si la tabla es nueva, faltaba algún trigger o `rebuild` es True, el índice se repuebla completo.
+    """
+    if not fts5_available(connection):
+        logger.info('SQLite sin soporte FTS5: se usará la búsqueda básica')
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existing_triggers = {row[0] for row in cursor.fetchall()}
+        needs_rebuild = rebuild or not fts_index_exists(connection) or set(FTS_TRIGGERS) - existing_triggers
+
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+                reference, title, description, messages,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+        """)
+        for trigger_sql in FTS_TRIGGERS.values():
+            cursor.execute(trigger_sql)
+
+        if needs_rebuild:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(f"""
+                INSERT INTO {FTS_TABLE}(rowid, reference, title, description, messages)
+                SELECT t.id, t.reference, t.title, t.description,
+                       coalesce((SELECT group_concat(m.content, ' ') FROM tickets_ticketmessage m WHERE m.ticket_id = t.id), '')
+                FROM tickets_ticket t
+            """)
+            logger.info('Índice FTS5 de tickets reconstruido')
+
+    return True
+
+def drop_fts_index(connection):
+    """Elimina la tabla FTS5 y sus triggers"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for trigger_name in FTS_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger_name}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
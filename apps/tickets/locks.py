@@ -0,0 +1,219 @@
+"""
+Locks de ejecución para tareas periódicas.
+
+`single_instance` impide que dos ejecuciones de la misma tarea se solapen (una ejecución lenta
+y la siguiente del beat, o dos procesos beat). Backends (TASK_LOCK_BACKEND):
+
+- RedisTaskLock: SET NX con TTL; un hilo renueva el TTL mientras la tarea sigue viva, y la
+  renovación y la liberación solo actúan si el token sigue siendo el nuestro.
+- PostgresAdvisoryTaskLock: pg_try_advisory_lock en la sesión de la conexión de la tarea;
+  se libera solo si el worker muere.
+- MemoryTaskLock: diccionario del proceso, para tests y desarrollo.
+
+Las ejecuciones omitidas se cuentan por tarea en la caché (ver get_skipped_runs).
+"""
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+import functools
+import hashlib
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+SKIPPED_KEY_PREFIX = 'task_lock:skipped'
+
+class BaseTaskLock:
+    """Interfaz común de los backends de lock"""
+    # False si el lock no expira y no necesita renovarse
+    renews = True
+
+    def acquire(self, name, token, ttl):
+        raise NotImplementedError
+
+    def renew(self, name, token, ttl):
+        raise NotImplementedError
+
+    def release(self, name, token):
+        raise NotImplementedError
+
+class MemoryTaskLock(BaseTaskLock):
+    """Locks con vencimiento en memoria del proceso"""
+
+    def __init__(self):
+        self.locks = {}
+        self.mutex = threading.Lock()
+
+    def acquire(self, name, token, ttl):
+        with self.mutex:
+            current = self.locks.get(name)
+            if current and current[1] > time.monotonic():
+                return False
+            self.locks[name] = (token, time.monotonic() + ttl)
+            return True
+
+    def renew(self, name, token, ttl):
+        with self.mutex:
+            if self.locks.get(name, (None,))[0] != token:
+                return False
+            self.locks[name] = (token, time.monotonic() + ttl)
+            return True
+
+    def release(self, name, token):
+        with self.mutex:
+            if self.locks.get(name, (None,))[0] == token:
+                del self.locks[name]
+
+class RedisTaskLock(BaseTaskLock):
+    """SET NX EX en Redis, con renovación y liberación condicionadas al token"""
+    key_prefix = 'task_lock'
+
+    RENEW_SCRIPT = """
+        if redis.call('GET', KEYS[1]) == ARGV[1] then
+            return redis.call('EXPIRE', KEYS[1], ARGV[2])
+        end
+        return 0
+    """
+    RELEASE_SCRIPT = """
+        if redis.call('GET', KEYS[1]) == ARGV[1] then
+            return redis.call('DEL', KEYS[1])
+        end
+        return 0
+    """
+
+    def __init__(self):
+        import redis
+
+        url = getattr(settings, 'TASK_LOCK_REDIS_URL', 'redis://localhost:6379/3')
+        self.client = redis.Redis.from_url(url)
+        self.renew_script = self.client.register_script(self.RENEW_SCRIPT)
+        self.release_script = self.client.register_script(self.RELEASE_SCRIPT)
+
+    def key(self, name):
+        return f'{self.key_prefix}:{name}'
+
+    def acquire(self, name, token, ttl):
+        return bool(self.client.set(self.key(name), token, nx=True, ex=ttl))
+
+    def renew(self, name, token, ttl):
+        return bool(self.renew_script(keys=[self.key(name)], args=[token, ttl]))
+
+    def release(self, name, token):
+        self.release_script(keys=[self.key(name)], args=[token])
+
+class PostgresAdvisoryTaskLock(BaseTaskLock):
+    """Advisory lock de sesión de PostgreSQL sobre un entero derivado del nombre"""
+    renews = False
+
+    def lock_id(self, name):
+        # 63 bits para caber en el bigint con signo de pg_try_advisory_lock
+        return int(hashlib.md5(name.encode()).hexdigest()[:15], 16)
+
+    def acquire(self, name, token, ttl):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", [self.lock_id(name)])
+            return cursor.fetchone()[0]
+
+    def renew(self, name, token, ttl):
+        return True
+
+    def release(self, name, token):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [self.lock_id(name)])
+
+_backend_cache = {}
+
+def get_task_lock_backend(path=None):
+    """Instancia del backend configurado en TASK_LOCK_BACKEND (una por proceso)"""
+    path = path or getattr(settings, 'TASK_LOCK_BACKEND', 'apps.tickets.locks.MemoryTaskLock')
+    if path not in _backend_cache:
+        _backend_cache[path] = import_string(path)()
+    return _backend_cache[path]
+
+def reset_task_lock_backends():
+    _backend_cache.clear()
+
+@contextmanager
+def task_lock(name, ttl=None):
+    """
+    Toma el lock `name` durante el bloque; produce True si se obtuvo y False si otra ejecución
+    lo tiene. Mientras se ejecuta, un hilo renueva el TTL cada tercio de su duración.
+    """
+    ttl = ttl or getattr(settings, 'TASK_LOCK_TTL', 300)
+    backend = get_task_lock_backend()
+    token = uuid.uuid4().hex
+
+    if not backend.acquire(name, token, ttl):
+        yield False
+        return
+
+    stop = threading.Event()
+    renewer = None
+    if backend.renews:
+        def renew():
+            while not stop.wait(ttl / 3):
+                try:
+                    if not backend.renew(name, token, ttl):
+                        logger.warning(f'Lock {name} perdido antes de terminar la tarea')
+                        return
+                except Exception as e:
+                    logger.error(f'Error renovando el lock {name}: {e}')
+        renewer = threading.Thread(target=renew, name=f'task-lock-{name}', daemon=True)
+        renewer.start()
+
+    try:
+        yield True
+    finally:
+        stop.set()
+        if renewer:
+            renewer.join(timeout=1)
+        try:
+            backend.release(name, token)
+        except Exception as e:
+            logger.error(f'Error liberando el lock {name}: {e}')
+
+def single_instance(name=None, ttl=None):
+    """
+    Decorador para tareas periódicas (debajo de @shared_task): si otra ejecución con el mismo
+    lock está en curso, esta se omite, se registra y retorna None. Tareas que no deben solaparse
+    entre sí pueden compartir `name`.
+    """
+    def decorator(func):
+        lock_name = name or f'{func.__module__}.{func.__name__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with task_lock(lock_name, ttl) as acquired:
+                if not acquired:
+                    record_skipped_run(lock_name)
+                    return None
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_skipped_run(name):
+    """Cuenta una ejecución omitida de `name` y guarda cuándo ocurrió"""
+    key = f'{SKIPPED_KEY_PREFIX}:{name}'
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+        count = 1
+    cache.set(f'{key}:last', timezone.now().isoformat(), timeout=None)
+    logger.warning(f'Ejecución de {name} omitida: otra ejecución tiene el lock ({count} omitidas en total)')
+
+def get_skipped_runs(names):
+    """Métricas de ejecuciones omitidas: {nombre: {'count': n, 'last': iso o None}}"""
+    return {
+        name: {
+            'count': cache.get(f'{SKIPPED_KEY_PREFIX}:{name}', 0),
+            'last': cache.get(f'{SKIPPED_KEY_PREFIX}:{name}:last'),
+        }
+        for name in names
+    }
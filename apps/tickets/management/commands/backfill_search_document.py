@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.conf import settings
+from apps.tickets.fts import install_fts_index
+
+class Command(BaseCommand):
+    help = 'Rellena la columna search_document de los tickets existentes por lotes (PostgreSQL) o reconstruye el índice FTS5 (SQLite)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tickets por lote')
+        parser.add_argument('--only-missing', action='store_true', help='Solo tickets sin documento de búsqueda')
+
+    def handle(self, *args, **options):
+        db_engine = settings.DATABASES['default']['ENGINE']
+        
+        if 'sqlite' in db_engine:
+            if install_fts_index(connection, rebuild=True):
+                self.stdout.write(self.style.SUCCESS('Índice FTS5 de tickets reconstruido'))
+            else:
+                self.stdout.write(self.style.WARNING('SQLite sin soporte FTS5. Saltando...'))
+            return
+
+        if 'postgresql' not in db_engine:
+            self.stdout.write(
+                self.style.WARNING('Este comando solo funciona con PostgreSQL. Saltando...')
+            )
+            return
+
+        batch_size = options['batch_size']
+        missing_filter = 'AND search_document IS NULL' if options['only_missing'] else ''
+        last_id = 0
+        total = 0
+
+        while True:
+            # Cada lote se procesa en su propia transacción para no bloquear la tabla completa
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    SELECT max(id), count(*) FROM (
+                        SELECT id FROM tickets_ticket
+                        WHERE id > %s {missing_filter}
+                        ORDER BY id
+                        LIMIT %s
+                    ) AS batch
+                    """,
+                    [last_id, batch_size]
+                )
+                batch_end, batch_count = cursor.fetchone()
+                if not batch_count:
+                    break
+
+                cursor.execute(
+                    f"""
+                    UPDATE tickets_ticket
+                    SET search_document = tickets_build_search_document(id, reference, title, description)
+                    WHERE id > %s AND id <= %s {missing_filter}
+                    """,
+                    [last_id, batch_end]
+                )
+
+            total += batch_count
+            last_id = batch_end
+            self.stdout.write(f'Procesados {total} tickets (hasta id {last_id})')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Documento de búsqueda actualizado para {total} tickets')
+        )
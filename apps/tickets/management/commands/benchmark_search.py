@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from apps.tickets.models import Ticket
+from apps.tickets.search import get_search_backend, get_available_search_backends
+from apps.tickets.autocomplete import PrefixIndex
+import statistics
+import time
+
+class Command(BaseCommand):
+    help = 'Compara el rendimiento de los backends de búsqueda de tickets disponibles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='+', help='Textos de búsqueda a medir')
+        parser.add_argument('--backend', action='append', dest='backends', help='Ruta del backend (repetible); por defecto todos los disponibles')
+        parser.add_argument('--repeat', type=int, default=5, help='Repeticiones por consulta')
+        parser.add_argument('--page-size', type=int, default=20, help='Resultados leídos por consulta')
+        parser.add_argument('--autocomplete', action='store_true', help='Medir el autocompletado (backends e índice en memoria) en lugar de la búsqueda')
+
+    def handle(self, *args, **options):
+        backends = options['backends'] or get_available_search_backends()
+        repeat = options['repeat']
+        page_size = options['page_size']
+
+        if options['autocomplete']:
+            self.benchmark_autocomplete(backends, options['queries'], repeat, page_size)
+            return
+
+        for path in backends:
+            backend = get_search_backend(path)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Backend: {path}'))
+
+            for query_text in options['queries']:
+                timings = []
+                results = 0
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    ids = list(backend.search(Ticket.objects.all(), query_text).values_list('id', flat=True)[:page_size])
+                    timings.append((time.perf_counter() - start) * 1000)
+                    results = len(ids)
+
+                self.stdout.write(
+                    f'  "{query_text}": {results} resultados | '
+                    f'mediana {statistics.median(timings):.2f} ms | '
+                    f'mín {min(timings):.2f} ms | máx {max(timings):.2f} ms'
+                )
+
+    def benchmark_autocomplete(self, backends, queries, repeat, limit):
+        # Cada consulta se mide también con sus prefijos, como al escribir letra por letra
+        prefixes = [query[:n] for query in queries for n in range(2, len(query) + 1)]
+
+        start = time.perf_counter()
+        index = PrefixIndex(Ticket.objects.order_by().values_list('id', 'reference', 'title', 'company_id', 'created_by_id'))
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'Índice en memoria: {len(index)} tickets, construido en {(time.perf_counter() - start) * 1000:.2f} ms'
+        ))
+        self.report_autocomplete(lambda text: index.search(text, limit=limit), prefixes, repeat)
+
+        for path in backends:
+            backend = get_search_backend(path)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Backend: {path}'))
+            self.report_autocomplete(lambda text: backend.autocomplete(Ticket.objects.all(), text, limit), prefixes, repeat)
+
+    def report_autocomplete(self, lookup, prefixes, repeat):
+        timings = []
+        for _ in range(repeat):
+            for text in prefixes:
+                start = time.perf_counter()
+                lookup(text)
+                timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f'  {len(timings)} consultas | mediana {statistics.median(timings):.2f} ms | '
+            f'p99 {p99:.2f} ms | máx {timings[-1]:.2f} ms'
+        )
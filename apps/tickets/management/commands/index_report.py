@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from apps.tickets.models import Ticket
+from apps.tickets.escalation_warnings import get_warning_candidates
+from datetime import timedelta
+
+class Command(BaseCommand):
+    help = 'Muestra qué índices usan las consultas más frecuentes sobre tickets (EXPLAIN)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plan', action='store_true', help='Mostrar el plan completo de cada consulta')
+
+    def get_hot_queries(self):
+        """Consultas representativas de la lista, el dashboard, las tareas de escalamiento y el SLA"""
+        sample = Ticket.objects.order_by('-id').values('company_id', 'created_by_id', 'assigned_to_id').first() or {}
+        company_id = sample.get('company_id') or 0
+        created_by_id = sample.get('created_by_id') or 0
+        assigned_to_id = sample.get('assigned_to_id') or 0
+        now = timezone.now()
+        active = ['OPEN', 'IN_PROGRESS']
+
+        return [
+            ('Lista global (cursor)', 'ticket_updated_id_idx',
+             Ticket.objects.order_by('-updated_at', '-id')[:20]),
+            ('Lista de empresa por estado', 'ticket_company_status_upd_idx',
+             Ticket.objects.filter(company_id=company_id, status='OPEN').order_by('-updated_at')[:20]),
+            ('Lista de empleado', 'ticket_creator_updated_idx',
+             Ticket.objects.filter(created_by_id=created_by_id).order_by('-updated_at')[:20]),
+            ('Dashboard: tickets por técnico', 'ticket_assignee_status_idx',
+             Ticket.objects.filter(assigned_to_id=assigned_to_id, status__in=['RESOLVED', 'CLOSED'])),
+            ('process_ticket_escalations', 'ticket_pending_escalation_idx',
+             Ticket.objects.filter(status__in=active, escalation_paused=False, next_escalation_at__lte=now)),
+            ('send_escalation_warnings', 'ticket_pending_escalation_idx',
+             get_warning_candidates(now, now + timedelta(hours=1))),
+            ('check_sla_breaches', 'ticket_sla_due_idx',
+             Ticket.objects.filter(status__in=active, sla_due_at__lte=now)),
+        ]
+
+    def handle(self, *args, **options):
+        index_names = [index.name for index in Ticket._meta.indexes]
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Base de datos: {connection.vendor}'))
+
+        unused = set(index_names)
+        for label, expected, queryset in self.get_hot_queries():
+            plan = queryset.explain()
+            used = [name for name in index_names if name in plan]
+            unused -= set(used)
+
+            if expected in used:
+                style, status = self.style.SUCCESS, f'usa {", ".join(used)}'
+            elif used:
+                style, status = self.style.WARNING, f'usa {", ".join(used)} (se esperaba {expected})'
+            else:
+                style, status = self.style.ERROR, f'no usa índices del ticket (se esperaba {expected})'
+            self.stdout.write(style(f'{label}: {status}'))
+
+            if options['verbose_plan']:
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+        if unused:
+            self.stdout.write(self.style.WARNING(f'Índices no usados por estas consultas: {", ".join(sorted(unused))}'))
+        self.stdout.write(
+            'Nota: con pocas filas el planificador puede preferir un recorrido secuencial; '
+            'ejecute ANALYZE y revise el reporte con datos reales.'
+        )
+        if connection.vendor == 'sqlite':
+            self.stdout.write(
+                'Nota: SQLite no usa índices parciales cuando la condición llega como parámetros; '
+                'el índice ticket_pending_escalation_idx está pensado para PostgreSQL.'
+            )
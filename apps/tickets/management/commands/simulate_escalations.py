@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.tickets.simulation import parse_rule_overrides, simulate_escalations
+from datetime import timedelta
+
+class Command(BaseCommand):
+    help = 'Proyecta los escalamientos de los últimos meses con reglas y configuración candidatas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=3, help='Meses de historial a reproducir')
+        parser.add_argument('--rule', action='append', default=[], help='Horas candidatas PRIORIDAD:NIVEL:HORAS (repetible)')
+        parser.add_argument('--max-level', type=int, help='Nivel máximo de escalamiento candidato')
+        parser.add_argument('--business-hours', choices=['on', 'off'], help='Forzar horario laboral (on) o 24x7 (off)')
+        parser.add_argument('--start-hour', type=int, help='Hora de inicio del horario laboral candidato')
+        parser.add_argument('--end-hour', type=int, help='Hora de fin del horario laboral candidato')
+        parser.add_argument('--company', type=int, help='Simular solo los tickets de esta empresa')
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError('--months debe ser mayor que cero')
+        try:
+            rule_hours = parse_rule_overrides(' '.join(options['rule']))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        settings_overrides = {}
+        if options['max_level'] is not None:
+            settings_overrides['max_escalation_level'] = options['max_level']
+        if options['business_hours']:
+            settings_overrides['business_hours_only'] = options['business_hours'] == 'on'
+        if options['start_hour'] is not None:
+            settings_overrides['business_start_hour'] = options['start_hour']
+        if options['end_hour'] is not None:
+            settings_overrides['business_end_hour'] = options['end_hour']
+
+        since = timezone.now() - timedelta(days=30 * options['months'])
+        try:
+            result = simulate_escalations(since, rule_hours=rule_hours, settings_overrides=settings_overrides, company_id=options['company'])
+        except ValueError as e:
+            # Calendario candidato inválido (horario o días)
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Simulación desde {result['since']:%Y-%m-%d}: {result['tickets']} tickets, "
+            f"{result['escalations']} escalamientos en {result['escalated_tickets']} tickets "
+            f"({result['duration_seconds']:.2f} s)"
+        ))
+
+        self.stdout.write(self.style.MIGRATE_LABEL('Por nivel'))
+        for level, count in result['by_level']:
+            self.stdout.write(f'  Nivel {level}: {count}')
+
+        self.stdout.write(self.style.MIGRATE_LABEL('Por destinatario'))
+        for name, count in result['by_assignee']:
+            self.stdout.write(f'  {name}: {count}')
+
+        self.stdout.write(self.style.MIGRATE_LABEL('Por hora del día'))
+        for hour, count in enumerate(result['by_hour']):
+            if count:
+                self.stdout.write(f'  {hour:02d}:00  {count}')
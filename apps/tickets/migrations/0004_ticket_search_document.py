@@ -0,0 +1,107 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Construye el documento de búsqueda ponderado de un ticket, incluyendo el contenido de sus mensajes
+CREATE_SEARCH_DOCUMENT_SQL = """
+CREATE OR REPLACE FUNCTION tickets_build_search_document(
+    p_ticket_id bigint, p_reference text, p_title text, p_description text
+) RETURNS tsvector AS $$
+    SELECT
+        setweight(to_tsvector('simple', coalesce(p_reference, '')), 'A') ||
+        setweight(to_tsvector('spanish', coalesce(p_title, '')), 'A') ||
+        setweight(to_tsvector('spanish', coalesce(p_description, '')), 'B') ||
+        setweight(to_tsvector('spanish', coalesce(
+            (SELECT string_agg(content, ' ' ORDER BY id) FROM tickets_ticketmessage WHERE ticket_id = p_ticket_id),
+            ''
+        )), 'C');
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION tickets_ticket_search_document_trigger() RETURNS trigger AS $$
+BEGIN
+    NEW.search_document := tickets_build_search_document(NEW.id, NEW.reference, NEW.title, NEW.description);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION tickets_ticketmessage_search_document_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        -- Incremental: solo se agrega el vector del nuevo mensaje
+        UPDATE tickets_ticket
+        SET search_document = coalesce(search_document, ''::tsvector) ||
+                              setweight(to_tsvector('spanish', coalesce(NEW.content, '')), 'C')
+        WHERE id = NEW.ticket_id;
+        RETURN NULL;
+    END IF;
+
+    -- Edición o eliminación: recalcular el documento de los tickets afectados
+    IF TG_OP = 'UPDATE' THEN
+        UPDATE tickets_ticket
+        SET search_document = tickets_build_search_document(id, reference, title, description)
+        WHERE id IN (OLD.ticket_id, NEW.ticket_id);
+    ELSE
+        UPDATE tickets_ticket
+        SET search_document = tickets_build_search_document(id, reference, title, description)
+        WHERE id = OLD.ticket_id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tickets_ticket_search_document
+    BEFORE INSERT OR UPDATE OF reference, title, description ON tickets_ticket
+    FOR EACH ROW EXECUTE PROCEDURE tickets_ticket_search_document_trigger();
+
+CREATE TRIGGER tickets_ticketmessage_search_document_insert
+    AFTER INSERT ON tickets_ticketmessage
+    FOR EACH ROW EXECUTE PROCEDURE tickets_ticketmessage_search_document_trigger();
+
+CREATE TRIGGER tickets_ticketmessage_search_document_update
+    AFTER UPDATE OF content, ticket_id ON tickets_ticketmessage
+    FOR EACH ROW EXECUTE PROCEDURE tickets_ticketmessage_search_document_trigger();
+
+CREATE TRIGGER tickets_ticketmessage_search_document_delete
+    AFTER DELETE ON tickets_ticketmessage
+    FOR EACH ROW EXECUTE PROCEDURE tickets_ticketmessage_search_document_trigger();
+
+CREATE INDEX IF NOT EXISTS tickets_ticket_search_document_gin_idx
+    ON tickets_ticket USING gin(search_document);
+"""
+
+DROP_SEARCH_DOCUMENT_SQL = """
+DROP INDEX IF EXISTS tickets_ticket_search_document_gin_idx;
+DROP TRIGGER IF EXISTS tickets_ticketmessage_search_document_delete ON tickets_ticketmessage;
+DROP TRIGGER IF EXISTS tickets_ticketmessage_search_document_update ON tickets_ticketmessage;
+DROP TRIGGER IF EXISTS tickets_ticketmessage_search_document_insert ON tickets_ticketmessage;
+DROP TRIGGER IF EXISTS tickets_ticket_search_document ON tickets_ticket;
+DROP FUNCTION IF EXISTS tickets_ticketmessage_search_document_trigger();
+DROP FUNCTION IF EXISTS tickets_ticket_search_document_trigger();
+DROP FUNCTION IF EXISTS tickets_build_search_document(bigint, text, text, text);
+"""
+
+
+def create_search_document_triggers(apps, schema_editor):
+    # Los triggers y el índice GIN solo existen en PostgreSQL
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SEARCH_DOCUMENT_SQL)
+
+
+def drop_search_document_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH_DOCUMENT_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0003_emaillog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='search_document',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_document_triggers, drop_search_document_triggers),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from apps.tickets.fts import install_fts_index, drop_fts_index
+
+
+def create_fts_index(apps, schema_editor):
+    # La tabla FTS5 y sus triggers solo existen en SQLite
+    if schema_editor.connection.vendor == 'sqlite':
+        install_fts_index(schema_editor.connection)
+
+
+def remove_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        drop_fts_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0004_ticket_search_document'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, remove_fts_index),
+    ]
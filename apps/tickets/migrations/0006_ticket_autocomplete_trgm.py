@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Índices de trigramas sobre UPPER(columna), la expresión que Django genera para icontains,
+# usados por el autocompletado en PostgreSQL
+CREATE_TRGM_INDEXES_SQL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS tickets_ticket_title_upper_trgm_idx
+    ON tickets_ticket USING gin(UPPER(title::text) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS tickets_ticket_reference_upper_trgm_idx
+    ON tickets_ticket USING gin(UPPER(reference::text) gin_trgm_ops);
+"""
+
+DROP_TRGM_INDEXES_SQL = """
+DROP INDEX IF EXISTS tickets_ticket_reference_upper_trgm_idx;
+DROP INDEX IF EXISTS tickets_ticket_title_upper_trgm_idx;
+"""
+
+
+def create_trgm_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_TRGM_INDEXES_SQL)
+
+
+def drop_trgm_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TRGM_INDEXES_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0005_ticket_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trgm_indexes, drop_trgm_indexes),
+    ]
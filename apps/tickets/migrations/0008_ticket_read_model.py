@@ -0,0 +1,72 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, NullIf, Trim
+
+
+def backfill_read_model(apps, schema_editor):
+    # Relleno con un UPDATE por columna (sin recorrer los tickets en Python)
+    Ticket = apps.get_model('tickets', 'Ticket')
+    TicketMessage = apps.get_model('tickets', 'TicketMessage')
+    Company = apps.get_model('companies', 'Company')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    Ticket.objects.update(
+        company_name=Coalesce(Subquery(Company.objects.filter(pk=OuterRef('company_id')).values('name')[:1]), Value(''))
+    )
+
+    # Igual que User.get_full_name() con respaldo en username
+    display = User.objects.filter(pk=OuterRef('assigned_to_id')).annotate(
+        display=Coalesce(NullIf(Trim(Concat('first_name', Value(' '), 'last_name')), Value('')), F('username'))
+    ).values('display')[:1]
+    Ticket.objects.filter(assigned_to__isnull=False).update(assignee_display=Subquery(display))
+
+    public_messages = TicketMessage.objects.filter(ticket=OuterRef('pk'), private=False)
+    last_message = public_messages.order_by('-created_at', '-id')
+    Ticket.objects.update(
+        message_count=Coalesce(
+            Subquery(public_messages.order_by().values('ticket').annotate(total=Count('id')).values('total')),
+            Value(0)
+        ),
+        last_message_at=Subquery(last_message.values('created_at')[:1]),
+        last_message_sender_id=Subquery(last_message.values('sender_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('tickets', '0007_ticket_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Mensajes'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Último mensaje'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='last_message_sender',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Remitente del último mensaje'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='company_name',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Nombre de la compañía'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='assignee_display',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Nombre del asignado'),
+        ),
+        migrations.RunPython(backfill_read_model, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0008_ticket_read_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='escalationsettings',
+            name='timezone',
+            field=models.CharField(default='UTC', help_text='Zona horaria del horario laboral (ej. America/Mexico_City)', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='escalationsettings',
+            name='holidays',
+            field=models.TextField(blank=True, help_text='Feriados en formato AAAA-MM-DD, uno por línea'),
+        ),
+    ]
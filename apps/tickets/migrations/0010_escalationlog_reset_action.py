@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0009_escalationsettings_calendar'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='escalationlog',
+            name='action',
+            field=models.CharField(choices=[('escalated', 'Escalado'), ('assigned', 'Asignado'), ('paused', 'Pausado'), ('resumed', 'Reanudado'), ('reset', 'Reiniciado'), ('resolved', 'Resuelto')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,71 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('tickets', '0010_escalationlog_reset_action'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SLAPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('priority', models.CharField(choices=[('LOW', 'Baja'), ('MEDIUM', 'Media'), ('HIGH', 'Alta')], help_text='Prioridad del ticket', max_length=10)),
+                ('first_response_hours', models.PositiveIntegerField(help_text='Horas para la primera respuesta de un técnico')),
+                ('resolution_hours', models.PositiveIntegerField(help_text='Horas para resolver el ticket')),
+                ('business_hours_only', models.BooleanField(default=True, help_text='Contar solo horas laborales (calendario de escalamiento de la empresa)')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(blank=True, help_text='Empresa específica (null = política global)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sla_policies', to='companies.company')),
+            ],
+            options={
+                'verbose_name': 'Política de SLA',
+                'verbose_name_plural': 'Políticas de SLA',
+                'ordering': ['company', 'priority'],
+                'unique_together': {('company', 'priority')},
+            },
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='first_response_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Primera respuesta'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='first_response_due_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Vencimiento de primera respuesta'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='resolution_due_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Vencimiento de resolución'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='sla_due_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Próximo vencimiento de SLA'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='sla_breached',
+            field=models.BooleanField(default=False, editable=False, verbose_name='SLA incumplido'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='sla_breached_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='SLA incumplido en'),
+        ),
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='ticket_sla_check_idx',
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('sla_breached', False), ('status__in', ['OPEN', 'IN_PROGRESS'])), fields=['sla_due_at'], name='ticket_sla_due_idx'),
+        ),
+    ]
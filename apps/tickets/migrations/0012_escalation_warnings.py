@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0011_sla_policy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='escalationrule',
+            name='warning_minutes',
+            field=models.PositiveIntegerField(default=60, help_text='Minutos de antelación para advertir antes de escalar (0 = sin advertencia)'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='escalation_warning_sent_for',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Advertencia de escalamiento enviada para'),
+        ),
+    ]
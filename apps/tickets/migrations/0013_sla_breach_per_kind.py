@@ -0,0 +1,43 @@
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def backfill_breach_kind(apps, schema_editor):
+    """Asigna los incumplimientos ya registrados a su tipo y repone el vencimiento de resolución pendiente"""
+    Ticket = apps.get_model('tickets', 'Ticket')
+    breached = Ticket.objects.filter(sla_breached=True, sla_breached_at__isnull=False)
+    first_response = breached.filter(first_response_at__isnull=True, first_response_due_at__lte=models.F('sla_breached_at'))
+    first_response.update(first_response_breached_at=models.F('sla_breached_at'))
+    first_response.filter(resolution_due_at__gt=models.F('sla_breached_at'), status__in=['OPEN', 'IN_PROGRESS']).update(
+        sla_due_at=models.F('resolution_due_at')
+    )
+    breached.filter(first_response_breached_at__isnull=True).update(resolution_breached_at=models.F('sla_breached_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0012_escalation_warnings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='first_response_breached_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Primera respuesta incumplida en'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='resolution_breached_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Resolución incumplida en'),
+        ),
+        migrations.RunPython(backfill_breach_kind, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='ticket_sla_due_idx',
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=Q(('sla_due_at__isnull', False), ('status__in', ['OPEN', 'IN_PROGRESS'])), fields=['sla_due_at'], name='ticket_sla_due_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+from apps.tickets.fts import install_fts_index
+
+# El trigger de 0004 se disparaba en cada guardado completo (que escribe todas las columnas) y
+# recalculaba el documento con todos los mensajes. Ahora el recálculo en UPDATE solo ocurre si
+# cambia el texto indexado; WHEN no admite OLD en INSERT, por eso son dos triggers.
+CREATE_TICKET_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS tickets_ticket_search_document ON tickets_ticket;
+
+CREATE TRIGGER tickets_ticket_search_document_insert
+    BEFORE INSERT ON tickets_ticket
+    FOR EACH ROW EXECUTE PROCEDURE tickets_ticket_search_document_trigger();
+
+CREATE TRIGGER tickets_ticket_search_document_update
+    BEFORE UPDATE OF reference, title, description ON tickets_ticket
+    FOR EACH ROW
+    WHEN (OLD.reference IS DISTINCT FROM NEW.reference
+          OR OLD.title IS DISTINCT FROM NEW.title
+          OR OLD.description IS DISTINCT FROM NEW.description)
+    EXECUTE PROCEDURE tickets_ticket_search_document_trigger();
+"""
+
+DROP_TICKET_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS tickets_ticket_search_document_update ON tickets_ticket;
+DROP TRIGGER IF EXISTS tickets_ticket_search_document_insert ON tickets_ticket;
+
+CREATE TRIGGER tickets_ticket_search_document
+    BEFORE INSERT OR UPDATE OF reference, title, description ON tickets_ticket
+    FOR EACH ROW EXECUTE PROCEDURE tickets_ticket_search_document_trigger();
+"""
+
+
+def reinstall_fts_update_trigger(connection):
+    # CREATE TRIGGER IF NOT EXISTS no reemplaza el trigger existente: se elimina y se recrea
+    # con la definición actual de fts.py (el índice se repuebla al faltar un trigger)
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TRIGGER IF EXISTS tickets_ticket_fts_update")
+    install_fts_index(connection)
+
+
+def create_ticket_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_TICKET_TRIGGERS_SQL)
+    elif schema_editor.connection.vendor == 'sqlite':
+        reinstall_fts_update_trigger(schema_editor.connection)
+
+
+def restore_ticket_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TICKET_TRIGGERS_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0013_sla_breach_per_kind'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_ticket_triggers, restore_ticket_trigger),
+    ]
@@ -1,7 +1,12 @@
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.translation import gettext_lazy as _
 from apps.companies.models import Company
+from .stats import get_ticket_stats_state
+from .read_model import get_display_state
+from .business_calendar import BusinessCalendar
+from .scheduler import get_escalation_deadline
 import json
 
 class Ticket(models.Model):
@@ -31,14 +36,86 @@ class Ticket(models.Model):
     escalation_level = models.IntegerField(default=0, verbose_name=_('Nivel de escalamiento'), help_text=_("Nivel de escalamiento actual (0=sin escalar)"))
     next_escalation_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Próximo escalamiento'), help_text=_("Próxima fecha de escalamiento"))
     escalation_paused = models.BooleanField(default=False, verbose_name=_('Escalamiento pausado'), help_text=_("Si el escalamiento está pausado"))
+    # Documento de búsqueda (título, referencia, descripción y mensajes) mantenido por triggers en PostgreSQL
+    search_document = SearchVectorField(null=True, editable=False)
+    # Resumen desnormalizado para listas y exportaciones (ver read_model.py)
+    message_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Mensajes'))
+    last_message_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_('Último mensaje'))
+    last_message_sender = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', on_delete=models.SET_NULL, null=True, blank=True, editable=False, verbose_name=_('Remitente del último mensaje'))
+    company_name = models.CharField(max_length=255, blank=True, editable=False, verbose_name=_('Nombre de la compañía'))
+    assignee_display = models.CharField(max_length=255, blank=True, editable=False, verbose_name=_('Nombre del asignado'))
+    # SLA: vencimientos calculados al crear el ticket o cambiar su prioridad (ver sla.py)
+    first_response_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_('Primera respuesta'))
+    first_response_due_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_('Vencimiento de primera respuesta'))
+    resolution_due_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_('Vencimiento de resolución'))
+    sla_due_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_('Próximo vencimiento de SLA'))
+    sla_breached = models.BooleanField(default=False, editable=False, verbose_name=_('SLA incumplido'))
+    sla_breached_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_('SLA incumplido en'))
+    first_response_breached_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_('Primera respuesta incumplida en'))
+    resolution_breached_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_('Resolución incumplida en'))
+    # Vencimiento de escalamiento ya advertido; si next_escalation_at cambia, la advertencia se rearma (ver escalation_warnings.py)
+    escalation_warning_sent_for = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_('Advertencia de escalamiento enviada para'))
 
     class Meta:
         verbose_name = _('Ticket')
         verbose_name_plural = _('Tickets')
+        indexes = [
+            # Lista de tickets por alcance: empresa (con filtro de estado) y creador, ordenada por actualización
+            models.Index(fields=['company', 'status', '-updated_at'], name='ticket_company_status_upd_idx'),
+            models.Index(fields=['created_by', '-updated_at'], name='ticket_creator_updated_idx'),
+            # Dashboard y carga por técnico
+            models.Index(fields=['assigned_to', 'status'], name='ticket_assignee_status_idx'),
+            # Lista global y paginación por cursor sobre (updated_at, id)
+            models.Index(fields=['-updated_at', '-id'], name='ticket_updated_id_idx'),
+            # Escalamientos pendientes: solo tickets activos con escalamiento en curso
+            models.Index(
+                fields=['next_escalation_at'], name='ticket_pending_escalation_idx',
+                condition=models.Q(status__in=['OPEN', 'IN_PROGRESS'], escalation_paused=False)
+            ),
+            # Vencimientos de SLA pendientes: solo tickets activos con algún vencimiento por cumplir
+            models.Index(
+                fields=['sla_due_at'], name='ticket_sla_due_idx',
+                condition=models.Q(status__in=['OPEN', 'IN_PROGRESS'], sla_due_at__isnull=False)
+            ),
+        ]
 
     def __str__(self):
         return f"{self.reference} - {self.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guardar el estado cargado para ajustar los contadores de estadísticas al guardar
+        if not {'company_id', 'created_by_id', 'status', 'priority'} & instance.get_deferred_fields():
+            instance._stats_state = get_ticket_stats_state(instance)
+        # Y el de los nombres desnormalizados, para refrescarlos solo si cambian empresa o asignado
+        if not {'company_id', 'assigned_to_id'} & instance.get_deferred_fields():
+            instance._display_state = get_display_state(instance)
+        # Y el vencimiento de escalamiento, para avisar al planificador solo si cambia
+        if not {'status', 'escalation_paused', 'next_escalation_at'} & instance.get_deferred_fields():
+            instance._escalation_deadline = get_escalation_deadline(instance)
+        return instance
+
+    # Columnas mantenidas con UPDATE atómicos en la base de datos: un guardado completo de una
+    # instancia cargada antes del UPDATE las pisaría con los valores obsoletos de la instancia
+    DB_MAINTAINED_FIELDS = {
+        'message_count', 'last_message_at', 'last_message_sender',
+        # Documento de búsqueda (PostgreSQL): lo mantienen los triggers de 0004 y 0014
+        'search_document',
+        # SLA (ver sla.py): vencimientos, primera respuesta e incumplimientos
+        'first_response_at', 'first_response_due_at', 'resolution_due_at', 'sla_due_at',
+        'sla_breached', 'sla_breached_at', 'first_response_breached_at', 'resolution_breached_at',
+    }
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DB_MAINTAINED_FIELDS and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         from django.urls import reverse
         return reverse('tickets:ticket_detail', args=[self.pk])
@@ -107,6 +184,7 @@ class EscalationRule(models.Model):
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, help_text="Prioridad del ticket")
     level = models.IntegerField(help_text="Nivel de escalamiento (1, 2, 3, etc.)")
     hours_to_escalate = models.IntegerField(help_text="Horas sin respuesta antes de escalar")
+    warning_minutes = models.PositiveIntegerField(default=60, help_text="Minutos de antelación para advertir antes de escalar (0 = sin advertencia)")
     escalate_to = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='escalation_targets', on_delete=models.CASCADE, help_text="Usuario al que escalar")
     notification_template = models.TextField(blank=True, help_text="Template personalizado para la notificación")
     is_active = models.BooleanField(default=True)
@@ -121,6 +199,14 @@ class EscalationRule(models.Model):
         company_name = self.company.name if self.company else "Global"
         return f"{company_name} - {self.get_priority_display()} - Nivel {self.level}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Alcance cargado, para propagar también a los tickets que la regla deja de cubrir
+        if not {'company_id', 'priority', 'level'} & instance.get_deferred_fields():
+            instance._propagation_scope = (instance.company_id, instance.priority, instance.level)
+        return instance
+
 class EscalationLog(models.Model):
     """Registro de escalamientos realizados"""
     ACTION_CHOICES = [
@@ -128,6 +214,7 @@ class EscalationLog(models.Model):
         ('assigned', 'Asignado'),
         ('paused', 'Pausado'),
         ('resumed', 'Reanudado'),
+        ('reset', 'Reiniciado'),
         ('resolved', 'Resuelto'),
     ]
     
@@ -155,6 +242,8 @@ class EscalationSettings(models.Model):
     business_start_hour = models.IntegerField(default=9, help_text="Hora de inicio del horario laboral (0-23)")
     business_end_hour = models.IntegerField(default=17, help_text="Hora de fin del horario laboral (0-23)")
     business_days = models.CharField(max_length=50, default="1,2,3,4,5", help_text="Días laborales (1=Lunes, 7=Domingo)")
+    timezone = models.CharField(max_length=64, default="UTC", help_text="Zona horaria del horario laboral (ej. America/Mexico_City)")
+    holidays = models.TextField(blank=True, help_text="Feriados en formato AAAA-MM-DD, uno por línea")
     max_escalation_level = models.IntegerField(default=3, help_text="Nivel máximo de escalamiento")
     auto_assign_on_escalation = models.BooleanField(default=True, help_text="Asignar automáticamente al escalar")
     pause_on_response = models.BooleanField(default=True, help_text="Pausar escalamiento cuando hay respuesta")
@@ -169,22 +258,55 @@ class EscalationSettings(models.Model):
     def __str__(self):
         company_name = self.company.name if self.company else "Global"
         return f"Configuración de {company_name}"
-    
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Empresa cargada, para propagar también a los tickets que la configuración deja de cubrir
+        if 'company_id' not in instance.get_deferred_fields():
+            instance._propagation_scope = (instance.company_id, None, None)
+        return instance
+
     def get_business_days_list(self):
         """Retorna lista de días laborales como enteros"""
         return [int(day) for day in self.business_days.split(',') if day.strip()]
     
+    def get_calendar(self):
+        """Calendario laboral compilado (se recompila solo si cambian los campos de horario)"""
+        key = (self.business_days, self.business_start_hour, self.business_end_hour, self.holidays, self.timezone)
+        if getattr(self, '_calendar_key', None) != key:
+            self._calendar = BusinessCalendar.from_settings(self)
+            self._calendar_key = key
+        return self._calendar
+    
     def is_business_time(self, datetime_obj):
         """Verifica si una fecha/hora está en horario laboral"""
         if not self.business_hours_only:
             return True
-        
-        weekday = datetime_obj.isoweekday()  # 1=Monday, 7=Sunday
-        if weekday not in self.get_business_days_list():
-            return False
-        
-        hour = datetime_obj.hour
-        return self.business_start_hour <= hour < self.business_end_hour
+        return self.get_calendar().is_business_time(datetime_obj)
+
+class SLAPolicy(models.Model):
+    """Tiempos de primera respuesta y resolución comprometidos por empresa y prioridad"""
+    PRIORITY_CHOICES = [('LOW','Baja'),('MEDIUM','Media'),('HIGH','Alta')]
+    
+    company = models.ForeignKey(Company, related_name='sla_policies', on_delete=models.CASCADE, null=True, blank=True, help_text="Empresa específica (null = política global)")
+    priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, help_text="Prioridad del ticket")
+    first_response_hours = models.PositiveIntegerField(help_text="Horas para la primera respuesta de un técnico")
+    resolution_hours = models.PositiveIntegerField(help_text="Horas para resolver el ticket")
+    business_hours_only = models.BooleanField(default=True, help_text="Contar solo horas laborales (calendario de escalamiento de la empresa)")
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['company', 'priority']
+        ordering = ['company', 'priority']
+        verbose_name = "Política de SLA"
+        verbose_name_plural = "Políticas de SLA"
+    
+    def __str__(self):
+        company_name = self.company.name if self.company else "Global"
+        return f"{company_name} - {self.get_priority_display()}"
 
 class EmailLog(models.Model):
     """Registro de intentos de envío de email para debugging"""
@@ -0,0 +1,166 @@
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+import base64
+import datetime
+import json
+
+class InvalidCursor(InvalidPage):
+    pass
+
+class CursorPage:
+    """
+    Página obtenida con paginación por cursor (keyset).
+    Expone la misma interfaz básica que django.core.paginator.Page, sin número de página ni total.
+    """
+    is_cursor_page = True
+    number = None
+
+    def __init__(self, object_list, paginator, has_next, has_previous, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.next_url = None
+        self.previous_url = None
+
+    def __repr__(self):
+        return f"<CursorPage de {len(self.object_list)} elementos>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+class CursorPaginator:
+    """
+    Paginador por cursor sobre (columna de orden, id).
+
+    Cada página se obtiene con un filtro de rango sobre el índice de la columna de orden en
+    lugar de OFFSET, por lo que el costo no crece con la profundidad y no requiere COUNT.
+    Los cursores son tokens opacos que codifican el último (o primer) elemento visto.
+    """
+
+    def __init__(self, queryset, per_page, ordering='-updated_at'):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.descending = ordering.startswith('-')
+        self.field_name = ordering.lstrip('-')
+        self.field = queryset.model._meta.get_field(self.field_name)
+
+    def page(self, cursor=None):
+        """Retorna la página que sigue (o precede) al cursor indicado"""
+        if cursor:
+            value, pk, backwards = self.decode_cursor(cursor)
+        else:
+            value, pk, backwards = None, None, False
+
+        # Al retroceder se recorre el índice en sentido inverso y luego se invierte el resultado
+        descending = self.descending != backwards
+        lookup = 'lt' if descending else 'gt'
+        queryset = self.queryset
+        if pk is not None:
+            queryset = queryset.filter(
+                Q(**{f'{self.field_name}__{lookup}': value}) |
+                Q(**{self.field_name: value, f'pk__{lookup}': pk})
+            )
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.field_name}', f'{prefix}pk')
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = pk is not None, has_more
+        else:
+            has_next, has_previous = has_more, pk is not None
+
+        return CursorPage(
+            rows,
+            self,
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=self.encode_cursor(rows[-1], backwards=False) if has_next and rows else None,
+            previous_cursor=self.encode_cursor(rows[0], backwards=True) if has_previous and rows else None,
+        )
+
+    def encode_cursor(self, obj, backwards=False):
+        value = getattr(obj, self.field.attname)
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            value = value.isoformat()
+        payload = json.dumps([value, obj.pk, int(backwards)], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            value, pk, backwards = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            if self.field.get_internal_type() == 'DateTimeField':
+                value = parse_datetime(value)
+                if value is None:
+                    raise ValueError(cursor)
+            return value, int(pk), bool(backwards)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise InvalidCursor('Cursor de paginación inválido')
+
+class CursorPaginationMixin:
+    """
+    Mixin para ListView que activa la paginación por cursor con ?pagination=cursor,
+    con un parámetro ?cursor=<token> o globalmente con LIST_PAGINATION_MODE = 'cursor'.
+
+    Solo se aplica cuando el queryset está ordenado por `cursor_ordering`; cualquier otro
+    orden (por ejemplo, por relevancia de búsqueda) usa la paginación por páginas habitual.
+    """
+    cursor_ordering = '-updated_at'
+    cursor_query_param = 'cursor'
+
+    def use_cursor_pagination(self, queryset):
+        params = self.request.GET
+        mode = params.get('pagination') or getattr(settings, 'LIST_PAGINATION_MODE', 'offset')
+        if mode != 'cursor' and self.cursor_query_param not in params:
+            return False
+        if not hasattr(queryset, 'query'):
+            # Resultados servidos desde caché (lista de ids): solo paginación por páginas
+            return False
+        return tuple(queryset.query.order_by) in ((self.cursor_ordering,), (self.cursor_ordering, '-id'), (self.cursor_ordering, '-pk'))
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor_pagination(queryset):
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = CursorPaginator(queryset, page_size, self.cursor_ordering)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_query_param))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+
+        page.next_url = self.get_cursor_url(page.next_cursor)
+        page.previous_url = self.get_cursor_url(page.previous_cursor)
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_cursor_url(self, cursor):
+        if not cursor:
+            return None
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        params['pagination'] = 'cursor'
+        params[self.cursor_query_param] = cursor
+        return f'?{params.urlencode()}'
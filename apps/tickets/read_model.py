@@ -0,0 +1,51 @@
+"""
+Columnas desnormalizadas de Ticket para las listas y exportaciones.
+
+message_count, last_message_at y last_message_sender resumen los mensajes públicos (no privados)
+del ticket; company_name y assignee_display copian los nombres a mostrar de la empresa y del
+técnico asignado. Se mantienen con señales, de modo que las vistas leen una sola tabla sin joins.
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+def get_user_display(user):
+    """Nombre a mostrar de un usuario (nombre completo o nombre de usuario)"""
+    if user is None:
+        return ''
+    return user.get_full_name() or user.username
+
+def get_display_state(ticket):
+    """Campos de los que dependen company_name y assignee_display"""
+    return (ticket.company_id, ticket.assigned_to_id)
+
+def refresh_display_fields(ticket):
+    """Actualiza en la instancia los nombres de empresa y asignado"""
+    ticket.company_name = ticket.company.name if ticket.company_id else ''
+    ticket.assignee_display = get_user_display(ticket.assigned_to if ticket.assigned_to_id else None)
+
+def record_message_added(message):
+    """Suma un mensaje público al resumen de mensajes del ticket con un UPDATE atómico"""
+    from .models import Ticket
+
+    if message.private:
+        return
+    Ticket.objects.filter(pk=message.ticket_id).update(
+        message_count=F('message_count') + 1,
+        last_message_at=message.created_at,
+        last_message_sender_id=message.sender_id,
+    )
+
+def recompute_message_fields(ticket_ids):
+    """Recalcula el resumen de mensajes de los tickets indicados (ediciones y eliminaciones)"""
+    from .models import Ticket, TicketMessage
+
+    public_messages = TicketMessage.objects.filter(ticket=OuterRef('pk'), private=False)
+    last_message = public_messages.order_by('-created_at', '-id')
+    Ticket.objects.filter(pk__in=ticket_ids).update(
+        message_count=Coalesce(
+            Subquery(public_messages.order_by().values('ticket').annotate(total=Count('id')).values('total')),
+            Value(0)
+        ),
+        last_message_at=Subquery(last_message.values('created_at')[:1]),
+        last_message_sender_id=Subquery(last_message.values('sender_id')[:1]),
+    )
@@ -0,0 +1,258 @@
+"""
+Planificador de vencimientos de escalamiento.
+
+Mantiene los próximos vencimientos (ticket, next_escalation_at) en una estructura ordenada para
+que el despachador (tasks.dispatch_due_escalations) se ejecute justo al vencer el siguiente,
+en lugar de esperar al barrido periódico. Backends (ESCALATION_SCHEDULER_BACKEND):
+
+- RedisDeadlineScheduler: conjunto ordenado de Redis compartido por todos los workers.
+- DatabaseDeadlineScheduler: la propia columna next_escalation_at con el índice parcial
+  ticket_pending_escalation_idx; no guarda nada aparte.
+- MemoryDeadlineScheduler: heap en memoria del proceso, para tests y desarrollo.
+
+En todos, agregar, mover o quitar un vencimiento cuesta O(log n).
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+import heapq
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+WAKEUP_KEY = 'escalation_scheduler:wakeup'
+
+# Espera antes de reintentar los tickets retirados que no se pudieron escalar
+RETRY_DELAY = timedelta(minutes=1)
+
+def get_escalation_deadline(ticket):
+    """Vencimiento vigente del ticket: next_escalation_at si está activo y sin pausar, si no None"""
+    if ticket.status in ('OPEN', 'IN_PROGRESS') and not ticket.escalation_paused:
+        return ticket.next_escalation_at
+    return None
+
+class BaseDeadlineScheduler:
+    """Interfaz común de los planificadores de vencimientos"""
+    name = 'base'
+    # False si el backend lee los vencimientos de la tabla de tickets en lugar de guardarlos
+    stores_deadlines = True
+
+    def schedule(self, ticket_id, when):
+        """Agrega o mueve el vencimiento del ticket"""
+        raise NotImplementedError
+
+    def schedule_many(self, items):
+        for ticket_id, when in items:
+            if when is None:
+                self.cancel(ticket_id)
+            else:
+                self.schedule(ticket_id, when)
+
+    def cancel(self, ticket_id):
+        """Quita el vencimiento del ticket (pausado, cerrado o eliminado)"""
+        raise NotImplementedError
+
+    def pop_due(self, now, limit):
+        """Retira y retorna hasta `limit` ids de tickets con vencimiento <= now, del más antiguo al más nuevo"""
+        raise NotImplementedError
+
+    def next_deadline(self):
+        """Próximo vencimiento pendiente posterior a ahora, o None"""
+        raise NotImplementedError
+
+class DatabaseDeadlineScheduler(BaseDeadlineScheduler):
+    """
+    Usa next_escalation_at como tabla de vencimientos: los tickets ya guardan su vencimiento,
+    así que schedule y cancel no hacen nada y las lecturas usan el índice parcial.
+    """
+    name = 'database'
+    stores_deadlines = False
+
+    def schedule(self, ticket_id, when):
+        pass
+
+    def cancel(self, ticket_id):
+        pass
+
+    def pending(self):
+        from .escalation import ACTIVE_STATUSES
+        from .models import Ticket
+
+        return Ticket.objects.filter(
+            status__in=ACTIVE_STATUSES, escalation_paused=False, next_escalation_at__isnull=False
+        )
+
+    def pop_due(self, now, limit):
+        return list(
+            self.pending().filter(next_escalation_at__lte=now)
+            .order_by('next_escalation_at').values_list('id', flat=True)[:limit]
+        )
+
+    def next_deadline(self):
+        # Los vencidos que el motor no pudo escalar (sin regla, nivel máximo) quedan en la tabla
+        pending = self.pending().filter(next_escalation_at__gt=timezone.now())
+        return pending.aggregate(next_deadline=Min('next_escalation_at'))['next_deadline']
+
+class MemoryDeadlineScheduler(BaseDeadlineScheduler):
+    """
+    Heap de (vencimiento, ticket) con borrado perezoso: mover un vencimiento agrega una entrada
+    nueva y la anterior se descarta al llegar a la cima.
+    """
+    name = 'memory'
+
+    def __init__(self):
+        self.heap = []
+        self.deadlines = {}
+        self.lock = threading.Lock()
+
+    def schedule(self, ticket_id, when):
+        with self.lock:
+            self.deadlines[ticket_id] = when
+            heapq.heappush(self.heap, (when, ticket_id))
+
+    def cancel(self, ticket_id):
+        with self.lock:
+            self.deadlines.pop(ticket_id, None)
+
+    def _discard_stale(self):
+        while self.heap and self.deadlines.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+
+    def pop_due(self, now, limit):
+        due = []
+        with self.lock:
+            self._discard_stale()
+            while self.heap and len(due) < limit and self.heap[0][0] <= now:
+                _, ticket_id = heapq.heappop(self.heap)
+                del self.deadlines[ticket_id]
+                due.append(ticket_id)
+                self._discard_stale()
+        return due
+
+    def next_deadline(self):
+        with self.lock:
+            self._discard_stale()
+            return self.heap[0][0] if self.heap else None
+
+class RedisDeadlineScheduler(BaseDeadlineScheduler):
+    """Conjunto ordenado de Redis: miembro = id del ticket, puntaje = timestamp del vencimiento"""
+    name = 'redis'
+    key = 'escalation_scheduler:deadlines'
+
+    # Retira los vencidos de forma atómica para que dos despachadores no tomen el mismo ticket
+    POP_DUE_SCRIPT = """
+        local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+        if #due > 0 then
+            redis.call('ZREM', KEYS[1], unpack(due))
+        end
+        return due
+    """
+
+    def __init__(self):
+        import redis
+
+        url = getattr(settings, 'ESCALATION_SCHEDULER_REDIS_URL', 'redis://localhost:6379/3')
+        self.client = redis.Redis.from_url(url)
+        self.pop_due_script = self.client.register_script(self.POP_DUE_SCRIPT)
+
+    def schedule(self, ticket_id, when):
+        self.client.zadd(self.key, {ticket_id: when.timestamp()})
+
+    def schedule_many(self, items):
+        pipeline = self.client.pipeline(transaction=False)
+        for ticket_id, when in items:
+            if when is None:
+                pipeline.zrem(self.key, ticket_id)
+            else:
+                pipeline.zadd(self.key, {ticket_id: when.timestamp()})
+        pipeline.execute()
+
+    def cancel(self, ticket_id):
+        self.client.zrem(self.key, ticket_id)
+
+    def pop_due(self, now, limit):
+        return [int(member) for member in self.pop_due_script(keys=[self.key], args=[now.timestamp(), limit])]
+
+    def next_deadline(self):
+        first = self.client.zrange(self.key, 0, 0, withscores=True)
+        if not first:
+            return None
+        return datetime.fromtimestamp(first[0][1], tz=dt_timezone.utc)
+
+_scheduler_cache = {}
+
+def get_deadline_scheduler(path=None):
+    """Instancia del planificador configurado en ESCALATION_SCHEDULER_BACKEND (una por proceso)"""
+    path = path or getattr(settings, 'ESCALATION_SCHEDULER_BACKEND', 'apps.tickets.scheduler.DatabaseDeadlineScheduler')
+    if path not in _scheduler_cache:
+        _scheduler_cache[path] = import_string(path)()
+    return _scheduler_cache[path]
+
+def reset_deadline_schedulers():
+    _scheduler_cache.clear()
+
+def schedule_deadlines(items):
+    """
+    Registra los vencimientos [(ticket_id, next_escalation_at o None)] al confirmar la transacción
+    y adelanta el despachador si alguno vence antes de su próxima ejecución prevista.
+    """
+    items = list(items)
+    if not items:
+        return
+
+    def apply():
+        try:
+            get_deadline_scheduler().schedule_many(items)
+            deadlines = [when for _, when in items if when is not None]
+            if deadlines:
+                request_wakeup(min(deadlines))
+        except Exception as e:
+            logger.error(f"Error registrando {len(items)} vencimientos de escalamiento: {e}")
+
+    transaction.on_commit(apply)
+
+def request_wakeup(when, force=False):
+    """
+    Programa el despachador para `when` salvo que ya haya una ejecución prevista antes, o
+    siempre con `force` (el rearme del barrido periódico: la ejecución prevista pudo perderse).
+    Una ejecución de más no es un problema: el despachador es idempotente.
+    """
+    from .tasks import dispatch_due_escalations
+
+    now = timezone.now()
+    when = max(when, now)
+    planned = cache.get(WAKEUP_KEY)
+    if not force and planned is not None and now.timestamp() <= planned <= when.timestamp():
+        return
+
+    timeout = max(int((when - now).total_seconds()) + 60, 60)
+    cache.set(WAKEUP_KEY, when.timestamp(), timeout=timeout)
+    dispatch_due_escalations.apply_async(eta=when)
+
+def clear_wakeup():
+    cache.delete(WAKEUP_KEY)
+
+def get_unprocessed(ticket_ids, now):
+    """
+    Ids retirados del planificador que siguen vencidos tras procesarlos (bloque con error o
+    bloqueado por otra ejecución). Si no se puede consultar, se consideran todos pendientes.
+    """
+    from .escalation import get_due_tickets
+
+    try:
+        return list(get_due_tickets(now).filter(id__in=ticket_ids).values_list('id', flat=True))
+    except Exception as e:
+        logger.error(f"Error comprobando {len(ticket_ids)} vencimientos retirados: {e}")
+        return list(ticket_ids)
+
+def requeue_unprocessed(scheduler, ticket_ids, now):
+    """Devuelve al planificador los vencimientos retirados sin procesar, para reintentarlos tras RETRY_DELAY"""
+    if ticket_ids:
+        retry_at = now + RETRY_DELAY
+        scheduler.schedule_many((ticket_id, retry_at) for ticket_id in ticket_ids)
+        logger.warning(f"{len(ticket_ids)} vencimientos de escalamiento sin procesar, se reintentan a las {retry_at}")
@@ -1,7 +1,47 @@
-from django.db.models import Q
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank, TrigramSimilarity
 from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
 from .models import Ticket
+from .search_cache import search_cache_enabled, get_cached_search
+import re
+
+# Backends disponibles; el primero compatible con la base de datos se usa por defecto
+SEARCH_BACKENDS = [
+    'apps.tickets.search_backends.PostgreSQLSearchBackend',
+    'apps.tickets.search_backends.SQLiteFTSSearchBackend',
+    'apps.tickets.search_backends.SQLiteSearchBackend',
+]
+
+_backend_cache = {}
+
+# Referencias generadas por el sistema: TKT- seguido de 6 a 8 caracteres hexadecimales
+REFERENCE_PATTERN = re.compile(r'^TKT-[0-9A-F]{6,8}$', re.IGNORECASE)
+
+def match_reference(query_text):
+    """Retorna la referencia normalizada si el texto tiene forma de referencia de ticket, o None"""
+    query_text = (query_text or '').strip()
+    if REFERENCE_PATTERN.match(query_text):
+        return query_text.upper()
+    return None
+
+def get_search_backend(path=None):
+    """
+    Retorna la instancia del backend de búsqueda configurado en TICKET_SEARCH_BACKEND
+    (ruta de la clase) o, si no está definido, el primero disponible para la base de datos.
+    """
+    path = path or getattr(settings, 'TICKET_SEARCH_BACKEND', None)
+    if not path:
+        path = next(
+            candidate for candidate in SEARCH_BACKENDS
+            if import_string(candidate).is_available(connection)
+        )
+    if path not in _backend_cache:
+        _backend_cache[path] = import_string(path)()
+    return _backend_cache[path]
+
+def get_available_search_backends():
+    """Retorna las rutas de los backends que pueden usarse con la base de datos actual"""
+    return [path for path in SEARCH_BACKENDS if import_string(path).is_available(connection)]
 
 class TicketSearchEngine:
     """
@@ -9,7 +49,7 @@ class TicketSearchEngine:
     """
     
     @staticmethod
-    def search(queryset, query_text, user=None):
+    def search(queryset, query_text, user=None, filters=None):
         """
         Realiza búsqueda inteligente en tickets
         
@@ -17,88 +57,48 @@ class TicketSearchEngine:
             queryset: QuerySet base de tickets
             query_text: Texto a buscar
             user: Usuario que realiza la búsqueda (para filtros de permisos)
+            filters: Filtros activos aplicados a `queryset` (parte de la clave de caché)
         
         Returns:
-            QuerySet ordenado por relevancia
+            QuerySet ordenado por relevancia, o CachedSearchResults si TICKET_SEARCH_CACHE_ENABLED
+            está activo, se indica el usuario (el queryset debe ser su alcance con `filters`
+            aplicados) y el resultado cabe en caché
         """
         if not query_text or not query_text.strip():
             return queryset
         
-        query_text = query_text.strip()
-        db_engine = settings.DATABASES['default']['ENGINE']
-        
-        if 'postgresql' in db_engine:
-            return TicketSearchEngine._postgresql_search(queryset, query_text)
-        else:
-            return TicketSearchEngine._sqlite_search(queryset, query_text)
-    
-    @staticmethod
-    def _postgresql_search(queryset, query_text):
-        """
-        Búsqueda avanzada con PostgreSQL usando full-text search
-        """
-        # Crear vectores de búsqueda con pesos diferentes
-        search_vector = SearchVector(
-            'title', weight='A', config='spanish'
-        ) + SearchVector(
-            'description', weight='B', config='spanish'
-        ) + SearchVector(
-            'reference', weight='A'
-        ) + SearchVector(
-            'messages__content', weight='C', config='spanish'
-        )
+        # Referencia exacta: se resuelve con el índice único de `reference` sin ranking
+        exact = TicketSearchEngine.find_by_reference(queryset, query_text)
+        if exact is not None:
+            return exact
         
-        # Crear consulta de búsqueda
-        search_query = SearchQuery(query_text, config='spanish')
+        backend = get_search_backend()
+        if user is not None and search_cache_enabled():
+            return get_cached_search(queryset, query_text.strip(), user, backend, filters)
         
-        # Búsqueda por similitud de trigramas para referencias y títulos
-        trigram_similarity = TrigramSimilarity('reference', query_text) + \
-                           TrigramSimilarity('title', query_text)
-        
-        return queryset.annotate(
-            search=search_vector,
-            rank=SearchRank(search_vector, search_query),
-            similarity=trigram_similarity
-        ).filter(
-            Q(search=search_query) | Q(similarity__gt=0.1)
-        ).order_by('-rank', '-similarity', '-updated_at').distinct()
+        return backend.search(queryset, query_text.strip())
     
     @staticmethod
-    def _sqlite_search(queryset, query_text):
+    def find_by_reference(queryset, query_text):
         """
-        Búsqueda básica para SQLite
+        Si el texto es una referencia y existe en el queryset, retorna el queryset con ese
+        único ticket; si no, None (y la búsqueda continúa con el ranking del backend)
         """
-        # Dividir la consulta en palabras para búsqueda más inteligente
-        words = query_text.split()
-        
-        # Crear filtros para cada palabra
-        title_filters = Q()
-        desc_filters = Q()
-        ref_filters = Q()
-        msg_filters = Q()
-        
-        for word in words:
-            title_filters |= Q(title__icontains=word)
-            desc_filters |= Q(description__icontains=word)
-            ref_filters |= Q(reference__icontains=word)
-            msg_filters |= Q(messages__content__icontains=word)
-        
-        # Combinar todos los filtros
-        combined_filter = title_filters | desc_filters | ref_filters | msg_filters
-        
-        return queryset.filter(combined_filter).distinct().order_by('-updated_at')
+        reference = match_reference(query_text)
+        if reference is None:
+            return None
+        exact = queryset.filter(reference=reference)
+        return exact if exact.exists() else None
     
     @staticmethod
-    def get_search_suggestions(query_text, limit=5):
+    def get_search_suggestions(query_text, limit=5, queryset=None):
         """
         Obtiene sugerencias de búsqueda basadas en tickets existentes
         """
         if not query_text or len(query_text) < 2:
             return []
         
-        # Buscar títulos similares
-        suggestions = Ticket.objects.filter(
-            title__icontains=query_text
-        ).values_list('title', flat=True).distinct()[:limit]
+        if queryset is None:
+            queryset = Ticket.objects.all()
         
-        return list(suggestions)
+        return get_search_backend().suggest(queryset, query_text.strip(), limit)
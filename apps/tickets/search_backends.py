@@ -0,0 +1,176 @@
+from django.db.models import Q, F
+from django.db.models.expressions import RawSQL
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from .fts import FTS_TABLE, fts_index_exists
+import re
+
+class BaseSearchBackend:
+    """
+    Interfaz común de los motores de búsqueda de tickets.
+
+    Todas las búsquedas del sistema (filtro de la lista, sugerencias y cualquier API)
+    pasan por un backend, de modo que el ranking y el uso de índices se ajustan en un solo lugar.
+    """
+    name = None
+    vendor = None
+
+    @classmethod
+    def is_available(cls, connection):
+        """Indica si el backend puede usarse con la conexión de base de datos dada"""
+        return cls.vendor is None or connection.vendor == cls.vendor
+
+    def search(self, queryset, query_text):
+        """
+        Filtra el queryset con el texto de búsqueda y lo ordena por relevancia.
+        `query_text` llega ya normalizado (sin espacios sobrantes y no vacío).
+        """
+        raise NotImplementedError
+
+    def autocomplete(self, queryset, query_text, limit=5):
+        """
+        Retorna hasta `limit` tickets (dicts con id, reference y title) cuyo título
+        o referencia coincide con el texto que el usuario está escribiendo
+        """
+        return list(
+            queryset.filter(Q(title__icontains=query_text) | Q(reference__icontains=query_text))
+            .order_by('-updated_at')
+            .values('id', 'reference', 'title')[:limit]
+        )
+
+    def suggest(self, queryset, query_text, limit=5):
+        """Retorna hasta `limit` títulos de tickets (sin repetir) que coinciden con el texto"""
+        titles = []
+        for row in self.autocomplete(queryset, query_text, limit * 2):
+            if row['title'] not in titles:
+                titles.append(row['title'])
+        return titles[:limit]
+
+class PostgreSQLSearchBackend(BaseSearchBackend):
+    """
+    Búsqueda full-text en PostgreSQL sobre la columna `search_document` (índice GIN),
+    con similitud de trigramas en referencia y título como respaldo para errores de tipeo.
+    """
+    name = 'postgresql'
+    vendor = 'postgresql'
+    # Configuración de texto con la que los triggers de la migración 0004 construyen
+    # search_document: la consulta debe analizarse igual que el documento guardado
+    config = 'spanish'
+
+    def search(self, queryset, query_text):
+        search_query = SearchQuery(query_text, config=self.config)
+        
+        # Búsqueda por similitud de trigramas para referencias y títulos
+        trigram_similarity = TrigramSimilarity('reference', query_text) + \
+                           TrigramSimilarity('title', query_text)
+        
+        return queryset.annotate(
+            rank=SearchRank(F('search_document'), search_query),
+            similarity=trigram_similarity
+        ).filter(
+            Q(search_document=search_query) |
+            Q(reference__trigram_similar=query_text) |
+            Q(title__trigram_similar=query_text)
+        ).order_by('-rank', '-similarity', '-updated_at')
+
+    def autocomplete(self, queryset, query_text, limit=5):
+        # icontains genera UPPER(columna::text) LIKE ..., que usa los índices GIN de trigramas
+        # sobre UPPER(title) y UPPER(reference) creados en la migración 0006
+        return list(
+            queryset.filter(Q(title__icontains=query_text) | Q(reference__icontains=query_text))
+            .annotate(similarity=TrigramSimilarity('title', query_text))
+            .order_by('-similarity', '-updated_at')
+            .values('id', 'reference', 'title')[:limit]
+        )
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """
+    Búsqueda full-text en SQLite sobre la tabla virtual FTS5 `tickets_ticket_fts`,
+    con coincidencia por prefijo de cada palabra y ranking BM25.
+    """
+    name = 'sqlite_fts'
+    vendor = 'sqlite'
+
+    # Pesos BM25 por columna: referencia, título, descripción, mensajes
+    column_weights = (10.0, 10.0, 4.0, 1.0)
+
+    _availability = {}
+
+    @classmethod
+    def is_available(cls, connection):
+        # La existencia de la tabla se consulta una sola vez por conexión
+        if connection.vendor != cls.vendor:
+            return False
+        if connection.alias not in cls._availability:
+            cls._availability[connection.alias] = fts_index_exists(connection)
+        return cls._availability[connection.alias]
+
+    @staticmethod
+    def build_match_query(query_text, column=None, operator='OR'):
+        """
+        Convierte el texto del usuario en una expresión MATCH de FTS5: cada palabra se cita
+        (evitando la sintaxis de FTS5) y se busca como prefijo; por defecto las palabras se
+        combinan con OR y BM25 favorece a los tickets que contienen más de ellas.
+        """
+        words = re.findall(r'\w+', query_text)
+        if not words:
+            return None
+        expression = f' {operator} '.join(f'"{word}"*' for word in words)
+        if column:
+            return f'{column} : ({expression})'
+        return expression
+
+    def search(self, queryset, query_text):
+        match = self.build_match_query(query_text)
+        if match is None:
+            return queryset.none()
+
+        weights = ', '.join(str(weight) for weight in self.column_weights)
+        table = queryset.model._meta.db_table
+        return queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        ).annotate(
+            rank=RawSQL(
+                f"SELECT bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id",
+                [match]
+            )
+        ).order_by('rank', '-updated_at')
+
+    def autocomplete(self, queryset, query_text, limit=5):
+        # Todas las palabras deben aparecer (como prefijo) en la referencia o el título
+        match = self.build_match_query(query_text, column='{reference title}', operator='AND')
+        if match is None:
+            return []
+        return list(
+            queryset.filter(id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]))
+            .order_by('-updated_at')
+            .values('id', 'reference', 'title')[:limit]
+        )
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    Búsqueda básica para SQLite (y cualquier otra base de datos) con icontains por palabra
+    """
+    name = 'sqlite'
+    vendor = None
+
+    def search(self, queryset, query_text):
+        # Dividir la consulta en palabras para búsqueda más inteligente
+        words = query_text.split()
+        
+        # Crear filtros para cada palabra
+        title_filters = Q()
+        desc_filters = Q()
+        ref_filters = Q()
+        msg_filters = Q()
+        
+        for word in words:
+            title_filters |= Q(title__icontains=word)
+            desc_filters |= Q(description__icontains=word)
+            ref_filters |= Q(reference__icontains=word)
+            msg_filters |= Q(messages__content__icontains=word)
+        
+        # Combinar todos los filtros
+        combined_filter = title_filters | desc_filters | ref_filters | msg_filters
+        
+        return queryset.filter(combined_filter).distinct().order_by('-updated_at')
@@ -0,0 +1,146 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Model
+from .stats import get_stats_scope
+import hashlib
+import json
+import time
+
+CACHE_KEY_PREFIX = 'ticket_search'
+
+def search_cache_enabled():
+    return getattr(settings, 'TICKET_SEARCH_CACHE_ENABLED', False)
+
+def normalize_query(query_text):
+    """Normaliza el texto de búsqueda para que variantes triviales compartan entrada de caché"""
+    return ' '.join(query_text.lower().split())
+
+class CachedSearchResults:
+    """
+    Resultado de búsqueda servido desde una lista de ids ordenada por relevancia.
+
+    Se comporta como una secuencia para el Paginator: count() no consulta la base de datos
+    y cada página solo carga los tickets de su porción de la lista.
+    """
+    ordered = True
+
+    def __init__(self, queryset, ids):
+        self.queryset = queryset
+        self.ids = ids
+
+    def __repr__(self):
+        return f"<CachedSearchResults de {len(self.ids)} tickets>"
+
+    def count(self):
+        return len(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def exists(self):
+        return bool(self.ids)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._fetch(self.ids[index])
+        return self._fetch([self.ids[index]])[0]
+
+    def _fetch(self, ids):
+        if not ids:
+            return []
+        tickets = self.queryset.order_by().in_bulk(ids)
+        # Tickets eliminados desde que se guardó la lista se omiten
+        return [tickets[ticket_id] for ticket_id in ids if ticket_id in tickets]
+
+# Marca en caché de las búsquedas con demasiados resultados para guardar sus ids
+TOO_LARGE = 'too_large'
+
+def get_cached_search(queryset, query_text, user, backend, filters=None):
+    """
+    Ejecuta la búsqueda con `backend` o la sirve desde caché.
+
+    `queryset` debe ser exactamente el alcance del usuario con `filters` aplicados: la clave
+    combina consulta normalizada, alcance, filtros activos y la versión del alcance, que se
+    renueva al guardar tickets o mensajes dentro de él.
+    Si el resultado es demasiado grande para cachearse, se recuerda con la misma clave y se
+    retorna el queryset del backend (sin volver a consultar los ids en cada petición).
+    """
+    scope = get_stats_scope(user)
+    key = _results_key(scope, backend.name, normalize_query(query_text), filters or {})
+    timeout = getattr(settings, 'TICKET_SEARCH_CACHE_TIMEOUT', 300)
+
+    ids = cache.get(key)
+    if ids == TOO_LARGE:
+        return backend.search(queryset, query_text)
+    if ids is None:
+        max_results = getattr(settings, 'TICKET_SEARCH_CACHE_MAX_RESULTS', 1000)
+        results = backend.search(queryset, query_text)
+        ids = list(results.values_list('id', flat=True)[:max_results + 1])
+        if len(ids) > max_results:
+            cache.set(key, TOO_LARGE, timeout=timeout)
+            return results
+        cache.set(key, ids, timeout=timeout)
+
+    return CachedSearchResults(queryset, ids)
+
+def invalidate_search_cache(*states):
+    """
+    Invalida, al confirmar la transacción, los resultados en caché de los alcances a los que
+    pertenecen los estados de ticket dados (ver stats.get_ticket_stats_state): su empresa, su
+    creador y el alcance global.
+
+    Invalidar es borrar la versión del alcance: la siguiente lectura crea una nueva. Los
+    alcances sin resultados en caché (p. ej. el global si ningún técnico buscó desde el último
+    cambio) no tienen versión y el borrado no los afecta.
+    """
+    if not search_cache_enabled():
+        return
+    scopes = set()
+    for state in states:
+        if state is None:
+            continue
+        company_id, created_by_id = state[0], state[1]
+        scopes.update([('global', None), ('company', company_id)])
+        if created_by_id:
+            scopes.add(('creator', created_by_id))
+
+    if scopes:
+        keys = [_version_key(scope) for scope in scopes]
+        # Tras el commit: un lector concurrente no puede volver a cachear el estado anterior
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+def _new_version():
+    # Basada en el tiempo para que una versión borrada o expulsada de la caché no se reutilice
+    return int(time.time() * 1000)
+
+def _version_key(scope):
+    scope_name, scope_id = scope
+    return f"{CACHE_KEY_PREFIX}:version:{scope_name}:{scope_id}"
+
+def _get_version(scope):
+    return cache.get_or_set(_version_key(scope), _new_version, timeout=None)
+
+def _results_key(scope, backend_name, query, filters):
+    scope_name, scope_id = scope
+    digest = hashlib.md5(
+        json.dumps([query, _normalize_filters(filters)], sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"{CACHE_KEY_PREFIX}:{backend_name}:{scope_name}:{scope_id}:{_get_version(scope)}:{digest}"
+
+def _normalize_filters(filters):
+    normalized = {}
+    for name, value in filters.items():
+        if value in (None, '', [], ()):
+            continue
+        if isinstance(value, Model):
+            value = value.pk
+        elif isinstance(value, slice):
+            value = [value.start, value.stop]
+        elif isinstance(value, (list, tuple, set)):
+            value = sorted(str(v) for v in value)
+        normalized[name] = value
+    return normalized
@@ -1,10 +1,23 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.core.mail import send_mail, get_connection, EmailMessage
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
-from .models import Ticket, TicketMessage, EscalationSettings, EmailLog
-from .tasks import update_ticket_escalation_times, pause_escalation_on_response
+from .models import Ticket, TicketMessage, EscalationRule, EscalationSettings, SLAPolicy, EmailLog
+from .tasks import pause_escalation_on_response, propagate_escalation_changes
+from .escalation import compute_escalation_deadline, get_propagation_scopes, schedule_escalation
+from .stats import get_ticket_stats_state, apply_ticket_stats_delta, invalidate_ticket_stats
+from .search_cache import invalidate_search_cache
+from .autocomplete import mark_prefix_index_stale
+from .escalation_config import get_escalation_config, invalidate_escalation_config
+from .scheduler import get_escalation_deadline, schedule_deadlines
+from .sla import apply_sla_policy, refresh_ticket_sla, record_first_response
+from .read_model import (
+    get_display_state, get_user_display, refresh_display_fields, record_message_added, recompute_message_fields
+)
+from apps.companies.models import Company
+from apps.users.models import User
 import logging
 import os
 import threading
@@ -281,11 +294,8 @@ def handle_ticket_escalation_on_create(sender, instance, created, **kwargs):
             instance.escalation_paused = False
             instance.last_response_at = instance.created_at
             
-            # Programar el primer escalamiento si está habilitado
-            settings_obj = get_escalation_settings(instance.company)
-            if settings_obj and settings_obj.enabled:
-                # Ejecutar tarea asíncrona para calcular próximo escalamiento
-                update_ticket_escalation_times.delay()
+            # Programar el primer escalamiento calculando solo el vencimiento de este ticket
+            schedule_escalation(instance)
             
             logger.info(f'Escalamiento configurado para ticket {instance.reference}')
             
@@ -300,6 +310,7 @@ def handle_ticket_status_change(sender, instance, **kwargs):
     if instance.pk:  # Solo para tickets existentes
         try:
             old_ticket = Ticket.objects.get(pk=instance.pk)
+            restarted = False
             
             # Si el ticket se resuelve o cierra, pausar escalamiento
             if instance.status in ['RESOLVED', 'CLOSED'] and old_ticket.status not in ['RESOLVED', 'CLOSED']:
@@ -311,20 +322,193 @@ def handle_ticket_status_change(sender, instance, **kwargs):
             elif instance.status in ['OPEN', 'IN_PROGRESS'] and old_ticket.status in ['RESOLVED', 'CLOSED']:
                 instance.escalation_paused = False
                 instance.last_response_at = timezone.now()
-                # La tarea programada recalculará el próximo escalamiento
+                restarted = True
                 logger.info(f'Escalamiento reanudado para ticket {instance.reference}')
             
             # Si se asigna a alguien nuevo, reiniciar el tiempo de escalamiento
             if instance.assigned_to != old_ticket.assigned_to and instance.assigned_to:
                 instance.last_response_at = timezone.now()
                 instance.escalation_paused = False
+                restarted = True
                 logger.info(f'Escalamiento reiniciado para ticket {instance.reference} - Nuevo asignado: {instance.assigned_to.username}')
+            
+            # Recalcular el vencimiento de este ticket (sync_escalation_deadline lo publica al guardar)
+            if restarted:
+                instance.next_escalation_at = compute_escalation_deadline(instance)
                 
         except Ticket.DoesNotExist:
             pass
         except Exception as e:
             logger.error(f'Error manejando cambio de estado para ticket {instance.reference}: {str(e)}')
 
+@receiver(pre_save, sender=Ticket)
+def update_ticket_display_fields(sender, instance, **kwargs):
+    """
+    Refresca company_name y assignee_display cuando cambian la empresa o el asignado
+    """
+    state = get_display_state(instance)
+    if getattr(instance, '_display_state', None) != state:
+        try:
+            refresh_display_fields(instance)
+            instance._display_state = state
+        except Exception as e:
+            logger.error(f'Error actualizando nombres del ticket {instance.reference}: {str(e)}')
+
+@receiver(pre_save, sender=Ticket)
+def update_ticket_sla(sender, instance, **kwargs):
+    """
+    Anota si cambian la empresa, la prioridad o el estado: los vencimientos de SLA no viajan en
+    el guardado (Ticket.DB_MAINTAINED_FIELDS) y se recalculan en refresh_ticket_sla_on_change
+    """
+    if instance._state.adding:
+        # created_at se asigna al guardar: los vencimientos se calculan en apply_new_ticket_sla
+        return
+    previous = getattr(instance, '_stats_state', None)
+    current = (instance.company_id, instance.status, instance.priority)
+    if previous and (previous[0], previous[2], previous[3]) != current:
+        instance._sla_change = (previous[0], previous[3]) != (instance.company_id, instance.priority)
+    else:
+        instance._sla_change = None
+
+@receiver(post_save, sender=Ticket)
+def refresh_ticket_sla_on_change(sender, instance, created, **kwargs):
+    """
+    Recalcula con un UPDATE los vencimientos de SLA si cambian la empresa o la prioridad, y
+    sla_due_at si cambia el estado (resolver o cerrar lo quita, reabrir lo repone)
+    """
+    recompute_policy = getattr(instance, '_sla_change', None)
+    if created or recompute_policy is None:
+        return
+    instance._sla_change = None
+    try:
+        refresh_ticket_sla(instance, recompute_policy=recompute_policy)
+    except Exception as e:
+        logger.error(f'Error calculando el SLA del ticket {instance.reference}: {str(e)}')
+
+@receiver(post_save, sender=Ticket)
+def apply_new_ticket_sla(sender, instance, created, **kwargs):
+    """
+    Calcula los vencimientos de SLA de un ticket nuevo a partir de su created_at
+    """
+    if not created:
+        return
+    try:
+        apply_sla_policy(instance)
+        if instance.sla_due_at is not None:
+            Ticket.objects.filter(pk=instance.pk).update(
+                first_response_due_at=instance.first_response_due_at,
+                resolution_due_at=instance.resolution_due_at,
+                sla_due_at=instance.sla_due_at,
+            )
+    except Exception as e:
+        logger.error(f'Error calculando el SLA del ticket {instance.reference}: {str(e)}')
+
+@receiver(post_save, sender=Company)
+def sync_ticket_company_name(sender, instance, created, **kwargs):
+    """
+    Propaga el cambio de nombre de una empresa a sus tickets
+    """
+    if not created:
+        Ticket.objects.filter(company=instance).exclude(company_name=instance.name).update(company_name=instance.name)
+
+@receiver(post_save, sender=User)
+def sync_ticket_assignee_display(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Propaga el cambio de nombre de un usuario a los tickets que tiene asignados
+    """
+    if created or (update_fields and not {'first_name', 'last_name', 'username'} & set(update_fields)):
+        return
+    display = get_user_display(instance)
+    Ticket.objects.filter(assigned_to=instance).exclude(assignee_display=display).update(assignee_display=display)
+
+@receiver(pre_delete, sender=User)
+def clear_ticket_assignee_display(sender, instance, **kwargs):
+    """
+    Limpia el nombre del asignado en sus tickets antes de que la FK quede en NULL
+    """
+    Ticket.objects.filter(assigned_to=instance).update(assignee_display='')
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+def invalidate_search_cache_on_ticket_change(sender, instance, **kwargs):
+    """
+    Invalida los resultados de búsqueda en caché de los alcances del ticket
+    (incluido el alcance anterior si cambió de empresa o creador)
+    """
+    try:
+        invalidate_search_cache(getattr(instance, '_stats_state', None), get_ticket_stats_state(instance))
+    except Exception as e:
+        logger.error(f'Error invalidando búsqueda en caché para ticket {instance.reference}: {str(e)}')
+
+@receiver(post_save, sender=Ticket)
+def sync_escalation_deadline(sender, instance, **kwargs):
+    """
+    Avisa al planificador cuando cambia el vencimiento de escalamiento del ticket
+    (nuevo vencimiento, pausa, reanudación, cierre o reapertura)
+    """
+    try:
+        deadline = get_escalation_deadline(instance)
+        if deadline != getattr(instance, '_escalation_deadline', None):
+            schedule_deadlines([(instance.pk, deadline)])
+        instance._escalation_deadline = deadline
+    except Exception as e:
+        logger.error(f'Error actualizando vencimiento de escalamiento para ticket {instance.reference}: {str(e)}')
+
+@receiver(post_delete, sender=Ticket)
+def cancel_escalation_deadline(sender, instance, **kwargs):
+    """
+    Quita el vencimiento del ticket eliminado del planificador
+    """
+    if getattr(instance, '_escalation_deadline', None) is not None:
+        schedule_deadlines([(instance.pk, None)])
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+def refresh_autocomplete_index(sender, instance, **kwargs):
+    """
+    Marca el índice de autocompletado en memoria para reconstruirse
+    """
+    mark_prefix_index_stale()
+
+@receiver(post_save, sender=TicketMessage)
+@receiver(post_delete, sender=TicketMessage)
+def invalidate_search_cache_on_message_change(sender, instance, **kwargs):
+    """
+    Invalida los resultados de búsqueda en caché del alcance del ticket al que pertenece el mensaje
+    """
+    try:
+        invalidate_search_cache(get_ticket_stats_state(instance.ticket))
+    except Exception as e:
+        logger.error(f'Error invalidando búsqueda en caché para mensaje {instance.pk}: {str(e)}')
+
+@receiver(post_save, sender=Ticket)
+def update_ticket_stats_on_save(sender, instance, created, **kwargs):
+    """
+    Mantiene actualizados los contadores de estadísticas por alcance (global, empresa, creador)
+    """
+    try:
+        current_state = get_ticket_stats_state(instance)
+        if created:
+            apply_ticket_stats_delta(None, current_state)
+        elif hasattr(instance, '_stats_state'):
+            apply_ticket_stats_delta(instance._stats_state, current_state)
+        else:
+            # Estado anterior desconocido: se recalculan los contadores en la próxima lectura
+            invalidate_ticket_stats(current_state)
+        instance._stats_state = current_state
+    except Exception as e:
+        logger.error(f'Error actualizando contadores para ticket {instance.reference}: {str(e)}')
+
+@receiver(post_delete, sender=Ticket)
+def update_ticket_stats_on_delete(sender, instance, **kwargs):
+    """
+    Descuenta el ticket eliminado de los contadores de estadísticas
+    """
+    try:
+        apply_ticket_stats_delta(getattr(instance, '_stats_state', get_ticket_stats_state(instance)), None)
+    except Exception as e:
+        logger.error(f'Error actualizando contadores para ticket {instance.reference}: {str(e)}')
+
 @receiver(post_save, sender=TicketMessage)
 def handle_message_added_escalation(sender, instance, created, **kwargs):
     """
@@ -333,17 +517,81 @@ def handle_message_added_escalation(sender, instance, created, **kwargs):
     if created:
         try:
             ticket = instance.ticket
-            settings_obj = get_escalation_settings(ticket.company)
+            settings_obj = get_escalation_config().get_settings(ticket.company_id)
             
             # Solo pausar si la configuración lo permite y el mensaje no es privado
             if settings_obj and settings_obj.pause_on_response and not instance.private:
                 # Ejecutar tarea asíncrona para pausar escalamiento
                 pause_escalation_on_response.delay(ticket.id, instance.id)
                 logger.info(f'Escalamiento pausado por respuesta en ticket {ticket.reference}')
+            
+            # Sin pausa por respuesta: la respuesta reinicia el plazo de este ticket
+            elif settings_obj and not instance.private and not ticket.escalation_paused:
+                schedule_escalation(ticket, responded_at=instance.created_at)
                 
         except Exception as e:
             logger.error(f'Error pausando escalamiento por mensaje: {str(e)}')
 
+@receiver(post_save, sender=EscalationRule)
+@receiver(post_delete, sender=EscalationRule)
+@receiver(post_save, sender=EscalationSettings)
+@receiver(post_delete, sender=EscalationSettings)
+def invalidate_escalation_config_on_change(sender, instance, **kwargs):
+    """
+    Invalida la configuración de escalamiento compilada. Se invalida de nuevo al confirmar la
+    transacción para que ningún proceso se quede con una copia compilada antes del commit, y
+    luego se recalculan en segundo plano los vencimientos de los tickets afectados.
+    """
+    invalidate_escalation_config()
+    transaction.on_commit(invalidate_escalation_config)
+    
+    scopes = get_propagation_scopes(instance)
+    transaction.on_commit(lambda: propagate_escalation_changes.delay(scopes))
+
+@receiver(post_save, sender=SLAPolicy)
+@receiver(post_delete, sender=SLAPolicy)
+def invalidate_sla_policies_on_change(sender, instance, **kwargs):
+    """
+    Las políticas de SLA forman parte de la configuración compilada: se invalida igual que al
+    cambiar reglas o configuración. Los tickets existentes conservan sus vencimientos.
+    """
+    invalidate_escalation_config()
+    transaction.on_commit(invalidate_escalation_config)
+
+@receiver(post_save, sender=TicketMessage)
+def record_ticket_first_response(sender, instance, created, **kwargs):
+    """
+    Registra la primera respuesta de un técnico para el SLA de primera respuesta
+    """
+    if created:
+        try:
+            record_first_response(instance)
+        except Exception as e:
+            logger.error(f'Error registrando primera respuesta del ticket {instance.ticket_id}: {str(e)}')
+
+@receiver(post_save, sender=TicketMessage)
+def update_ticket_message_summary(sender, instance, created, **kwargs):
+    """
+    Mantiene message_count y los datos del último mensaje del ticket
+    """
+    try:
+        if created:
+            record_message_added(instance)
+        else:
+            recompute_message_fields([instance.ticket_id])
+    except Exception as e:
+        logger.error(f'Error actualizando resumen de mensajes del ticket {instance.ticket_id}: {str(e)}')
+
+@receiver(post_delete, sender=TicketMessage)
+def update_ticket_message_summary_on_delete(sender, instance, **kwargs):
+    """
+    Recalcula el resumen de mensajes del ticket al eliminar un mensaje
+    """
+    try:
+        recompute_message_fields([instance.ticket_id])
+    except Exception as e:
+        logger.error(f'Error actualizando resumen de mensajes del ticket {instance.ticket_id}: {str(e)}')
+
 @receiver(post_save, sender=TicketMessage)
 def send_message_notification(sender, instance, created, **kwargs):
     """
@@ -509,17 +757,3 @@ def send_message_notification_async(message_id, ticket_id, ticket_reference, tic
         
     except Exception as e:
         logger.error(f'Error crítico en envío asíncrono de notificación de mensaje: {str(e)}')
-
-def get_escalation_settings(company):
-    """Obtiene la configuración de escalamiento para una empresa"""
-    try:
-        if company:
-            return EscalationSettings.objects.get(company=company)
-    except EscalationSettings.DoesNotExist:
-        pass
-    
-    # Configuración global por defecto
-    try:
-        return EscalationSettings.objects.get(company__isnull=True)
-    except EscalationSettings.DoesNotExist:
-        return None
@@ -0,0 +1,193 @@
+"""
+Simulador de escalamiento ("qué pasaría si").
+
+Reproduce los tickets y mensajes de un período contra un conjunto candidato de reglas y de
+configuración, sin tocar la base de datos, para proyectar cuántos escalamientos habría por nivel,
+por destinatario y por hora del día. Los tickets se agrupan por empresa y prioridad (misma regla
+y mismo calendario) y cada nivel se resuelve para todo el grupo a la vez: los vencimientos se
+calculan por columnas con el calendario laboral compilado en lugar de ticket por ticket.
+"""
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from datetime import timedelta
+from django.utils import timezone
+from .models import Ticket, TicketMessage
+from .escalation_config import EscalationConfig
+from .read_model import get_user_display
+import copy
+import time
+
+PRIORITIES = ['LOW', 'MEDIUM', 'HIGH']
+
+def parse_rule_overrides(text):
+    """
+    Horas candidatas por regla: elementos PRIORIDAD:NIVEL:HORAS separados por comas, espacios o
+    saltos de línea (p. ej. "HIGH:1:8, HIGH:2:24"). Retorna {(prioridad, nivel): horas}.
+    """
+    overrides = {}
+    for item in (text or '').replace(',', ' ').split():
+        parts = item.split(':')
+        if len(parts) != 3 or parts[0].upper() not in PRIORITIES:
+            raise ValueError(f'Regla inválida: {item} (formato PRIORIDAD:NIVEL:HORAS)')
+        try:
+            level, hours = int(parts[1]), int(parts[2])
+        except ValueError:
+            raise ValueError(f'Regla inválida: {item} (nivel y horas deben ser enteros)')
+        if level < 1 or hours < 1:
+            raise ValueError(f'Regla inválida: {item} (nivel y horas deben ser mayores que cero)')
+        overrides[(parts[0].upper(), level)] = hours
+    return overrides
+
+def build_candidate_config(rule_hours=None, settings_overrides=None, base_config=None):
+    """
+    Configuración candidata: copia de la configuración vigente con las horas de `rule_hours`
+    ({(prioridad, nivel): horas}, aplicadas a las reglas globales y de empresa) y los campos de
+    `settings_overrides` (p. ej. max_escalation_level, business_hours_only) en todas las
+    configuraciones. Las instancias originales no se modifican.
+    """
+    base_config = base_config or EscalationConfig.load()
+    rule_hours = rule_hours or {}
+    settings_overrides = settings_overrides or {}
+
+    settings_list = []
+    for settings in [base_config.global_settings, *base_config.settings_by_company.values()]:
+        if settings is None:
+            continue
+        settings = copy.copy(settings)
+        for field, value in settings_overrides.items():
+            setattr(settings, field, value)
+        settings_list.append(settings)
+
+    rules = {}
+    for rule_map in [base_config.global_rules, *base_config.rules_by_company.values()]:
+        for rule in rule_map.values():
+            if rule.pk not in rules:
+                rule = copy.copy(rule)
+                rule.hours_to_escalate = rule_hours.get((rule.priority, rule.level), rule.hours_to_escalate)
+                rules[rule.pk] = rule
+    return EscalationConfig(settings_list, list(rules.values()))
+
+def load_history(since, until, company_id=None):
+    """
+    Tickets creados en [since, until) y los instantes de sus respuestas públicas, en dos
+    consultas. Los tickets resueltos o cerrados dejan de escalar en su última actualización.
+    """
+    tickets = Ticket.objects.filter(created_at__gte=since, created_at__lt=until)
+    if company_id:
+        tickets = tickets.filter(company_id=company_id)
+
+    rows = list(tickets.values_list('id', 'company_id', 'priority', 'status', 'created_at', 'updated_at').order_by('id'))
+
+    responses = defaultdict(list)
+    messages = TicketMessage.objects.filter(ticket__in=tickets, private=False)
+    for ticket_id, created_at in messages.values_list('ticket_id', 'created_at').order_by('ticket_id', 'created_at').iterator():
+        responses[ticket_id].append(created_at)
+    return rows, responses
+
+def simulate_escalations(since, until=None, rule_hours=None, settings_overrides=None, company_id=None):
+    """
+    Proyecta los escalamientos de los tickets del período con la configuración candidata.
+    Retorna un diccionario con los totales por nivel, por destinatario y por hora del día.
+    """
+    started = time.monotonic()
+    until = until or timezone.now()
+    config = build_candidate_config(rule_hours, settings_overrides)
+    rows, responses = load_history(since, until, company_id)
+
+    groups = defaultdict(list)
+    for row in rows:
+        groups[(row[1], row[2])].append(row)
+
+    by_level = Counter()
+    by_assignee = Counter()
+    by_hour = [0] * 24
+    escalated_tickets = 0
+
+    for (company, priority), group in groups.items():
+        settings = config.get_settings(company)
+        if settings is None or not settings.enabled:
+            continue
+        calendar = settings.get_calendar() if settings.business_hours_only else None
+
+        # Columnas del grupo: base del plazo, fin de la actividad, respuestas y asignado simulado
+        bases = [row[4] for row in group]
+        ends = [row[5] if row[3] not in ('OPEN', 'IN_PROGRESS') else until for row in group]
+        replies = [responses.get(row[0], []) for row in group]
+        assignees = [None] * len(group)
+        active = list(range(len(group)))
+        reached = [False] * len(group)
+
+        for level in range(1, settings.max_escalation_level + 1):
+            rule = config.get_rule(company, priority, level)
+            if not rule or not active:
+                break
+
+            deadlines = compute_deadlines([bases[i] for i in active], rule.hours_to_escalate, calendar)
+            still_active = []
+            pending = list(zip(active, deadlines))
+
+            while pending:
+                moved = []
+                deadlines = [deadline for _, deadline in pending]
+                fire_ats = calendar.next_business_instant_many(deadlines) if calendar else deadlines
+                for (i, deadline), fire_at in zip(pending, fire_ats):
+                    # Primera respuesta posterior a la base del plazo
+                    position = bisect_right(replies[i], bases[i])
+                    reply = replies[i][position] if position < len(replies[i]) else None
+                    if reply is not None and reply < deadline:
+                        if settings.pause_on_response:
+                            # La respuesta pausa el escalamiento del ticket
+                            continue
+                        # Sin pausa, la respuesta reinicia el plazo
+                        bases[i] = reply
+                        moved.append(i)
+                        continue
+
+                    if fire_at >= ends[i]:
+                        continue
+
+                    by_level[level] += 1
+                    by_assignee[rule.escalate_to_id] += 1
+                    by_hour[timezone.localtime(fire_at).hour] += 1
+                    reached[i] = True
+                    if settings.auto_assign_on_escalation and rule.escalate_to_id != assignees[i]:
+                        # Como en escalate_chunk: la reasignación reinicia el tiempo de respuesta
+                        assignees[i] = rule.escalate_to_id
+                        bases[i] = fire_at
+                    still_active.append(i)
+
+                pending = list(zip(moved, compute_deadlines([bases[i] for i in moved], rule.hours_to_escalate, calendar)))
+
+            active = still_active
+
+        escalated_tickets += sum(reached)
+
+    users = {
+        rule.escalate_to_id: rule.escalate_to
+        for rule_map in [config.global_rules, *config.rules_by_company.values()]
+        for rule in rule_map.values()
+    }
+    return {
+        'since': since,
+        'until': until,
+        'tickets': len(rows),
+        'escalated_tickets': escalated_tickets,
+        'escalations': sum(by_level.values()),
+        'by_level': sorted(by_level.items()),
+        'by_assignee': [
+            (get_user_display(users[user_id]), count)
+            for user_id, count in by_assignee.most_common()
+        ],
+        'by_hour': by_hour,
+        'duration_seconds': time.monotonic() - started,
+    }
+
+def compute_deadlines(bases, hours, calendar=None):
+    """
+    Vencimientos de una columna de bases con el mismo plazo, en horas laborales si hay calendario
+    (con la tabla de días laborales compartida por toda la columna, ver add_business_hours_many)
+    """
+    if calendar is not None:
+        return calendar.add_business_hours_many(bases, hours)
+    delta = timedelta(hours=hours)
+    return [base + delta for base in bases]
@@ -0,0 +1,236 @@
+"""
+Acuerdos de nivel de servicio (SLA).
+
+Los vencimientos de primera respuesta y de resolución se calculan una sola vez, al crear el
+ticket o cambiar su prioridad, con la política de SLA de la empresa (o la global) y el
+calendario laboral de su configuración de escalamiento. sla_due_at guarda el próximo vencimiento
+pendiente, de modo que la detección de incumplimientos es una consulta por rango sobre el
+índice parcial ticket_sla_due_idx; los incumplidos se marcan con un UPDATE por bloque y sus
+notificaciones se encolan juntas. Cada tipo de vencimiento registra su propio incumplimiento:
+incumplir la primera respuesta mueve sla_due_at al vencimiento de resolución.
+
+Todas estas columnas se escriben solo con UPDATE (Ticket.DB_MAINTAINED_FIELDS): un guardado
+completo de una instancia obsoleta no puede deshacer un incumplimiento ya registrado.
+"""
+from datetime import timedelta
+from django.conf import settings as django_settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from .models import Ticket
+from .escalation_config import get_escalation_config
+import logging
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ['OPEN', 'IN_PROGRESS']
+
+# Campos necesarios para clasificar, registrar y notificar un incumplimiento
+BREACH_FIELDS = [
+    'id', 'reference', 'title', 'company_id', 'priority', 'status', 'assigned_to_id', 'created_at',
+    'first_response_at', 'first_response_due_at', 'resolution_due_at', 'sla_due_at',
+    'sla_breached', 'sla_breached_at', 'first_response_breached_at', 'resolution_breached_at',
+]
+
+# Columnas que escribe el registro de un incumplimiento
+BREACH_UPDATE_FIELDS = [
+    'sla_due_at', 'sla_breached', 'sla_breached_at', 'first_response_breached_at', 'resolution_breached_at',
+]
+
+# Columnas de SLA que se leen de la base de datos al recalcular tras un guardado
+SLA_STATE_FIELDS = ['first_response_at', 'first_response_breached_at', 'resolution_breached_at']
+
+BREACH_KIND_LABELS = {
+    'first_response': 'primera respuesta',
+    'resolution': 'resolución',
+}
+
+def compute_sla_due(ticket, config=None):
+    """
+    (vencimiento de primera respuesta, vencimiento de resolución) del ticket según su política
+    de SLA, contados desde su creación; (None, None) si no tiene política
+    """
+    config = config or get_escalation_config()
+    policy = config.get_sla_policy(ticket.company_id, ticket.priority)
+    if policy is None:
+        return None, None
+
+    # En pre_save de un ticket nuevo created_at todavía no tiene valor
+    start = ticket.created_at or timezone.now()
+    settings = config.get_settings(ticket.company_id)
+    if policy.business_hours_only and settings is not None:
+        calendar = settings.get_calendar()
+        return (
+            calendar.add_business_hours(start, policy.first_response_hours),
+            calendar.add_business_hours(start, policy.resolution_hours),
+        )
+    return start + timedelta(hours=policy.first_response_hours), start + timedelta(hours=policy.resolution_hours)
+
+def get_pending_dues(ticket):
+    """{tipo: vencimiento} de los vencimientos del ticket aún sin cumplir ni incumplir"""
+    pending = {}
+    if ticket.first_response_at is None and ticket.first_response_breached_at is None and ticket.first_response_due_at:
+        pending['first_response'] = ticket.first_response_due_at
+    if ticket.resolution_breached_at is None and ticket.resolution_due_at:
+        pending['resolution'] = ticket.resolution_due_at
+    return pending
+
+def get_sla_due(ticket):
+    """Próximo vencimiento de SLA pendiente del ticket (valor de sla_due_at), o None"""
+    if ticket.status not in ACTIVE_STATUSES:
+        return None
+    return min(get_pending_dues(ticket).values(), default=None)
+
+def apply_sla_policy(ticket, config=None):
+    """Recalcula los vencimientos de SLA del ticket en memoria (sin guardar)"""
+    ticket.first_response_due_at, ticket.resolution_due_at = compute_sla_due(ticket, config)
+    ticket.sla_due_at = get_sla_due(ticket)
+
+def refresh_ticket_sla(ticket, recompute_policy=False):
+    """
+    Tras guardar un ticket existente con otro estado, empresa o prioridad: recalcula sla_due_at
+    (y, con `recompute_policy`, los vencimientos) sobre la primera respuesta y los incumplimientos
+    leídos de la base de datos, y los escribe con un UPDATE
+    """
+    current = Ticket.objects.only(*SLA_STATE_FIELDS).get(pk=ticket.pk)
+    for field in SLA_STATE_FIELDS:
+        setattr(ticket, field, getattr(current, field))
+
+    updates = {}
+    if recompute_policy:
+        ticket.first_response_due_at, ticket.resolution_due_at = compute_sla_due(ticket)
+        updates['first_response_due_at'] = ticket.first_response_due_at
+        updates['resolution_due_at'] = ticket.resolution_due_at
+    ticket.sla_due_at = updates['sla_due_at'] = get_sla_due(ticket)
+    Ticket.objects.filter(pk=ticket.pk).update(**updates)
+
+def record_first_response(message):
+    """
+    Registra la primera respuesta pública de un técnico y mueve sla_due_at al vencimiento de
+    resolución. El UPDATE es condicional para que dos respuestas simultáneas no se pisen.
+    """
+    ticket = message.ticket
+    if message.private or ticket.first_response_at is not None:
+        return False
+    if message.sender is None or not message.sender.can_handle_tickets():
+        return False
+
+    # Incumplimientos y vencimientos de la base de datos: la instancia del mensaje puede ser anterior
+    current = Ticket.objects.only('status', 'resolution_due_at', *SLA_STATE_FIELDS).get(pk=ticket.pk)
+    for field in ('status', 'resolution_due_at', *SLA_STATE_FIELDS):
+        setattr(ticket, field, getattr(current, field))
+    if ticket.first_response_at is not None:
+        return False
+
+    ticket.first_response_at = message.created_at
+    ticket.sla_due_at = get_sla_due(ticket)
+    return bool(Ticket.objects.filter(pk=ticket.pk, first_response_at__isnull=True).update(
+        first_response_at=ticket.first_response_at,
+        sla_due_at=ticket.sla_due_at,
+    ))
+
+def get_breached_tickets(now):
+    """Tickets activos con un vencimiento de SLA pendiente ya pasado (usa ticket_sla_due_idx)"""
+    return Ticket.objects.filter(status__in=ACTIVE_STATUSES, sla_due_at__lte=now)
+
+def get_breach_kinds(ticket, now):
+    """Tipos de vencimiento pendientes del ticket que ya pasaron"""
+    return [kind for kind, due in get_pending_dues(ticket).items() if due <= now]
+
+def record_breaches(ticket, kinds, now):
+    """Registra en memoria los incumplimientos y mueve sla_due_at al siguiente vencimiento pendiente"""
+    for kind in kinds:
+        setattr(ticket, f'{kind}_breached_at', now)
+    ticket.sla_breached = True
+    ticket.sla_breached_at = ticket.sla_breached_at or now
+    ticket.sla_due_at = get_sla_due(ticket)
+
+def detect_sla_breaches(now=None, batch_size=None):
+    """
+    Marca los tickets con SLA incumplido en bloques: una consulta por rango, un UPDATE y un
+    envío de notificaciones (en la aplicación y por email) por bloque. Retorna cuántos
+    incumplimientos se registraron (un ticket puede incumplir primera respuesta y resolución).
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or getattr(django_settings, 'SLA_BATCH_SIZE', 500)
+    superadmin_ids = None
+    breached_count = 0
+
+    while True:
+        if superadmin_ids is None:
+            superadmin_ids = list(get_user_model().objects.filter(role='SUPERADMIN', is_active=True).values_list('id', flat=True))
+
+        with transaction.atomic():
+            # Filas bloqueadas: una respuesta o un cambio de estado simultáneos esperan a este bloque
+            chunk = list(
+                get_breached_tickets(now).select_for_update(skip_locked=True)
+                .order_by('sla_due_at', 'id').only(*BREACH_FIELDS)[:batch_size]
+            )
+            if not chunk:
+                break
+
+            breached = []
+            for ticket in chunk:
+                kinds = get_breach_kinds(ticket, now)
+                record_breaches(ticket, kinds, now)
+                breached.extend((ticket, kind) for kind in kinds)
+            Ticket.objects.bulk_update(chunk, BREACH_UPDATE_FIELDS)
+
+            notifications, breaches = build_breach_notifications(breached, now, superadmin_ids)
+            transaction.on_commit(lambda notifications=notifications, breaches=breaches: dispatch_breach_notifications(notifications, breaches))
+
+        breached_count += len(breached)
+        if len(chunk) < batch_size:
+            break
+
+    return breached_count
+
+def build_breach_notifications(breached, now, superadmin_ids):
+    """
+    Notificaciones (serializables) para el asignado, los administradores de la empresa y los
+    superadmins de cada (ticket, tipo) incumplido, y los datos de cada incumplimiento para el email
+    """
+    company_admins = {}
+    for user_id, company_id in get_user_model().objects.filter(
+        role='COMPANY_ADMIN', is_active=True, company_id__in={ticket.company_id for ticket, kind in breached}
+    ).values_list('id', 'company_id'):
+        company_admins.setdefault(company_id, []).append(user_id)
+
+    notifications = []
+    breaches = []
+    for ticket, kind in breached:
+        due = ticket.first_response_due_at if kind == 'first_response' else ticket.resolution_due_at
+        recipients = {*superadmin_ids, *company_admins.get(ticket.company_id, [])}
+        if ticket.assigned_to_id:
+            recipients.add(ticket.assigned_to_id)
+
+        for recipient_id in sorted(recipients):
+            notifications.append({
+                'recipient_id': recipient_id,
+                'notification_type': 'sla_breach',
+                'verb': f"SLA de {BREACH_KIND_LABELS[kind]} incumplido: {ticket.reference}",
+                'description': f"{ticket.title} (vencía el {timezone.localtime(due):%d/%m/%Y %H:%M})",
+                'object_id': ticket.id,
+            })
+        breaches.append({
+            'ticket_id': ticket.id,
+            'sla_info': {
+                'kind': kind,
+                'priority': ticket.priority,
+                'due_at': due.isoformat(),
+                'created_at': ticket.created_at.isoformat(),
+                'overdue_hours': round((now - due).total_seconds() / 3600, 1),
+            },
+        })
+    return notifications, breaches
+
+def dispatch_breach_notifications(notifications, breaches):
+    """Encola las notificaciones y los emails de un bloque de incumplimientos, una tarea de cada tipo"""
+    from apps.notifications.tasks import create_notifications_batch, send_email_notification_async
+
+    try:
+        if notifications:
+            create_notifications_batch.delay(notifications)
+        send_email_notification_async.delay('sla_breaches', breaches=breaches)
+    except Exception as e:
+        logger.error(f"Error encolando notificaciones de {len(breaches)} incumplimientos de SLA: {e}")
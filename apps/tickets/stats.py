@@ -0,0 +1,130 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Contadores mostrados en la lista de tickets y la condición que cuenta cada uno
+STATS_COUNTERS = {
+    'total_count': Q(),
+    'open_count': Q(status='OPEN'),
+    'in_progress_count': Q(status='IN_PROGRESS'),
+    'resolved_count': Q(status='RESOLVED'),
+    'closed_count': Q(status='CLOSED'),
+    'high_priority_count': Q(priority='HIGH'),
+}
+
+CACHE_KEY_PREFIX = 'ticket_stats'
+
+def aggregate_ticket_stats(queryset):
+    """Calcula todas las estadísticas de la lista en una sola consulta con agregados condicionales"""
+    aggregates = {
+        name: Count('id', filter=condition) if condition else Count('id')
+        for name, condition in STATS_COUNTERS.items()
+    }
+    return queryset.order_by().aggregate(**aggregates)
+
+def get_stats_scope(user):
+    """
+    Retorna el alcance (scope) de visibilidad del usuario para los contadores:
+    ('global', None), ('company', company_id) o ('creator', user_id)
+    """
+    if user.is_superadmin() or user.is_technician():
+        return ('global', None)
+    if user.is_company_admin():
+        return ('company', user.company_id)
+    return ('creator', user.id)
+
+def get_ticket_stats(user, queryset):
+    """
+    Obtiene las estadísticas de tickets para el alcance del usuario.
+
+    Si TICKET_STATS_CACHE_ENABLED está activo se usan los contadores en caché,
+    mantenidos por las señales de guardado/eliminación de tickets; solo se consulta
+    la base de datos cuando el alcance aún no tiene contadores.
+    """
+    if not getattr(settings, 'TICKET_STATS_CACHE_ENABLED', False):
+        return aggregate_ticket_stats(queryset)
+
+    keys = _scope_keys(get_stats_scope(user))
+    cached = cache.get_many(keys.values())
+    if len(cached) == len(keys):
+        return {name: cached[key] for name, key in keys.items()}
+
+    stats = aggregate_ticket_stats(queryset)
+    cache.set_many(
+        {keys[name]: value for name, value in stats.items()},
+        timeout=getattr(settings, 'TICKET_STATS_CACHE_TIMEOUT', 300)
+    )
+    return stats
+
+def get_ticket_stats_state(ticket):
+    """Estado de un ticket relevante para los contadores"""
+    return (ticket.company_id, ticket.created_by_id, ticket.status, ticket.priority)
+
+def apply_ticket_stats_delta(previous_state, current_state):
+    """
+    Ajusta los contadores en caché a partir del estado anterior y actual de un ticket.
+    Un estado None significa que el ticket no existía (creación) o dejó de existir (eliminación).
+    """
+    if not getattr(settings, 'TICKET_STATS_CACHE_ENABLED', False):
+        return
+    if previous_state == current_state:
+        return
+
+    deltas = {}
+    for state, sign in ((previous_state, -1), (current_state, 1)):
+        if state is None:
+            continue
+        status, priority = state[2], state[3]
+        for scope in _state_scopes(state):
+            for name, count in _state_counters(status, priority).items():
+                if count:
+                    key = _scope_keys(scope)[name]
+                    deltas[key] = deltas.get(key, 0) + sign * count
+
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # El alcance aún no tiene contadores: se calcularán en la próxima lectura
+            pass
+        except Exception as e:
+            logger.warning(f"No se pudo actualizar el contador {key}: {e}")
+            cache.delete(key)
+
+def invalidate_ticket_stats(state):
+    """Elimina los contadores de los alcances a los que pertenece un ticket"""
+    if not getattr(settings, 'TICKET_STATS_CACHE_ENABLED', False):
+        return
+    keys = []
+    for scope in _state_scopes(state):
+        keys.extend(_scope_keys(scope).values())
+    cache.delete_many(keys)
+
+def _state_scopes(state):
+    company_id, created_by_id, status, priority = state
+    scopes = [('global', None), ('company', company_id)]
+    if created_by_id:
+        scopes.append(('creator', created_by_id))
+    return scopes
+
+def _state_counters(status, priority):
+    return {
+        'total_count': 1,
+        'open_count': int(status == 'OPEN'),
+        'in_progress_count': int(status == 'IN_PROGRESS'),
+        'resolved_count': int(status == 'RESOLVED'),
+        'closed_count': int(status == 'CLOSED'),
+        'high_priority_count': int(priority == 'HIGH'),
+    }
+
+def _scope_keys(scope):
+    scope_name, scope_id = scope
+    return {
+        name: f"{CACHE_KEY_PREFIX}:{scope_name}:{scope_id}:{name}"
+        for name in STATS_COUNTERS
+    }
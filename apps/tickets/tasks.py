@@ -1,8 +1,13 @@
 from celery import shared_task
+from celery.signals import worker_process_init
+from django.conf import settings as django_settings
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.contrib.auth import get_user_model
 from datetime import timedelta, datetime
-from .models import Ticket, EscalationRule, EscalationLog, EscalationSettings
+from .models import Ticket, EscalationLog, EscalationSettings
+from .escalation_config import get_escalation_config, warm_escalation_config
+from .locks import single_instance
 from apps.notifications.utils import create_notification
 from apps.notifications.email_service import EmailService
 import logging
@@ -10,37 +15,122 @@ import logging
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+# Cada proceso worker compila la configuración de escalamiento al iniciar
+worker_process_init.connect(warm_escalation_config)
+
 @shared_task
+@single_instance('escalations', ttl=600)
 def process_ticket_escalations():
     """
     Tarea principal que procesa todos los tickets que necesitan escalamiento
     Se ejecuta cada 15 minutos para verificar tickets pendientes
     """
+    from .escalation import process_due_escalations, dispatch_partitions
+    from .scheduler import get_deadline_scheduler, request_wakeup
+    
+    try:
+        if getattr(django_settings, 'ESCALATION_FANOUT_ENABLED', False):
+            # Una partición por empresa en paralelo; el callback agrega los resultados
+            result = f"Despachadas {dispatch_partitions(timezone.now())} particiones"
+        else:
+            # Procesamiento por lotes (ver escalation.py)
+            escalated_count = process_due_escalations()
+            logger.info(f"Escalamiento completado: {escalated_count} tickets escalados")
+            result = f"Escalados {escalated_count} tickets"
+        
+        # Rearma el despachador por si se perdió su próxima ejecución (en ambos modos)
+        next_deadline = get_deadline_scheduler().next_deadline()
+        if next_deadline:
+            request_wakeup(next_deadline, force=True)
+        
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error en process_ticket_escalations: {e}")
+        raise
+
+@shared_task
+def escalate_company_partition(company_id, now):
+    """
+    Escala los tickets vencidos de una empresa (una partición del modo en paralelo)
+    """
+    from .escalation import escalate_partition
+    
+    return escalate_partition(company_id, parse_datetime(now))
+
+@shared_task
+def collect_escalation_partitions(results, started_at):
+    """
+    Callback del chord de particiones: agrega conteos y métricas de lag por empresa
+    """
+    from .escalation import summarize_partitions
+    
+    return summarize_partitions(results, started_at)
+
+@shared_task
+@single_instance('escalations', ttl=600)
+def dispatch_due_escalations():
+    """
+    Despachador del planificador de vencimientos (ver scheduler.py): escala los tickets cuyo
+    vencimiento llegó (con ESCALATION_FANOUT_ENABLED, reparte sus empresas entre los workers)
+    y se programa a sí mismo para el siguiente vencimiento
+    """
+    from .escalation import process_due_escalations, dispatch_partitions, get_due_tickets
+    from .scheduler import (
+        RETRY_DELAY, get_deadline_scheduler, request_wakeup, clear_wakeup, get_unprocessed, requeue_unprocessed
+    )
+    
     try:
+        scheduler = get_deadline_scheduler()
+        clear_wakeup()
         now = timezone.now()
+        fanout = getattr(django_settings, 'ESCALATION_FANOUT_ENABLED', False)
+        batch_size = getattr(django_settings, 'ESCALATION_BATCH_SIZE', 500)
         escalated_count = 0
         
-        # Obtener tickets que necesitan escalamiento
-        tickets_to_escalate = Ticket.objects.filter(
-            status__in=['OPEN', 'IN_PROGRESS'],
-            escalation_paused=False,
-            next_escalation_at__lte=now
-        ).select_related('company', 'created_by', 'assigned_to')
-        
-        logger.info(f"Procesando {tickets_to_escalate.count()} tickets para escalamiento")
-        
-        for ticket in tickets_to_escalate:
+        if fanout and scheduler.stores_deadlines:
+            # Los ids retirados se agrupan por empresa; antes de despachar vuelven al planificador
+            # para reintentarse tras RETRY_DELAY, y cada partición reprograma los que escale
+            company_ids = set()
+            while True:
+                ticket_ids = scheduler.pop_due(now, batch_size)
+                if not ticket_ids:
+                    break
+                due = dict(get_due_tickets(now).filter(id__in=ticket_ids).values_list('id', 'company_id'))
+                scheduler.schedule_many((ticket_id, now + RETRY_DELAY) for ticket_id in due)
+                company_ids.update(due.values())
+            dispatched = dispatch_partitions(now, company_ids) if company_ids else 0
+        elif fanout:
+            dispatched = dispatch_partitions(now)
+        elif scheduler.stores_deadlines:
+            # pop_due retira los ids antes de procesarlos: los que sigan vencidos se devuelven
+            unprocessed = []
             try:
-                if escalate_ticket(ticket.id):
-                    escalated_count += 1
-            except Exception as e:
-                logger.error(f"Error escalando ticket {ticket.reference}: {e}")
-        
-        logger.info(f"Escalamiento completado: {escalated_count} tickets escalados")
-        return f"Escalados {escalated_count} tickets"
+                while True:
+                    ticket_ids = scheduler.pop_due(now, batch_size)
+                    if not ticket_ids:
+                        break
+                    try:
+                        escalated_count += process_due_escalations(now=now, ticket_ids=ticket_ids)
+                    finally:
+                        unprocessed.extend(get_unprocessed(ticket_ids, now))
+            finally:
+                requeue_unprocessed(scheduler, unprocessed, now)
+        else:
+            escalated_count = process_due_escalations(now=now)
+        
+        next_deadline = scheduler.next_deadline()
+        if next_deadline:
+            request_wakeup(next_deadline)
+        
+        if fanout:
+            logger.info(f"Despachador de escalamiento: {dispatched} particiones despachadas, próximo vencimiento {next_deadline}")
+            return dispatched
+        logger.info(f"Despachador de escalamiento: {escalated_count} tickets escalados, próximo vencimiento {next_deadline}")
+        return escalated_count
         
     except Exception as e:
-        logger.error(f"Error en process_ticket_escalations: {e}")
+        logger.error(f"Error en dispatch_due_escalations: {e}")
         raise
 
 @shared_task
@@ -115,33 +205,30 @@ def escalate_ticket(ticket_id):
         raise
 
 @shared_task
+def propagate_escalation_changes(scopes):
+    """
+    Recalcula los vencimientos de los tickets afectados por un cambio de reglas o configuración
+    de escalamiento. `scopes` es una lista de [empresa, prioridad, nivel]
+    """
+    from .escalation import propagate_escalation_change
+    
+    progress = propagate_escalation_change([tuple(scope) for scope in scopes])
+    return f"Recalculados {progress['updated']} de {progress['processed']} tickets"
+
+@shared_task
+@single_instance()
 def update_ticket_escalation_times():
     """
-    Actualiza los tiempos de escalamiento para tickets activos
-    Se ejecuta cuando se crean nuevos tickets o se responden
+    Barrido de conciliación (cada hora): programa los tickets activos que quedaron sin
+    vencimiento y republica los vencimientos en el planificador, en bloques acotados.
+    Los tickets nuevos, respondidos o reanudados se programan individualmente (escalation.schedule_escalation)
     """
+    from .escalation import reconcile_escalation_deadlines
+    
     try:
-        updated_count = 0
-        
-        # Tickets activos sin escalamiento programado
-        tickets = Ticket.objects.filter(
-            status__in=['OPEN', 'IN_PROGRESS'],
-            escalation_paused=False,
-            next_escalation_at__isnull=True
-        ).select_related('company')
-        
-        for ticket in tickets:
-            settings = get_escalation_settings(ticket.company)
-            if settings.enabled:
-                next_level = ticket.escalation_level + 1
-                escalation_rule = get_escalation_rule(ticket, next_level)
-                
-                if escalation_rule:
-                    ticket.next_escalation_at = calculate_next_escalation_time(ticket, escalation_rule, settings)
-                    ticket.save()
-                    updated_count += 1
-        
-        logger.info(f"Actualizados tiempos de escalamiento para {updated_count} tickets")
+        updated_count, checked_count = reconcile_escalation_deadlines()
+        
+        logger.info(f"Conciliación de escalamiento: {updated_count} tickets programados de {checked_count} revisados")
         return f"Actualizados {updated_count} tickets"
         
     except Exception as e:
@@ -188,19 +275,15 @@ def resume_escalation(ticket_id):
     Reanuda el escalamiento de un ticket
     """
     try:
+        from .escalation import compute_escalation_deadline
+        
         ticket = Ticket.objects.get(id=ticket_id)
-        settings = get_escalation_settings(ticket.company)
         
         if ticket.escalation_paused:
             ticket.escalation_paused = False
             
-            # Recalcular próximo escalamiento
-            next_level = ticket.escalation_level + 1
-            escalation_rule = get_escalation_rule(ticket, next_level)
-            
-            if escalation_rule:
-                ticket.next_escalation_at = calculate_next_escalation_time(ticket, escalation_rule, settings)
-            
+            # Recalcular solo el vencimiento de este ticket (la señal post_save lo publica)
+            ticket.next_escalation_at = compute_escalation_deadline(ticket)
             ticket.save()
             
             # Registrar la reanudación
@@ -224,84 +307,39 @@ def resume_escalation(ticket_id):
         raise
 
 def get_escalation_settings(company):
-    """Obtiene la configuración de escalamiento para una empresa"""
-    try:
-        if company:
-            return EscalationSettings.objects.get(company=company)
-    except EscalationSettings.DoesNotExist:
-        pass
+    """Obtiene la configuración de escalamiento para una empresa (ver escalation_config.py)"""
+    settings = get_escalation_config().get_settings(company.id if company else None)
+    if settings is not None:
+        return settings
     
-    # Configuración global por defecto
-    try:
-        return EscalationSettings.objects.get(company__isnull=True)
-    except EscalationSettings.DoesNotExist:
-        # Crear configuración por defecto
-        return EscalationSettings.objects.create(
-            company=None,
-            enabled=True,
-            business_hours_only=True,
-            max_escalation_level=3
-        )
+    # Crear configuración global por defecto (la señal post_save invalida la configuración compilada)
+    return EscalationSettings.objects.create(
+        company=None,
+        enabled=True,
+        business_hours_only=True,
+        max_escalation_level=3
+    )
 
 def get_escalation_rule(ticket, level):
-    """Obtiene la regla de escalamiento para un ticket y nivel específico"""
-    try:
-        # Buscar regla específica de la empresa
-        if ticket.company:
-            return EscalationRule.objects.get(
-                company=ticket.company,
-                priority=ticket.priority,
-                level=level,
-                is_active=True
-            )
-    except EscalationRule.DoesNotExist:
-        pass
-    
-    # Buscar regla global
-    try:
-        return EscalationRule.objects.get(
-            company__isnull=True,
-            priority=ticket.priority,
-            level=level,
-            is_active=True
-        )
-    except EscalationRule.DoesNotExist:
-        return None
+    """Obtiene la regla de escalamiento para un ticket y nivel específico (empresa y luego global)"""
+    return get_escalation_config().get_rule(ticket.company_id, ticket.priority, level)
 
 def calculate_next_escalation_time(ticket, escalation_rule, settings):
-    """Calcula el próximo tiempo de escalamiento"""
+    """Calcula el próximo tiempo de escalamiento (en horas laborales si está configurado)"""
     base_time = ticket.last_response_at or ticket.created_at
-    escalation_time = base_time + timedelta(hours=escalation_rule.hours_to_escalate)
     
     if settings.business_hours_only:
-        escalation_time = adjust_to_business_hours(escalation_time, settings)
+        return settings.get_calendar().add_business_hours(base_time, escalation_rule.hours_to_escalate)
     
-    return escalation_time
+    return base_time + timedelta(hours=escalation_rule.hours_to_escalate)
 
 def adjust_to_business_hours(target_time, settings):
     """Ajusta un tiempo al próximo horario laboral"""
-    business_days = settings.get_business_days_list()
-    
-    while True:
-        weekday = target_time.isoweekday()
-        hour = target_time.hour
-        
-        # Si es día laboral y hora laboral, retornar
-        if weekday in business_days and settings.business_start_hour <= hour < settings.business_end_hour:
-            return target_time
-        
-        # Si es día laboral pero fuera de horario, mover al inicio del horario
-        if weekday in business_days and hour < settings.business_start_hour:
-            return target_time.replace(hour=settings.business_start_hour, minute=0, second=0, microsecond=0)
-        
-        # Mover al siguiente día laboral
-        target_time = target_time.replace(hour=settings.business_start_hour, minute=0, second=0, microsecond=0)
-        target_time += timedelta(days=1)
+    return settings.get_calendar().next_business_instant(target_time)
 
 def calculate_next_business_time(settings):
     """Calcula el próximo horario laboral"""
-    now = timezone.now()
-    return adjust_to_business_hours(now, settings)
+    return adjust_to_business_hours(timezone.now(), settings)
 
 def send_escalation_notifications(ticket, escalation_rule, previous_assigned):
     """Envía notificaciones de escalamiento"""
@@ -334,6 +372,7 @@ def send_escalation_notifications(ticket, escalation_rule, previous_assigned):
         pass
 
 @shared_task
+@single_instance()
 def generate_escalation_report():
     """
     Genera reporte diario de escalamientos
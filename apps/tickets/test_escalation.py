@@ -0,0 +1,720 @@
+"""
+Tests for the batched escalation engine
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from apps.companies.models import Company
+from apps.users.models import User
+from apps.notifications.models import Notification
+from apps.notifications.tasks import create_notifications_batch
+from apps.tickets.business_calendar import BusinessCalendar
+from apps.tickets.escalation import (
+    PARTITION_METRICS_KEY, PROPAGATION_PROGRESS_KEY, SWEEP_CURSOR_KEY, acquire_partition_lease, bulk_escalation_action, escalate_partition, get_due_partitions,
+    process_due_escalations, reconcile_escalation_deadlines, release_partition_lease
+)
+from apps.tickets.escalation_config import get_escalation_config, reset_escalation_config
+from apps.tickets.forms import EscalationSettingsForm
+from apps.tickets.models import Ticket, TicketMessage, EscalationLog, EscalationRule, EscalationSettings
+from apps.tickets.simulation import parse_rule_overrides, simulate_escalations
+from apps.tickets.scheduler import MemoryDeadlineScheduler, get_deadline_scheduler, reset_deadline_schedulers, clear_wakeup, request_wakeup
+from apps.tickets.tasks import dispatch_due_escalations, process_ticket_escalations, propagate_escalation_changes
+from config.celery import app as celery_app
+
+
+class BatchEscalationTestCase(TestCase):
+    """Test that due tickets are escalated in chunks with bulk writes"""
+
+    def setUp(self):
+        # La configuración compilada sobrevive al rollback de cada test
+        reset_escalation_config()
+        self.addCleanup(reset_escalation_config)
+
+        self.company = Company.objects.create(name='Acme', slug='acme')
+        self.employee = User.objects.create_user(username='emp', password='x', company=self.company)
+        self.global_tech = User.objects.create_user(username='global', password='x', role='TECHNICIAN')
+        self.acme_tech = User.objects.create_user(username='acme', password='x', role='TECHNICIAN', first_name='Ana')
+        self.now = timezone.now()
+
+        self.tickets = [
+            Ticket.objects.create(
+                reference=f'TKT-{i:08X}', title=f'Ticket {i}', description='d', priority='HIGH',
+                company=self.company if i % 2 == 0 else Company.objects.create(name=f'Other {i}', slug=f'other-{i}'),
+                created_by=self.employee
+            )
+            for i in range(5)
+        ]
+        Ticket.objects.update(next_escalation_at=self.now - timedelta(minutes=5))
+
+        # La configuración se crea después de los tickets para no encolar tareas al crearlos
+        EscalationSettings.objects.create(company=None, business_hours_only=False, max_escalation_level=3)
+        EscalationRule.objects.create(company=None, priority='HIGH', level=1, hours_to_escalate=4, escalate_to=self.global_tech)
+        EscalationRule.objects.create(company=self.company, priority='HIGH', level=1, hours_to_escalate=2, escalate_to=self.acme_tech)
+
+    def run_engine(self, **kwargs):
+        with mock.patch('apps.notifications.tasks.create_notifications_batch.delay') as delay, \
+                mock.patch('apps.tickets.tasks.dispatch_due_escalations.apply_async'):
+            with self.captureOnCommitCallbacks(execute=True):
+                escalated = process_due_escalations(now=self.now, **kwargs)
+        return escalated, delay
+
+    def test_escalates_in_chunks(self):
+        """Test levels, assignees, logs and one notification batch per chunk"""
+        escalated, delay = self.run_engine(batch_size=2)
+
+        self.assertEqual(escalated, 5)
+        self.assertEqual(delay.call_count, 3)
+        self.assertEqual(sum(len(call.args[0]) for call in delay.call_args_list), 10)
+        self.assertEqual(EscalationLog.objects.filter(action='escalated', level=1).count(), 5)
+
+        for ticket in Ticket.objects.all():
+            self.assertEqual(ticket.escalation_level, 1)
+            expected = self.acme_tech if ticket.company_id == self.company.id else self.global_tech
+            self.assertEqual(ticket.assigned_to, expected)
+            self.assertEqual(ticket.assignee_display, expected.get_full_name() or expected.username)
+            # Sin regla de nivel 2 no queda vencimiento pendiente
+            self.assertIsNone(ticket.next_escalation_at)
+
+    def test_auto_assign_restarts_the_next_deadline(self):
+        """Test that the next deadline counts from the reassignment with the next level's rule"""
+        EscalationRule.objects.create(company=None, priority='HIGH', level=2, hours_to_escalate=6, escalate_to=self.acme_tech)
+        EscalationRule.objects.create(company=self.company, priority='HIGH', level=2, hours_to_escalate=3, escalate_to=self.global_tech)
+        Ticket.objects.update(last_response_at=self.now - timedelta(hours=5))
+
+        self.assertEqual(self.run_engine()[0], 5)
+        for ticket in Ticket.objects.all():
+            hours = 3 if ticket.company_id == self.company.id else 6
+            self.assertEqual(ticket.last_response_at, self.now)
+            self.assertEqual(ticket.next_escalation_at, self.now + timedelta(hours=hours))
+
+        self.now += timedelta(seconds=5)
+        self.assertEqual(self.run_engine()[0], 0)
+        self.assertFalse(Ticket.objects.exclude(escalation_level=1).exists())
+
+    def test_query_count_does_not_grow_per_ticket(self):
+        """Test that a chunk costs a fixed number of queries"""
+        with CaptureQueriesContext(connection) as ctx:
+            self.run_engine(batch_size=100)
+        self.assertLess(len(ctx.captured_queries), 15)
+
+    def test_outside_business_hours_reschedules(self):
+        """Test that tickets are rescheduled, not escalated, outside business hours"""
+        global_settings = EscalationSettings.objects.get(company=None)
+        global_settings.business_hours_only = True
+        global_settings.save()
+        self.now = timezone.make_aware(datetime(2026, 10, 18, 12, 0))  # Domingo
+
+        escalated, delay = self.run_engine()
+
+        self.assertEqual(escalated, 0)
+        self.assertFalse(delay.called)
+        self.assertFalse(EscalationLog.objects.exists())
+        self.assertFalse(Ticket.objects.filter(next_escalation_at__lte=self.now).exists())
+
+    def test_tickets_that_cannot_escalate_lose_their_deadline(self):
+        """Test that tickets at the maximum level or without a rule are not read again"""
+        Ticket.objects.filter(pk=self.tickets[0].pk).update(escalation_level=3)
+        Ticket.objects.filter(pk=self.tickets[1].pk).update(priority='LOW')
+
+        escalated, delay = self.run_engine()
+
+        self.assertEqual(escalated, 3)
+        dead_ends = Ticket.objects.filter(pk__in=[self.tickets[0].pk, self.tickets[1].pk])
+        self.assertEqual(list(dead_ends.values_list('next_escalation_at', flat=True)), [None, None])
+        self.assertEqual(dead_ends.get(pk=self.tickets[0].pk).escalation_level, 3)
+        self.assertEqual(self.run_engine()[0], 0)
+
+    def test_notification_batch_task(self):
+        """Test that the batch task creates all notifications with one insert"""
+        payload = [
+            {'recipient_id': self.acme_tech.id, 'notification_type': 'ticket_escalated', 'verb': 'A', 'object_id': 1},
+            {'recipient_id': self.employee.id, 'notification_type': 'ticket_escalated', 'verb': 'B', 'object_id': 1},
+        ]
+        self.assertEqual(create_notifications_batch(payload), 2)
+        self.assertEqual(Notification.objects.filter(notification_type='ticket_escalated').count(), 2)
+
+
+class EscalationConfigTestCase(TestCase):
+    """Test the compiled escalation settings and rules lookup"""
+
+    def setUp(self):
+        reset_escalation_config()
+        self.addCleanup(reset_escalation_config)
+
+        self.company = Company.objects.create(name='Acme', slug='acme')
+        self.other = Company.objects.create(name='Other', slug='other')
+        self.tech = User.objects.create_user(username='tech', password='x', role='TECHNICIAN')
+        self.global_settings = EscalationSettings.objects.create(company=None, max_escalation_level=3)
+        self.acme_settings = EscalationSettings.objects.create(company=self.company, max_escalation_level=5)
+        self.global_rule = EscalationRule.objects.create(company=None, priority='HIGH', level=1, hours_to_escalate=4, escalate_to=self.tech)
+        self.global_rule_2 = EscalationRule.objects.create(company=None, priority='HIGH', level=2, hours_to_escalate=8, escalate_to=self.tech)
+        self.acme_rule = EscalationRule.objects.create(company=self.company, priority='HIGH', level=1, hours_to_escalate=1, escalate_to=self.tech)
+
+    def test_company_then_global_fallback(self):
+        """Test that company overrides win and everything else falls back to global"""
+        config = get_escalation_config()
+
+        self.assertEqual(config.get_settings(self.company.id), self.acme_settings)
+        self.assertEqual(config.get_settings(self.other.id), self.global_settings)
+        self.assertEqual(config.get_rule(self.company.id, 'HIGH', 1), self.acme_rule)
+        self.assertEqual(config.get_rule(self.company.id, 'HIGH', 2), self.global_rule_2)
+        self.assertEqual(config.get_rule(self.other.id, 'HIGH', 1), self.global_rule)
+        self.assertIsNone(config.get_rule(self.other.id, 'LOW', 1))
+
+    def test_lookups_do_not_query(self):
+        """Test that a compiled config answers lookups without database queries"""
+        get_escalation_config()
+        with self.assertNumQueries(0):
+            config = get_escalation_config()
+            config.get_settings(self.company.id)
+            self.assertEqual(config.get_rule(self.company.id, 'HIGH', 1).escalate_to, self.tech)
+
+    def test_save_and_delete_invalidate(self):
+        """Test that saving or deleting a rule recompiles the lookup table"""
+        self.assertEqual(get_escalation_config().get_rule(self.company.id, 'HIGH', 1), self.acme_rule)
+
+        self.acme_rule.is_active = False
+        self.acme_rule.save()
+        self.assertEqual(get_escalation_config().get_rule(self.company.id, 'HIGH', 1), self.global_rule)
+
+        self.acme_settings.delete()
+        self.assertEqual(get_escalation_config().get_settings(self.company.id), self.global_settings)
+
+
+class BusinessCalendarTestCase(TestCase):
+    """Test business-hours arithmetic with holidays and timezones"""
+
+    def setUp(self):
+        # Lunes a viernes de 9 a 17, con el viernes 2026-10-23 feriado
+        self.calendar = BusinessCalendar([1, 2, 3, 4, 5], 9, 17, [date(2026, 10, 23)], 'America/Mexico_City')
+        self.tz = ZoneInfo('America/Mexico_City')
+
+    def local(self, *args):
+        return datetime(*args, tzinfo=self.tz)
+
+    def test_next_business_instant(self):
+        """Test moving to the next opening, skipping weekends and holidays"""
+        self.assertEqual(self.calendar.next_business_instant(self.local(2026, 10, 19, 10, 30)), self.local(2026, 10, 19, 10, 30))
+        self.assertEqual(self.calendar.next_business_instant(self.local(2026, 10, 19, 7, 0)), self.local(2026, 10, 19, 9, 0))
+        self.assertEqual(self.calendar.next_business_instant(self.local(2026, 10, 22, 18, 0)), self.local(2026, 10, 26, 9, 0))
+
+    def test_add_business_hours(self):
+        """Test adding business hours across days, weekends and holidays"""
+        monday = self.local(2026, 10, 19, 15, 0)
+        self.assertEqual(self.calendar.add_business_hours(monday, 1), self.local(2026, 10, 19, 16, 0))
+        self.assertEqual(self.calendar.add_business_hours(monday, 2), self.local(2026, 10, 19, 17, 0))
+        self.assertEqual(self.calendar.add_business_hours(monday, 4), self.local(2026, 10, 20, 11, 0))
+        # 2 h del lunes + martes, miércoles y jueves completos; el viernes es feriado
+        self.assertEqual(self.calendar.add_business_hours(monday, 27), self.local(2026, 10, 26, 10, 0))
+        # Desde el sábado empieza a contar el lunes siguiente
+        self.assertEqual(self.calendar.add_business_hours(self.local(2026, 10, 24, 12, 0), 8), self.local(2026, 10, 26, 17, 0))
+
+    def test_timezone_is_applied(self):
+        """Test that UTC instants are evaluated in the calendar's local time"""
+        utc_instant = datetime(2026, 10, 19, 14, 0, tzinfo=dt_timezone.utc)  # 08:00 en Ciudad de México
+        self.assertFalse(self.calendar.is_business_time(utc_instant))
+        self.assertEqual(self.calendar.next_business_instant(utc_instant), datetime(2026, 10, 19, 15, 0, tzinfo=dt_timezone.utc))
+
+    def test_many_matches_single(self):
+        """Test that batch evaluation over the shared day table matches one-by-one evaluation"""
+        moments = [self.local(2026, 10, 19 + i, 8 + i, 0) for i in range(7)]
+        moments += [self.local(2026, 12, 24, 16, 30), self.local(2026, 10, 25, 3, 0)]
+        hours = [10, 0, 1, 8, 30, 2.5, 100, 1, 9]
+        self.assertEqual(
+            self.calendar.add_business_hours_many(moments, hours),
+            [self.calendar.add_business_hours(moment, amount) for moment, amount in zip(moments, hours)]
+        )
+        self.assertEqual(
+            self.calendar.next_business_instant_many(moments),
+            [self.calendar.next_business_instant(moment) for moment in moments]
+        )
+
+    def test_settings_calendar_and_form_validation(self):
+        """Test that settings compile their calendar and the form rejects bad holidays"""
+        settings = EscalationSettings(business_days='1,2,3,4,5', holidays='2026-10-23', timezone='America/Mexico_City')
+        self.assertIs(settings.get_calendar(), settings.get_calendar())
+        self.assertFalse(settings.is_business_time(self.local(2026, 10, 23, 10, 0)))
+
+        form = EscalationSettingsForm(data={
+            'business_hours_only': 'on', 'business_start_hour': 9, 'business_end_hour': 17,
+            'business_days': ['1'], 'timezone': 'UTC', 'holidays': '25/12/2026', 'max_escalation_level': 3,
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('holidays', form.errors)
+
+
+@override_settings(ESCALATION_SCHEDULER_BACKEND='apps.tickets.scheduler.MemoryDeadlineScheduler')
+class DeadlineSchedulerTestCase(TestCase):
+    """Test the deadline scheduler and its dispatcher"""
+
+    def setUp(self):
+        reset_escalation_config()
+        self.addCleanup(reset_escalation_config)
+        clear_wakeup()
+        self.addCleanup(clear_wakeup)
+
+        reset_deadline_schedulers()
+        self.addCleanup(reset_deadline_schedulers)
+        self.scheduler = get_deadline_scheduler()
+        self.now = timezone.now()
+
+        self.company = Company.objects.create(name='Acme', slug='acme')
+        self.employee = User.objects.create_user(username='emp', password='x', company=self.company)
+        self.tech = User.objects.create_user(username='tech', password='x', role='TECHNICIAN')
+        self.ticket = Ticket.objects.create(
+            reference='TKT-0000000A', title='Caído', description='d', priority='HIGH',
+            company=self.company, created_by=self.employee
+        )
+        EscalationSettings.objects.create(company=None, business_hours_only=False)
+        EscalationRule.objects.create(company=None, priority='HIGH', level=1, hours_to_escalate=4, escalate_to=self.tech)
+        EscalationRule.objects.create(company=None, priority='HIGH', level=2, hours_to_escalate=8, escalate_to=self.tech)
+
+    def test_memory_scheduler_orders_and_moves_deadlines(self):
+        """Test pop order, rescheduling and cancellation"""
+        scheduler = MemoryDeadlineScheduler()
+        scheduler.schedule(1, self.now + timedelta(minutes=3))
+        scheduler.schedule(2, self.now - timedelta(minutes=1))
+        scheduler.schedule(3, self.now - timedelta(minutes=2))
+        scheduler.schedule(1, self.now - timedelta(minutes=5))
+        scheduler.cancel(3)
+
+        self.assertEqual(scheduler.pop_due(self.now, 10), [1, 2])
+        self.assertIsNone(scheduler.next_deadline())
+
+        scheduler.schedule(4, self.now + timedelta(hours=1))
+        self.assertEqual(scheduler.pop_due(self.now, 10), [])
+        self.assertEqual(scheduler.next_deadline(), self.now + timedelta(hours=1))
+
+    def test_ticket_save_updates_scheduler(self):
+        """Test that setting, pausing and resuming a deadline reaches the scheduler"""
+        deadline = self.now + timedelta(hours=2)
+        with mock.patch('apps.tickets.tasks.dispatch_due_escalations.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.ticket.next_escalation_at = deadline
+                self.ticket.save()
+            self.assertEqual(self.scheduler.next_deadline(), deadline)
+            self.assertEqual(apply_async.call_args.kwargs['eta'], deadline)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.ticket.escalation_paused = True
+                self.ticket.save()
+            self.assertIsNone(self.scheduler.next_deadline())
+
+    def test_dispatcher_escalates_due_and_rearms(self):
+        """Test that the dispatcher escalates popped tickets and wakes up at the next deadline"""
+        Ticket.objects.filter(pk=self.ticket.pk).update(next_escalation_at=self.now - timedelta(seconds=1))
+        self.scheduler.schedule(self.ticket.pk, self.now - timedelta(seconds=1))
+
+        with mock.patch('apps.notifications.tasks.create_notifications_batch.delay'), \
+                mock.patch('apps.tickets.tasks.dispatch_due_escalations.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(dispatch_due_escalations(), 1)
+
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.escalation_level, 1)
+        self.assertEqual(self.scheduler.next_deadline(), self.ticket.next_escalation_at)
+        self.assertEqual(apply_async.call_args.kwargs['eta'], self.ticket.next_escalation_at)
+
+    def test_dispatcher_requeues_tickets_it_could_not_escalate(self):
+        """Test that popped tickets whose chunk failed go back to the scheduler for a retry"""
+        Ticket.objects.filter(pk=self.ticket.pk).update(next_escalation_at=self.now - timedelta(seconds=1))
+        self.scheduler.schedule(self.ticket.pk, self.now - timedelta(seconds=1))
+
+        with mock.patch('apps.tickets.escalation.escalate_chunk', side_effect=RuntimeError('db')), \
+                mock.patch('apps.tickets.tasks.dispatch_due_escalations.apply_async') as apply_async:
+            self.assertEqual(dispatch_due_escalations(), 0)
+
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).escalation_level, 0)
+        retry_at = self.scheduler.next_deadline()
+        self.assertGreater(retry_at, self.now)
+        self.assertEqual(apply_async.call_args.kwargs['eta'], retry_at)
+
+    def test_safety_net_rearms_over_a_planned_wakeup(self):
+        """Test that the periodic sweep re-arms the dispatcher even if a wakeup is recorded"""
+        deadline = self.now + timedelta(hours=1)
+        Ticket.objects.filter(pk=self.ticket.pk).update(next_escalation_at=deadline)
+        self.scheduler.schedule(self.ticket.pk, deadline)
+
+        with mock.patch('apps.tickets.tasks.dispatch_due_escalations.apply_async') as apply_async:
+            request_wakeup(self.now + timedelta(minutes=30))
+            request_wakeup(deadline)
+            self.assertEqual(apply_async.call_count, 1)
+            process_ticket_escalations()
+        self.assertEqual(apply_async.call_count, 2)
+        self.assertEqual(apply_async.call_args.kwargs['eta'], deadline)
+
+
+class IncrementalSchedulingTestCase(TestCase):
+    """Test per-ticket deadline scheduling and the bounded reconciliation sweep"""
+
+    def setUp(self):
+        reset_escalation_config()
+        self.addCleanup(reset_escalation_config)
+        cache.delete(SWEEP_CURSOR_KEY)
+        self.addCleanup(cache.delete, SWEEP_CURSOR_KEY)
+        patcher = mock.patch('apps.tickets.tasks.dispatch_due_escalations.apply_async')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.company = Company.objects.create(name='Acme', slug='acme')
+        self.employee = User.objects.create_user(username='emp', password='x', company=self.company)
+        self.tech = User.objects.create_user(username='tech', password='x', role='TECHNICIAN')
+        EscalationSettings.objects.create(company=None, business_hours_only=False, pause_on_response=False)
+        EscalationRule.objects.create(company=None, priority='HIGH', level=1, hours_to_escalate=4, escalate_to=self.tech)
+
+    def create_ticket(self, index):
+        return Ticket.objects.create(
+            reference=f'TKT-{index:08X}', title=f'Ticket {index}', description='d', priority='HIGH',
+            company=self.company, created_by=self.employee
+        )
+
+    def test_create_schedules_only_the_new_ticket(self):
+        """Test that creating a ticket computes its own deadline without queueing a table scan"""
+        with mock.patch('apps.tickets.tasks.update_ticket_escalation_times.delay') as scan:
+            ticket = self.create_ticket(1)
+
+        self.assertFalse(scan.called)
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.next_escalation_at, ticket.created_at + timedelta(hours=4))
+
+    def test_reply_and_reassign_restart_the_deadline(self):
+        """Test that a public reply and a reassignment recompute the ticket's deadline"""
+        ticket = self.create_ticket(1)
+        reply = TicketMessage.objects.create(ticket=ticket, sender=self.tech, content='Revisando')
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.next_escalation_at, reply.created_at + timedelta(hours=4))
+
+        before = timezone.now()
+        ticket.assigned_to = self.tech
+        ticket.save()
+        ticket.refresh_from_db()
+        self.assertGreaterEqual(ticket.next_escalation_at, before + timedelta(hours=4))
+
+    def test_sweep_works_in_bounded_batches(self):
+        """Test that the sweep fills missing deadlines a bounded number of tickets per run"""
+        for i in range(5):
+            self.create_ticket(i)
+        Ticket.objects.update(next_escalation_at=None)
+
+        self.assertEqual(reconcile_escalation_deadlines(batch_size=2, max_batches=1), (2, 2))
+        self.assertEqual(Ticket.objects.filter(next_escalation_at__isnull=True).count(), 3)
+
+        # La siguiente ejecución continúa después del último ticket revisado
+        self.assertEqual(reconcile_escalation_deadlines(batch_size=2, max_batches=5), (3, 3))
+        self.assertFalse(Ticket.objects.filter(next_escalation_at__isnull=True).exists())
+        self.assertEqual(cache.get(SWEEP_CURSOR_KEY), 0)
+
+
+@override_settings(ESCALATION_FANOUT_ENABLED=True)
+class PartitionedEscalationTestCase(TestCase):
+    """Test the per-company fan-out mode"""
+
+    def setUp(self):
+        reset_escalation_config()
+        self.addCleanup(reset_escalation_config)
+        self.wakeup, _ = [
+            patcher.start() for patcher in [
+                mock.patch('apps.tickets.tasks.dispatch_due_escalations.apply_async'),
+                mock.patch('apps.notifications.tasks.create_notifications_batch.delay'),
+            ]
+        ]
+        self.addCleanup(mock.patch.stopall)
+        # El chord se ejecuta en el proceso del test
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', celery_app.conf.task_always_eager)
+        celery_app.conf.task_always_eager = True
+
+        self.now = timezone.now()
+        self.tech = User.objects.create_user(username='tech', password='x', role='TECHNICIAN')
+        self.companies = [Company.objects.create(name=f'Empresa {i}', slug=f'empresa-{i}') for i in range(3)]
+        for i, company in enumerate(self.companies):
+            employee = User.objects.create_user(username=f'emp{i}', password='x', company=company)
+            for j in range(i + 1):
+                Ticket.objects.create(
+                    reference=f'TKT-{i:04X}{j:04X}', title='t', description='d', priority='HIGH',
+                    company=company, created_by=employee
+                )
+        Ticket.objects.update(next_escalation_at=self.now - timedelta(minutes=10))
+        EscalationSettings.objects.create(company=None, business_hours_only=False)
+        EscalationRule.objects.create(company=None, priority='HIGH', level=1, hours_to_escalate=4, escalate_to=self.tech)
+
+    def test_fan_out_aggregates_partitions(self):
+        """Test that each company is one partition and the callback sums them"""
+        self.assertEqual([p['due'] for p in get_due_partitions(self.now)], [1, 2, 3])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            process_ticket_escalations()
+
+        summary = cache.get(PARTITION_METRICS_KEY)
+        self.assertEqual(summary['partitions'], 3)
+        self.assertEqual(summary['escalated'], 6)
+        self.assertGreaterEqual(summary['max_lag_seconds'], 600)
+        self.assertAlmostEqual(summary['fairness'], 1.0, places=2)
+        self.assertFalse(Ticket.objects.filter(escalation_level=0).exists())
+
+    def test_fan_out_rearms_the_dispatcher(self):
+        """Test that the periodic sweep re-arms the dispatcher in fan-out mode too"""
+        later = self.now + timedelta(hours=1)
+        Ticket.objects.filter(company=self.companies[0]).update(next_escalation_at=later)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            process_ticket_escalations()
+
+        self.assertEqual(cache.get(PARTITION_METRICS_KEY)['partitions'], 2)
+        self.assertEqual(self.wakeup.call_args.kwargs['eta'], later)
+
+    @override_settings(ESCALATION_SCHEDULER_BACKEND='apps.tickets.scheduler.MemoryDeadlineScheduler')
+    def test_dispatcher_fans_out_popped_tickets_by_company(self):
+        """Test that the deadline dispatcher hands the popped tickets' companies to the partitions"""
+        reset_deadline_schedulers()
+        self.addCleanup(reset_deadline_schedulers)
+        scheduler = get_deadline_scheduler()
+        popped = Ticket.objects.exclude(company=self.companies[1])
+        scheduler.schedule_many((ticket.pk, ticket.next_escalation_at) for ticket in popped)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(dispatch_due_escalations(), 2)
+
+        summary = cache.get(PARTITION_METRICS_KEY)
+        self.assertEqual((summary['partitions'], summary['escalated']), (2, 4))
+        self.assertEqual(Ticket.objects.filter(escalation_level=1).count(), 4)
+        self.assertFalse(Ticket.objects.filter(company=self.companies[1], escalation_level=1).exists())
+        # Los escalados sin siguiente nivel dejan el planificador; ninguno queda para reintentar
+        self.assertIsNone(scheduler.next_deadline())
+
+    def test_partition_lease_prevents_double_processing(self):
+        """Test that a partition held by another worker is skipped"""
+        company = self.companies[0]
+        token = acquire_partition_lease(company.id)
+        self.addCleanup(release_partition_lease, company.id, token)
+
+        self.assertIsNone(acquire_partition_lease(company.id))
+        self.assertTrue(escalate_partition(company.id, self.now)['skipped'])
+        self.assertFalse(Ticket.objects.filter(company=company, escalation_level=1).exists())
+
+
+class BulkEscalationActionTestCase(TestCase):
+    """Test set-based bulk pause, resume and reset"""
+
+    def setUp(self):
+        reset_escalation_config()
+        self.addCleanup(reset_escalation_config)
+        patcher = mock.patch('apps.tickets.tasks.dispatch_due_escalations.apply_async')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.company = Company.objects.create(name='Acme', slug='acme')
+        self.employee = User.objects.create_user(username='emp', password='x', company=self.company)
+        self.admin = User.objects.create_user(username='admin', password='x', role='SUPERADMIN')
+        self.tech = User.objects.create_user(username='tech', password='x', role='TECHNICIAN')
+        self.tickets = [
+            Ticket.objects.create(
+                reference=f'TKT-{i:08X}', title=f'Ticket {i}', description='d', priority='HIGH',
+                company=self.company, created_by=self.employee
+            )
+            for i in range(6)
+        ]
+        self.ids = [ticket.id for ticket in self.tickets]
+        EscalationSettings.objects.create(company=None, business_hours_only=False)
+        EscalationRule.objects.create(company=None, priority='HIGH', level=1, hours_to_escalate=4, escalate_to=self.tech)
+        Ticket.objects.update(escalation_level=1)
+
+    def test_pause_resume_reset_with_logs_and_counts(self):
+        """Test exact counts, recomputed deadlines and one log row per changed ticket"""
+        Ticket.objects.filter(id=self.ids[0]).update(escalation_paused=True)
+
+        get_escalation_config()
+        with self.assertNumQueries(8):
+            # Savepoint y, por cada bloque de 5 ids, un SELECT, un UPDATE y un INSERT de logs
+            count = bulk_escalation_action('pause_escalation', self.ids, user=self.admin, batch_size=5)
+        self.assertEqual(count, 5)
+        self.assertFalse(Ticket.objects.filter(escalation_paused=False).exists())
+
+        self.assertEqual(bulk_escalation_action('reset_escalation', self.ids, user=self.admin), 6)
+        for ticket in Ticket.objects.all():
+            self.assertEqual(ticket.escalation_level, 0)
+            self.assertFalse(ticket.escalation_paused)
+            self.assertEqual(ticket.next_escalation_at, ticket.created_at + timedelta(hours=4))
+
+        self.assertEqual(EscalationLog.objects.filter(action='paused', created_by=self.admin).count(), 5)
+        self.assertEqual(EscalationLog.objects.filter(action='reset').count(), 6)
+        self.assertEqual(bulk_escalation_action('resume_escalation', self.ids), 0)
+
+    def test_bulk_view(self):
+        """Test the admin endpoint validates the action and returns the exact count"""
+        self.client.force_login(self.admin)
+        url = reverse('tickets:admin_escalation_bulk_actions')
+
+        response = self.client.post(url, {'action': 'drop_tables', 'ticket_ids': self.ids})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(url, {'action': 'pause_escalation', 'ticket_ids': self.ids[:3]})
+        self.assertEqual(response.json()['count'], 3)
+
+
+class ChangePropagationTestCase(TestCase):
+    """Test background propagation of rule and settings changes to open tickets"""
+
+    def setUp(self):
+        reset_escalation_config()
+        self.addCleanup(reset_escalation_config)
+        cache.delete(PROPAGATION_PROGRESS_KEY)
+        patcher = mock.patch('apps.tickets.tasks.dispatch_due_escalations.apply_async')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.acme = Company.objects.create(name='Acme', slug='acme')
+        self.globex = Company.objects.create(name='Globex', slug='globex')
+        self.tech = User.objects.create_user(username='tech', password='x', role='TECHNICIAN')
+        self.tickets = {}
+        for company in (self.acme, self.globex):
+            employee = User.objects.create_user(username=f'emp-{company.slug}', password='x', company=company)
+            for priority in ('HIGH', 'LOW'):
+                self.tickets[(company.slug, priority)] = Ticket.objects.create(
+                    reference=f'TKT-{company.slug}-{priority}', title='t', description='d', priority=priority,
+                    company=company, created_by=employee
+                )
+        EscalationSettings.objects.create(company=None, business_hours_only=False)
+        self.rule = EscalationRule.objects.create(company=None, priority='HIGH', level=1, hours_to_escalate=4, escalate_to=self.tech)
+
+    def save(self, instance):
+        with mock.patch('apps.tickets.tasks.propagate_escalation_changes.delay', side_effect=propagate_escalation_changes) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                instance.save()
+        return delay
+
+    def deadline_hours(self, company, priority):
+        ticket = Ticket.objects.get(pk=self.tickets[(company, priority)].pk)
+        if ticket.next_escalation_at is None:
+            return None
+        return (ticket.next_escalation_at - ticket.created_at) / timedelta(hours=1)
+
+    def test_rule_change_recomputes_affected_tickets(self):
+        """Test that editing a global rule only touches tickets of its priority and reports progress"""
+        self.rule.hours_to_escalate = 8
+        delay = self.save(self.rule)
+
+        delay.assert_called_once_with([[None, 'HIGH', 1]])
+        self.assertEqual(self.deadline_hours('acme', 'HIGH'), 8)
+        self.assertEqual(self.deadline_hours('globex', 'HIGH'), 8)
+        self.assertIsNone(self.deadline_hours('acme', 'LOW'))
+
+        progress = cache.get(PROPAGATION_PROGRESS_KEY)
+        self.assertEqual((progress['status'], progress['total'], progress['processed'], progress['updated']), ('done', 2, 2, 2))
+
+        self.client.force_login(User.objects.create_user(username='admin', password='x', role='SUPERADMIN'))
+        response = self.client.get(reverse('tickets:admin_escalation_dashboard'))
+        self.assertEqual(response.context['propagation']['percent'], 100)
+
+    def test_company_overrides_and_scope_moves(self):
+        """Test company rules shadow the global rule and a moved rule updates old and new tickets"""
+        self.save(EscalationRule(company=self.acme, priority='HIGH', level=1, hours_to_escalate=2, escalate_to=self.tech))
+        self.assertEqual(self.deadline_hours('acme', 'HIGH'), 2)
+        self.assertIsNone(self.deadline_hours('globex', 'HIGH'))
+
+        self.rule.hours_to_escalate = 6
+        self.save(self.rule)
+        self.assertEqual(self.deadline_hours('acme', 'HIGH'), 2)
+        self.assertEqual(self.deadline_hours('globex', 'HIGH'), 6)
+
+        rule = EscalationRule.objects.get(pk=self.rule.pk)
+        rule.priority = 'LOW'
+        self.save(rule)
+        self.assertEqual(self.deadline_hours('acme', 'HIGH'), 2)
+        self.assertIsNone(self.deadline_hours('globex', 'HIGH'))
+        self.assertEqual(self.deadline_hours('globex', 'LOW'), 6)
+
+    def test_settings_change_skips_companies_with_own_settings(self):
+        """Test that disabling the global settings leaves companies with their own settings alone"""
+        self.save(EscalationSettings(company=self.acme, business_hours_only=False))
+        self.rule.hours_to_escalate = 5
+        self.save(self.rule)
+
+        settings = EscalationSettings.objects.get(company=None)
+        settings.enabled = False
+        self.save(settings)
+        self.assertEqual(self.deadline_hours('acme', 'HIGH'), 5)
+        self.assertIsNone(self.deadline_hours('globex', 'HIGH'))
+
+
+class EscalationSimulationTestCase(TestCase):
+    """Test the what-if replay of historical tickets against candidate rules"""
+
+    def setUp(self):
+        reset_escalation_config()
+        self.addCleanup(reset_escalation_config)
+        patcher = mock.patch('apps.tickets.tasks.dispatch_due_escalations.apply_async')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.now = timezone.now()
+        self.start = self.now - timedelta(hours=48)
+        company = Company.objects.create(name='Acme', slug='acme')
+        employee = User.objects.create_user(username='emp', password='x', company=company)
+        tickets = {
+            name: Ticket.objects.create(
+                reference=f'TKT-{name}', title=name, description='d', priority='HIGH', company=company, created_by=employee
+            )
+            for name in ('silent', 'answered', 'resolved')
+        }
+        Ticket.objects.update(created_at=self.start, updated_at=self.now)
+        Ticket.objects.filter(pk=tickets['resolved'].pk).update(status='RESOLVED', updated_at=self.start + timedelta(hours=6))
+        TicketMessage.objects.bulk_create([TicketMessage(ticket=tickets['answered'], sender=employee, content='ok')])
+        TicketMessage.objects.update(created_at=self.start + timedelta(hours=2))
+
+        self.level1 = User.objects.create_user(username='level1', password='x', role='TECHNICIAN')
+        self.level2 = User.objects.create_user(username='level2', password='x', role='TECHNICIAN')
+        EscalationSettings.objects.create(company=None, business_hours_only=False)
+        EscalationRule.objects.create(company=None, priority='HIGH', level=1, hours_to_escalate=4, escalate_to=self.level1)
+        EscalationRule.objects.create(company=None, priority='HIGH', level=2, hours_to_escalate=8, escalate_to=self.level2)
+
+    def simulate(self, **kwargs):
+        return simulate_escalations(self.now - timedelta(days=7), until=self.now, **kwargs)
+
+    def test_replay_with_current_and_candidate_rules(self):
+        """Test responses pause, resolution stops and overrides move the projected load"""
+        with self.assertNumQueries(5):
+            # Configuración, reglas, políticas de SLA, tickets y mensajes
+            result = self.simulate()
+        self.assertEqual((result['tickets'], result['escalated_tickets']), (3, 2))
+        self.assertEqual(result['by_level'], [(1, 2), (2, 1)])
+        self.assertEqual(result['by_assignee'], [('level1', 2), ('level2', 1)])
+        self.assertEqual(sum(result['by_hour']), 3)
+
+        result = self.simulate(rule_hours={('HIGH', 1): 10})
+        self.assertEqual(result['by_level'], [(1, 1), (2, 1)])
+
+        result = self.simulate(settings_overrides={'max_escalation_level': 1, 'pause_on_response': False})
+        self.assertEqual(result['by_level'], [(1, 3)])
+        # La configuración real no cambia
+        self.assertEqual(EscalationSettings.objects.get().max_escalation_level, 3)
+
+    def test_rule_override_parsing(self):
+        """Test the PRIORITY:LEVEL:HOURS format"""
+        self.assertEqual(parse_rule_overrides('high:1:8, HIGH:2:24\nLOW:1:48'), {('HIGH', 1): 8, ('HIGH', 2): 24, ('LOW', 1): 48})
+        for text in ('URGENT:1:8', 'HIGH:1', 'HIGH:x:8', 'HIGH:0:8'):
+            with self.assertRaises(ValueError):
+                parse_rule_overrides(text)
+
+    def test_command_and_admin_page(self):
+        """Test the management command output and the admin simulator page"""
+        out = StringIO()
+        call_command('simulate_escalations', '--months', '1', '--rule', 'HIGH:1:10', stdout=out)
+        self.assertIn('2 escalamientos en 1 tickets', out.getvalue())
+        self.assertIn('Nivel 2: 1', out.getvalue())
+
+        self.client.force_login(User.objects.create_user(username='admin', password='x', role='SUPERADMIN'))
+        url = reverse('tickets:admin_escalation_simulation')
+        response = self.client.get(url, {'months': 1, 'rules': 'HIGH:1:4', 'max_escalation_level': 1})
+        self.assertEqual(response.context['result']['by_level'], [(1, 2)])
+
+        response = self.client.get(url, {'months': 1, 'rules': 'HIGH-1-4'})
+        self.assertNotIn('result', response.context)
+        self.assertTrue(response.context['form'].errors['rules'])
@@ -0,0 +1,93 @@
+"""
+Tests for pre-escalation warnings: per-rule lead time, persisted warning state and digests
+"""
+from datetime import timedelta
+from unittest import mock
+from django.db.models import F
+from django.test import TestCase
+from django.utils import timezone
+from apps.companies.models import Company
+from apps.users.models import User
+from apps.tickets.escalation_config import reset_escalation_config
+from apps.tickets.escalation_warnings import send_escalation_warnings
+from apps.tickets.models import Ticket, EscalationRule
+
+
+class EscalationWarningTestCase(TestCase):
+    """Test the warning sweep over upcoming escalation deadlines"""
+
+    def setUp(self):
+        reset_escalation_config()
+        self.addCleanup(reset_escalation_config)
+        patcher = mock.patch('apps.tickets.tasks.dispatch_due_escalations.apply_async')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.company = Company.objects.create(name='Acme', slug='acme')
+        self.employee = User.objects.create_user(username='emp', password='x', company=self.company)
+        self.company_admin = User.objects.create_user(username='boss', password='x', role='COMPANY_ADMIN', company=self.company)
+        self.tech = User.objects.create_user(username='tech', password='x', role='TECHNICIAN')
+        self.lead = User.objects.create_user(username='lead', password='x', role='TECHNICIAN')
+        self.superadmin = User.objects.create_user(username='root', password='x', role='SUPERADMIN')
+        EscalationRule.objects.create(company=None, priority='HIGH', level=1, hours_to_escalate=4, escalate_to=self.lead, warning_minutes=120)
+        EscalationRule.objects.create(company=None, priority='MEDIUM', level=1, hours_to_escalate=8, escalate_to=self.lead, warning_minutes=30)
+        EscalationRule.objects.create(company=None, priority='LOW', level=1, hours_to_escalate=24, escalate_to=self.lead, warning_minutes=0)
+        self.now = timezone.now()
+
+    def create_ticket(self, reference, minutes, priority='HIGH', assigned_to=None):
+        ticket = Ticket.objects.create(
+            reference=reference, title=reference, description='d', priority=priority,
+            company=self.company, created_by=self.employee, assigned_to=assigned_to
+        )
+        Ticket.objects.filter(pk=ticket.pk).update(next_escalation_at=self.now + timedelta(minutes=minutes))
+        return ticket
+
+    def send_warnings(self, **kwargs):
+        with mock.patch('apps.notifications.tasks.send_email_notification_async.delay') as email:
+            count = send_escalation_warnings(now=self.now, **kwargs)
+        digests = {
+            digest['recipient_id']: [warning['reference'] for warning in digest['warnings']]
+            for call in email.call_args_list for digest in call.kwargs['digests']
+        }
+        return count, email.call_count, digests
+
+    def test_warnings_follow_rule_lead_time_and_group_by_recipient(self):
+        """Test per-rule lead time up to the next run, one email task per run and one digest per recipient"""
+        self.create_ticket('TKT-1', 60, assigned_to=self.tech)
+        self.create_ticket('TKT-2', 140, assigned_to=self.tech)
+        self.create_ticket('TKT-3', 100)
+        self.create_ticket('TKT-LATER', 180, assigned_to=self.tech)
+        self.create_ticket('TKT-MEDIUM', 50, priority='MEDIUM', assigned_to=self.tech)
+        self.create_ticket('TKT-MEDIUM-LATER', 70, priority='MEDIUM', assigned_to=self.tech)
+        self.create_ticket('TKT-LOW', 10, priority='LOW', assigned_to=self.tech)
+
+        with self.settings(ESCALATION_WARNING_INTERVAL=1800):
+            count, email_calls, digests = self.send_warnings(batch_size=2)
+
+        self.assertEqual(count, 4)
+        self.assertEqual(email_calls, 1)
+        self.assertEqual(digests, {
+            self.tech.id: ['TKT-MEDIUM', 'TKT-1', 'TKT-2'],
+            self.company_admin.id: ['TKT-3'],
+            self.superadmin.id: ['TKT-3'],
+        })
+        self.assertEqual(
+            set(Ticket.objects.filter(escalation_warning_sent_for=F('next_escalation_at')).values_list('reference', flat=True)),
+            {'TKT-MEDIUM', 'TKT-1', 'TKT-2', 'TKT-3'}
+        )
+
+    def test_warning_is_sent_once_per_deadline(self):
+        """Test that a warned deadline is skipped and a rescheduled one is warned again"""
+        ticket = self.create_ticket('TKT-1', 60, assigned_to=self.tech)
+        self.assertEqual(self.send_warnings()[0], 1)
+        self.assertEqual(self.send_warnings(), (0, 0, {}))
+
+        Ticket.objects.filter(pk=ticket.pk).update(next_escalation_at=self.now + timedelta(minutes=45))
+        self.assertEqual(self.send_warnings()[2], {self.tech.id: ['TKT-1']})
+
+    def test_warnings_can_be_disabled(self):
+        """Test the ESCALATION_WARNINGS_ENABLED switch"""
+        self.create_ticket('TKT-1', 60, assigned_to=self.tech)
+        with self.settings(ESCALATION_WARNINGS_ENABLED=False):
+            self.assertEqual(self.send_warnings(), (0, 0, {}))
+        self.assertIsNone(Ticket.objects.get(reference='TKT-1').escalation_warning_sent_for)
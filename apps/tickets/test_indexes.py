@@ -0,0 +1,27 @@
+"""
+Tests for the ticket index set and the index report command
+"""
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from apps.tickets.models import Ticket
+
+
+class TicketIndexReportTestCase(TestCase):
+    """Test that the hot-path indexes exist and are reported"""
+
+    def test_indexes_declared(self):
+        """Test that the designed index set is on the model"""
+        names = {index.name for index in Ticket._meta.indexes}
+        self.assertTrue({
+            'ticket_company_status_upd_idx', 'ticket_creator_updated_idx', 'ticket_assignee_status_idx',
+            'ticket_updated_id_idx', 'ticket_pending_escalation_idx', 'ticket_sla_due_idx',
+        } <= names)
+
+    def test_report_shows_list_indexes(self):
+        """Test that the report finds the list indexes in the query plans"""
+        out = StringIO()
+        call_command('index_report', stdout=out)
+        output = out.getvalue()
+        self.assertIn('Lista global (cursor): usa ticket_updated_id_idx', output)
+        self.assertIn('Lista de empresa por estado: usa ticket_company_status_upd_idx', output)
@@ -0,0 +1,55 @@
+"""
+Tests for periodic task run locks
+"""
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from apps.tickets.locks import (
+    MemoryTaskLock, get_skipped_runs, reset_task_lock_backends, single_instance, task_lock
+)
+from apps.tickets.tasks import process_ticket_escalations
+
+
+@override_settings(TASK_LOCK_BACKEND='apps.tickets.locks.MemoryTaskLock')
+class TaskLockTestCase(TestCase):
+    """Test the run lock decorator and its memory backend"""
+
+    def setUp(self):
+        reset_task_lock_backends()
+        self.addCleanup(reset_task_lock_backends)
+        cache.clear()
+
+    def test_memory_lock_is_exclusive_until_released_or_expired(self):
+        """Test acquire, token-checked release and expiry"""
+        backend = MemoryTaskLock()
+        self.assertTrue(backend.acquire('job', 'a', 60))
+        self.assertFalse(backend.acquire('job', 'b', 60))
+
+        backend.release('job', 'b')
+        self.assertFalse(backend.acquire('job', 'b', 60))
+        self.assertFalse(backend.renew('job', 'b', 60))
+
+        backend.release('job', 'a')
+        self.assertTrue(backend.acquire('job', 'b', 0))
+        self.assertTrue(backend.acquire('job', 'c', 60))
+
+    def test_overlapping_run_is_skipped_and_counted(self):
+        """Test that a run started while another holds the lock is skipped"""
+        calls = []
+
+        @single_instance('job')
+        def job():
+            calls.append(1)
+            return 'done'
+
+        with task_lock('job') as acquired:
+            self.assertTrue(acquired)
+            self.assertIsNone(job())
+            self.assertIsNone(job())
+
+        self.assertEqual(job(), 'done')
+        self.assertEqual(calls, [1])
+        self.assertEqual(get_skipped_runs(['job'])['job']['count'], 2)
+
+    def test_decorated_task_keeps_its_name(self):
+        """Test that the lock decorator does not change Celery task names"""
+        self.assertEqual(process_ticket_escalations.name, 'apps.tickets.tasks.process_ticket_escalations')
@@ -0,0 +1,51 @@
+"""
+Tests for keyset (cursor) pagination
+"""
+from django.test import TestCase
+from django.urls import reverse
+from apps.companies.models import Company
+from apps.users.models import User
+from apps.tickets.models import Ticket
+from apps.tickets.pagination import CursorPaginator, InvalidCursor
+
+
+class CursorPaginatorTestCase(TestCase):
+    """Test cursor pagination over (updated_at, id)"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='Acme', slug='acme')
+        self.technician = User.objects.create_user(username='tech', password='x', role='TECHNICIAN')
+        for i in range(7):
+            Ticket.objects.create(reference=f'TKT-{i}', title=f'Ticket {i}', description='d', company=self.company)
+        self.ordered_ids = list(Ticket.objects.order_by('-updated_at', '-id').values_list('id', flat=True))
+
+    def test_walks_forward_and_backward(self):
+        """Test that next/previous cursors visit every row exactly once"""
+        paginator = CursorPaginator(Ticket.objects.all(), 3, '-updated_at')
+
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+
+        seen = [t.id for page in (first, second, third) for t in page]
+        self.assertEqual(seen, self.ordered_ids)
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+
+        back = paginator.page(third.previous_cursor)
+        self.assertEqual([t.id for t in back], [t.id for t in second])
+
+    def test_invalid_cursor(self):
+        """Test that a tampered cursor is rejected"""
+        paginator = CursorPaginator(Ticket.objects.all(), 3, '-updated_at')
+        with self.assertRaises(InvalidCursor):
+            paginator.page('not-a-cursor')
+
+    def test_ticket_list_cursor_mode(self):
+        """Test that the ticket list serves cursor pages when requested"""
+        self.client.force_login(self.technician)
+        response = self.client.get(reverse('tickets:ticket_list'), {'pagination': 'cursor', 'per_page': 10})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['page_obj'].is_cursor_page)
+        self.assertEqual([t.id for t in response.context['object_list']], self.ordered_ids)
@@ -0,0 +1,96 @@
+"""
+Tests for the denormalized ticket list columns
+"""
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from apps.companies.models import Company
+from apps.users.models import User
+from apps.tickets.models import Ticket, TicketMessage
+
+
+class TicketReadModelTestCase(TestCase):
+    """Test that list columns follow messages, reassignments and renames"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='Acme', slug='acme')
+        self.employee = User.objects.create_user(username='emp', password='x', company=self.company)
+        self.technician = User.objects.create_user(
+            username='tech', password='x', role='TECHNICIAN', first_name='Ana', last_name='Pérez'
+        )
+        self.ticket = Ticket.objects.create(
+            reference='TKT-00000001', title='Correo', description='d', company=self.company, created_by=self.employee
+        )
+
+    def test_display_fields_on_create_and_reassign(self):
+        """Test company and assignee names are copied and refreshed"""
+        self.assertEqual(self.ticket.company_name, 'Acme')
+        self.assertEqual(self.ticket.assignee_display, '')
+
+        ticket = Ticket.objects.get(pk=self.ticket.pk)
+        ticket.assigned_to = self.technician
+        ticket.save()
+        self.assertEqual(Ticket.objects.get(pk=ticket.pk).assignee_display, 'Ana Pérez')
+
+    def test_renames_propagate(self):
+        """Test that renaming a company or an assignee updates their tickets"""
+        self.ticket.assigned_to = self.technician
+        self.ticket.save()
+
+        self.company.name = 'Acme Corp'
+        self.company.save()
+        self.technician.first_name = 'Ana María'
+        self.technician.save()
+
+        ticket = Ticket.objects.get(pk=self.ticket.pk)
+        self.assertEqual(ticket.company_name, 'Acme Corp')
+        self.assertEqual(ticket.assignee_display, 'Ana María Pérez')
+
+        self.technician.delete()
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).assignee_display, '')
+
+    def test_message_summary(self):
+        """Test that public messages are counted and the last one is tracked"""
+        first = TicketMessage.objects.create(ticket=self.ticket, sender=self.employee, content='Hola')
+        TicketMessage.objects.create(ticket=self.ticket, sender=self.technician, content='Nota interna', private=True)
+        last = TicketMessage.objects.create(ticket=self.ticket, sender=self.technician, content='Revisando')
+
+        ticket = Ticket.objects.get(pk=self.ticket.pk)
+        self.assertEqual(ticket.message_count, 2)
+        self.assertEqual(ticket.last_message_at, last.created_at)
+        self.assertEqual(ticket.last_message_sender, self.technician)
+
+        last.delete()
+        ticket = Ticket.objects.get(pk=self.ticket.pk)
+        self.assertEqual(ticket.message_count, 1)
+        self.assertEqual(ticket.last_message_at, first.created_at)
+        self.assertEqual(ticket.last_message_sender, self.employee)
+
+    def test_reply_through_view_keeps_message_summary(self):
+        """Test that saving the ticket after a reply does not overwrite the message summary"""
+        self.client.force_login(self.employee)
+        response = self.client.post(reverse('tickets:ticket_detail', args=[self.ticket.pk]), {'content': 'Sigue sin funcionar'})
+        self.assertEqual(response.status_code, 302)
+
+        ticket = Ticket.objects.get(pk=self.ticket.pk)
+        message = ticket.messages.get()
+        self.assertIsNotNone(ticket.last_response_at)
+        self.assertEqual(ticket.message_count, 1)
+        self.assertEqual(ticket.last_message_at, message.created_at)
+        self.assertEqual(ticket.last_message_sender, self.employee)
+
+    def test_list_reads_without_joins(self):
+        """Test that the ticket list page query does not join company or users"""
+        self.client.force_login(self.technician)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('tickets:ticket_list'))
+        self.assertContains(response, 'Acme')
+
+        page_queries = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('SELECT "tickets_ticket"."id"') and 'LIMIT' in q['sql']
+        ]
+        self.assertTrue(page_queries)
+        for sql in page_queries:
+            self.assertNotIn('JOIN', sql)
@@ -0,0 +1,305 @@
+"""
+Tests for the ticket search backends
+"""
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from apps.companies.models import Company
+from apps.users.models import User
+from apps.tickets.autocomplete import PrefixIndex, autocomplete_tickets, get_prefix_index, rebuild_prefix_index, reset_prefix_index
+from apps.tickets.filters import TicketFilter
+from apps.tickets.models import Ticket, TicketMessage
+from apps.tickets.search import TicketSearchEngine, get_search_backend
+from apps.tickets.search_cache import CachedSearchResults
+from apps.tickets.fts import fts_index_exists, install_fts_index
+from apps.tickets.search_backends import SQLiteSearchBackend, SQLiteFTSSearchBackend
+
+
+class TicketSearchTestCase(TestCase):
+    """Test that every search path goes through the configured backend"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='Acme', slug='acme')
+        self.user = User.objects.create_user(username='emp', password='x', company=self.company)
+        self.printer = Ticket.objects.create(
+            reference='TKT-AAAA1111', title='Impresora no imprime', description='La impresora del piso 2 falla',
+            company=self.company, created_by=self.user
+        )
+        self.vpn = Ticket.objects.create(
+            reference='TKT-BBBB2222', title='Sin acceso remoto', description='No conecta desde casa',
+            company=self.company, created_by=self.user
+        )
+        TicketMessage.objects.create(ticket=self.vpn, sender=self.user, content='El cliente VPN muestra error 809')
+
+    def test_search_matches_title_and_messages(self):
+        """Test that titles and message content are searchable"""
+        self.assertEqual(list(TicketSearchEngine.search(Ticket.objects.all(), 'impresora')), [self.printer])
+        self.assertEqual(list(TicketSearchEngine.search(Ticket.objects.all(), 'vpn')), [self.vpn])
+
+    def test_filter_uses_search_engine(self):
+        """Test that the list filter returns the same results as the engine"""
+        filterset = TicketFilter(data={'search': 'vpn'}, queryset=Ticket.objects.all())
+        self.assertEqual(list(filterset.qs), [self.vpn])
+
+    @override_settings(TICKET_SEARCH_BACKEND='apps.tickets.search_backends.SQLiteSearchBackend')
+    def test_backend_from_settings(self):
+        """Test that TICKET_SEARCH_BACKEND selects the backend"""
+        self.assertIsInstance(get_search_backend(), SQLiteSearchBackend)
+
+    def test_suggestions_limited_to_queryset(self):
+        """Test that suggestions only come from the given queryset"""
+        suggestions = TicketSearchEngine.get_search_suggestions('impre', queryset=Ticket.objects.exclude(pk=self.printer.pk))
+        self.assertEqual(suggestions, [])
+        suggestions = TicketSearchEngine.get_search_suggestions('impre')
+        self.assertEqual(suggestions, ['Impresora no imprime'])
+
+
+class SQLiteFTSSearchTestCase(TestCase):
+    """Test the FTS5 index and its triggers"""
+
+    def setUp(self):
+        if not fts_index_exists(connection):
+            self.skipTest('Requires the SQLite FTS5 index')
+        self.backend = SQLiteFTSSearchBackend()
+        self.company = Company.objects.create(name='Acme', slug='acme')
+        self.ticket = Ticket.objects.create(
+            reference='TKT-CCCC3333', title='Correo rebota', description='Los correos externos vuelven',
+            company=self.company
+        )
+
+    def search(self, text):
+        return list(self.backend.search(Ticket.objects.all(), text))
+
+    def test_prefix_and_diacritics(self):
+        """Test prefix matching ignoring accents"""
+        Ticket.objects.create(reference='TKT-DDDD4444', title='Configuración de impresión', description='d', company=self.company)
+        self.assertEqual([t.reference for t in self.search('configuracion impr')], ['TKT-DDDD4444'])
+        self.assertEqual(self.search('corr'), [self.ticket])
+
+    def test_triggers_follow_changes(self):
+        """Test that ticket edits and message changes update the index"""
+        self.ticket.title = 'Buzón lleno'
+        self.ticket.save()
+        self.assertEqual(self.search('correo rebota'), [self.ticket])  # descripción
+        self.assertEqual(self.search('buzon'), [self.ticket])
+
+        message = TicketMessage.objects.create(ticket=self.ticket, content='Cuota excedida en Exchange')
+        self.assertEqual(self.search('exchange'), [self.ticket])
+        message.delete()
+        self.assertEqual(self.search('exchange'), [])
+
+        self.ticket.delete()
+        self.assertEqual(self.search('buzon'), [])
+
+    def test_full_save_without_text_changes_skips_trigger(self):
+        """Test that saves that leave reference, title and description unchanged do not reindex"""
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE tickets_ticket_fts SET title = 'Marcador' WHERE rowid = %s", [self.ticket.pk])
+        self.ticket.status = 'IN_PROGRESS'
+        self.ticket.save()
+        self.assertEqual(self.search('marcador'), [self.ticket])
+
+        self.ticket.title = 'Correo rebota siempre'
+        self.ticket.save()
+        self.assertEqual(self.search('marcador'), [])
+
+    def test_rank_prefers_title_matches(self):
+        """Test that BM25 ranks title hits above message hits"""
+        other = Ticket.objects.create(reference='TKT-EEEE5555', title='Pantalla', description='d', company=self.company)
+        TicketMessage.objects.create(ticket=other, content='También falla el correo')
+        self.assertEqual(self.search('correo'), [self.ticket, other])
+
+    def test_reinstall_rebuilds_missing_triggers(self):
+        """Test that a dropped trigger (e.g. after a table rebuild) is restored with a full reindex"""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER tickets_ticket_fts_insert')
+        orphan = Ticket.objects.create(reference='TKT-FFFF6666', title='Teclado', description='d', company=self.company)
+        self.assertEqual(self.search('teclado'), [])
+
+        install_fts_index(connection)
+        self.assertEqual(self.search('teclado'), [orphan])
+
+
+@override_settings(TICKET_SEARCH_CACHE_ENABLED=True)
+class SearchResultCacheTestCase(TestCase):
+    """Test the scope-aware search result cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name='Acme', slug='acme')
+        self.technician = User.objects.create_user(username='tech', password='x', role='TECHNICIAN')
+        self.tickets = [
+            Ticket.objects.create(reference=f'TKT-{i:08X}', title=f'Impresora {i}', description='d', company=self.company)
+            for i in range(5)
+        ]
+
+    def search(self, text, **filters):
+        queryset = Ticket.objects.filter(**filters) if filters else Ticket.objects.all()
+        return TicketSearchEngine.search(queryset, text, user=self.technician, filters=filters)
+
+    def test_repeated_search_served_from_cache(self):
+        """Test that a repeated query only loads the requested slice"""
+        first = self.search('Impresora')
+        self.assertIsInstance(first, CachedSearchResults)
+        self.assertEqual(first.count(), 5)
+
+        with CaptureQueriesContext(connection) as ctx:
+            results = self.search('  impresora ')
+            self.assertEqual(results.count(), 5)
+            page = results[2:4]
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(page, list(first)[2:4])
+
+    @override_settings(TICKET_SEARCH_CACHE_MAX_RESULTS=2)
+    def test_too_large_results_run_the_ranked_query_once(self):
+        """Test that an uncacheable result is remembered and the backend search runs once per request"""
+        backend = get_search_backend()
+        with mock.patch.object(type(backend), 'search', autospec=True, side_effect=type(backend).search) as search:
+            for _ in range(2):
+                search.reset_mock()
+                results = self.search('impresora')
+                self.assertNotIsInstance(results, CachedSearchResults)
+                self.assertEqual(results.count(), 5)
+                self.assertEqual(search.call_count, 1)
+
+    def test_filters_are_part_of_the_key(self):
+        """Test that different active filters do not share results"""
+        self.search('impresora')
+        self.assertEqual(self.search('impresora', status='CLOSED').count(), 0)
+
+    def test_saves_invalidate_scope(self):
+        """Test that saving a ticket or message invalidates cached results on commit"""
+        self.assertEqual(self.search('impresora').count(), 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.objects.create(reference='TKT-0000FFFF', title='Otra impresora', description='d', company=self.company)
+        self.assertEqual(self.search('impresora').count(), 6)
+
+        self.assertEqual(self.search('toner').count(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            TicketMessage.objects.create(ticket=self.tickets[0], content='Falta toner')
+        self.assertEqual(list(self.search('toner')), [self.tickets[0]])
+
+    def test_saves_only_invalidate_affected_company(self):
+        """Test that a change in one company keeps other companies' cached results"""
+        other = Company.objects.create(name='Globex', slug='globex')
+        admin = User.objects.create_user(username='boss', password='x', role='COMPANY_ADMIN', company=self.company)
+        other_admin = User.objects.create_user(username='other', password='x', role='COMPANY_ADMIN', company=other)
+        Ticket.objects.create(reference='TKT-0000EEEE', title='Impresora Globex', description='d', company=other)
+
+        def search(user, company):
+            return TicketSearchEngine.search(Ticket.objects.filter(company=company), 'impresora', user=user)
+
+        search(admin, self.company)
+        search(other_admin, other)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tickets[0].title = 'Impresora atascada'
+            self.tickets[0].save()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(search(other_admin, other).count(), 1)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(search(admin, self.company).count(), 5)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_ticket_list_paginates_cached_results(self):
+        """Test that the list view pages over the cached id list"""
+        self.client.force_login(self.technician)
+        response = self.client.get(reverse('tickets:ticket_list'), {'search': 'impresora', 'per_page': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['paginator'].count, 5)
+        self.assertEqual(len(response.context['object_list']), 5)
+
+
+class AutocompleteTestCase(TestCase):
+    """Test the typeahead endpoint and its indexes"""
+
+    def setUp(self):
+        reset_prefix_index()
+        self.company = Company.objects.create(name='Acme', slug='acme')
+        self.other_company = Company.objects.create(name='Globex', slug='globex')
+        self.admin = User.objects.create_user(username='admin', password='x', role='COMPANY_ADMIN', company=self.company)
+        self.printer = Ticket.objects.create(reference='TKT-AB12CD34', title='Impresión bloqueada', description='d', company=self.company)
+        self.foreign = Ticket.objects.create(reference='TKT-EF56AB78', title='Impresora rota', description='d', company=self.other_company)
+
+    def test_prefix_index(self):
+        """Test prefix lookups over titles and references, ignoring accents"""
+        index = PrefixIndex(Ticket.objects.values_list('id', 'reference', 'title', 'company_id', 'created_by_id'))
+        self.assertEqual([r['id'] for r in index.search('impres')], [self.foreign.id, self.printer.id])
+        self.assertEqual([r['id'] for r in index.search('impresion bloq')], [self.printer.id])
+        self.assertEqual([r['id'] for r in index.search('tkt-ab12')], [self.printer.id])
+        self.assertEqual([r['id'] for r in index.search('impres', ('company', self.company.id))], [self.printer.id])
+
+    def test_endpoint_limited_to_scope(self):
+        """Test that suggestions only include tickets visible to the user"""
+        self.client.force_login(self.admin)
+        for mode in ('memory', 'database'):
+            with self.subTest(mode=mode), override_settings(TICKET_AUTOCOMPLETE_INDEX=mode):
+                response = self.client.get(reverse('tickets:ticket_autocomplete'), {'q': 'impre'})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([r['reference'] for r in response.json()['results']], ['TKT-AB12CD34'])
+
+    def test_memory_index_falls_back_when_too_large(self):
+        """Test that large installs use the database index and the decision is kept across changes"""
+        with override_settings(TICKET_AUTOCOMPLETE_MEMORY_LIMIT=1):
+            self.assertEqual([r['id'] for r in autocomplete_tickets(self.admin, 'impre')], [self.printer.id])
+        self.assertIsNone(get_prefix_index(limit=1))
+
+        Ticket.objects.create(reference='TKT-00000001', title='Otro', description='d', company=self.company)
+        with override_settings(TICKET_AUTOCOMPLETE_MIN_REFRESH=0), self.assertNumQueries(0):
+            self.assertIsNone(get_prefix_index(limit=1))
+
+    @override_settings(TICKET_AUTOCOMPLETE_MIN_REFRESH=0)
+    def test_stale_index_served_while_rebuilding(self):
+        """Test that a stale index is replaced by a background rebuild without blocking the request"""
+        index = get_prefix_index()
+        Ticket.objects.create(reference='TKT-00000002', title='Pantalla', description='d', company=self.company)
+
+        with mock.patch('apps.tickets.autocomplete.threading.Thread') as thread:
+            with self.assertNumQueries(0):
+                self.assertIs(get_prefix_index(), index)
+            self.assertIs(get_prefix_index(), index)
+        thread.assert_called_once()
+
+        rebuild_prefix_index()
+        self.assertEqual([r['reference'] for r in get_prefix_index().search('pantalla')], ['TKT-00000002'])
+
+
+class ExactReferenceTestCase(TestCase):
+    """Test the exact-reference fast path"""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='Acme', slug='acme')
+        self.technician = User.objects.create_user(username='tech', password='x', role='TECHNICIAN')
+        self.employee = User.objects.create_user(username='emp', password='x', company=self.company)
+        self.ticket = Ticket.objects.create(reference='TKT-3F9A1C2B', title='Correo', description='d', company=self.company)
+
+    def test_reference_resolved_by_unique_index(self):
+        """Test that a pasted reference skips ranking"""
+        with CaptureQueriesContext(connection) as ctx:
+            results = list(TicketSearchEngine.search(Ticket.objects.all(), ' tkt-3f9a1c2b '))
+        self.assertEqual(results, [self.ticket])
+        self.assertTrue(all('"reference" = ' in q['sql'] for q in ctx.captured_queries))
+
+    def test_unknown_reference_falls_back_to_ranking(self):
+        """Test that a reference-shaped miss still runs the backend search"""
+        self.assertIsNone(TicketSearchEngine.find_by_reference(Ticket.objects.all(), 'TKT-00000000'))
+        self.assertIsNone(TicketSearchEngine.find_by_reference(Ticket.objects.all(), 'correo'))
+
+    def test_list_redirects_to_detail(self):
+        """Test that the list view redirects on an exact hit within the user's scope"""
+        self.client.force_login(self.technician)
+        response = self.client.get(reverse('tickets:ticket_list'), {'search': 'TKT-3F9A1C2B'})
+        self.assertRedirects(response, self.ticket.get_absolute_url(), fetch_redirect_response=False)
+
+        # Con otros filtros activos se muestra la lista
+        response = self.client.get(reverse('tickets:ticket_list'), {'search': 'TKT-3F9A1C2B', 'status': 'OPEN'})
+        self.assertEqual(response.status_code, 200)
+
+        # Fuera del alcance del usuario no hay redirección
+        self.client.force_login(self.employee)
+        response = self.client.get(reverse('tickets:ticket_list'), {'search': 'TKT-3F9A1C2B'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['object_list']), [])
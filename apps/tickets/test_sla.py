@@ -0,0 +1,147 @@
+"""
+Tests for SLA policies, precomputed due times and batched breach detection
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from django.test import TestCase
+from django.utils import timezone
+from apps.companies.models import Company
+from apps.users.models import User
+from apps.notifications.tasks import check_sla_breaches
+from apps.tickets.escalation_config import reset_escalation_config
+from apps.tickets.models import Ticket, TicketMessage, EscalationSettings, SLAPolicy
+from apps.tickets.sla import compute_sla_due, detect_sla_breaches
+
+
+class SLATestCase(TestCase):
+    """Test SLA due times on tickets and the breach sweep"""
+
+    def setUp(self):
+        reset_escalation_config()
+        self.addCleanup(reset_escalation_config)
+
+        self.company = Company.objects.create(name='Acme', slug='acme')
+        self.employee = User.objects.create_user(username='emp', password='x', company=self.company)
+        self.company_admin = User.objects.create_user(username='boss', password='x', role='COMPANY_ADMIN', company=self.company)
+        self.superadmin = User.objects.create_user(username='root', password='x', role='SUPERADMIN')
+        self.technician = User.objects.create_user(username='tech', password='x', role='TECHNICIAN')
+        SLAPolicy.objects.create(company=None, priority='HIGH', first_response_hours=2, resolution_hours=8, business_hours_only=False)
+
+    def create_ticket(self, reference, priority='HIGH'):
+        return Ticket.objects.create(
+            reference=reference, title=reference, description='d', priority=priority,
+            company=self.company, created_by=self.employee
+        )
+
+    def test_due_times_follow_priority_and_status(self):
+        """Test due times on create, on priority change and sla_due_at on resolve"""
+        ticket = self.create_ticket('TKT-1')
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.first_response_due_at, ticket.created_at + timedelta(hours=2))
+        self.assertEqual(ticket.resolution_due_at, ticket.created_at + timedelta(hours=8))
+        self.assertEqual(ticket.sla_due_at, ticket.first_response_due_at)
+
+        ticket = Ticket.objects.get(pk=ticket.pk)
+        ticket.priority = 'LOW'
+        ticket.save()
+        self.assertIsNone(Ticket.objects.get(pk=ticket.pk).sla_due_at)
+
+        ticket = Ticket.objects.get(pk=ticket.pk)
+        ticket.priority = 'HIGH'
+        ticket.save()
+        ticket = Ticket.objects.get(pk=ticket.pk)
+        ticket.status = 'RESOLVED'
+        ticket.save()
+        ticket.refresh_from_db()
+        self.assertIsNotNone(ticket.resolution_due_at)
+        self.assertIsNone(ticket.sla_due_at)
+
+    def test_technician_reply_counts_as_first_response(self):
+        """Test that only a public technician reply moves the due time to resolution"""
+        ticket = self.create_ticket('TKT-1')
+        TicketMessage.objects.create(ticket=ticket, sender=self.employee, content='¿Novedades?')
+        TicketMessage.objects.create(ticket=ticket, sender=self.technician, content='Nota', private=True)
+        ticket.refresh_from_db()
+        self.assertIsNone(ticket.first_response_at)
+
+        reply = TicketMessage.objects.create(ticket=ticket, sender=self.technician, content='Revisando')
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.first_response_at, reply.created_at)
+        self.assertEqual(ticket.sla_due_at, ticket.resolution_due_at)
+
+    def test_business_hours_policy_uses_company_calendar(self):
+        """Test that business-hours policies skip nights and weekends"""
+        EscalationSettings.objects.create(company=self.company, business_start_hour=9, business_end_hour=17, business_days='1,2,3,4,5')
+        SLAPolicy.objects.create(company=self.company, priority='HIGH', first_response_hours=2, resolution_hours=16)
+        friday = datetime(2026, 10, 16, 16, 0, tzinfo=dt_timezone.utc)
+
+        first_response, resolution = compute_sla_due(Ticket(company=self.company, priority='HIGH', created_at=friday))
+        self.assertEqual(first_response, datetime(2026, 10, 19, 10, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(resolution, datetime(2026, 10, 20, 16, 0, tzinfo=dt_timezone.utc))
+
+    def test_breaches_are_flagged_and_notified_in_batches(self):
+        """Test one UPDATE and one notification dispatch per chunk, one breach per kind and no repeats"""
+        tickets = [self.create_ticket(f'TKT-{i}') for i in range(3)]
+        self.create_ticket('TKT-LATER')
+        Ticket.objects.filter(pk=tickets[0].pk).update(first_response_at=timezone.now())
+        past = timezone.now() - timedelta(minutes=5)
+        Ticket.objects.filter(pk__in=[ticket.pk for ticket in tickets]).update(
+            first_response_due_at=past, resolution_due_at=past, sla_due_at=past
+        )
+
+        with mock.patch('apps.notifications.tasks.create_notifications_batch.delay') as notify, \
+                mock.patch('apps.notifications.tasks.send_email_notification_async.delay') as email:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(detect_sla_breaches(batch_size=2), 5)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(check_sla_breaches(), 'Detectados 0 incumplimientos de SLA')
+
+        self.assertEqual(notify.call_count, 2)
+        self.assertEqual(email.call_count, 2)
+        notifications = [item for call in notify.call_args_list for item in call.args[0]]
+        self.assertEqual({item['recipient_id'] for item in notifications}, {self.superadmin.id, self.company_admin.id})
+        self.assertEqual(len(notifications), 10)
+
+        kinds = {}
+        for call in email.call_args_list:
+            for breach in call.kwargs['breaches']:
+                kinds.setdefault(breach['ticket_id'], set()).add(breach['sla_info']['kind'])
+        self.assertEqual(kinds[tickets[0].pk], {'resolution'})
+        self.assertEqual(kinds[tickets[1].pk], {'first_response', 'resolution'})
+
+        self.assertEqual(Ticket.objects.filter(sla_breached=True, sla_due_at__isnull=True).count(), 3)
+        self.assertFalse(Ticket.objects.get(reference='TKT-LATER').sla_breached)
+
+    def test_first_response_breach_keeps_resolution_pending(self):
+        """Test that a first response breach moves to the resolution due time, and a stale save keeps it"""
+        ticket = self.create_ticket('TKT-1')
+        now = timezone.now()
+        Ticket.objects.filter(pk=ticket.pk).update(
+            first_response_due_at=now - timedelta(minutes=5), resolution_due_at=now + timedelta(hours=1),
+            sla_due_at=now - timedelta(minutes=5)
+        )
+        stale = Ticket.objects.get(pk=ticket.pk)
+
+        with mock.patch('apps.notifications.tasks.create_notifications_batch.delay'), \
+                mock.patch('apps.notifications.tasks.send_email_notification_async.delay') as email:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(detect_sla_breaches(now=now), 1)
+            ticket.refresh_from_db()
+            self.assertEqual(ticket.sla_due_at, ticket.resolution_due_at)
+            self.assertEqual(ticket.first_response_breached_at, now)
+
+            stale.title = 'Editado'
+            stale.save()
+            ticket.refresh_from_db()
+            self.assertTrue(ticket.sla_breached)
+            self.assertEqual(ticket.sla_due_at, ticket.resolution_due_at)
+
+            later = now + timedelta(hours=2)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(detect_sla_breaches(now=later), 1)
+
+        kinds = [breach['sla_info']['kind'] for call in email.call_args_list for breach in call.kwargs['breaches']]
+        self.assertEqual(kinds, ['first_response', 'resolution'])
+        ticket.refresh_from_db()
+        self.assertEqual((ticket.sla_breached_at, ticket.resolution_breached_at), (now, later))
+        self.assertIsNone(ticket.sla_due_at)
@@ -0,0 +1,65 @@
+"""
+Tests for ticket list statistics (single aggregate query and cached counters)
+"""
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from apps.companies.models import Company
+from apps.users.models import User
+from apps.tickets.models import Ticket
+from apps.tickets.stats import aggregate_ticket_stats, get_ticket_stats
+
+
+class TicketStatsTestCase(TestCase):
+    """Test that list statistics are computed correctly and cheaply"""
+
+    def setUp(self):
+        cache.clear()
+        self.company = Company.objects.create(name='Acme', slug='acme')
+        self.employee = User.objects.create_user(username='emp', password='x', company=self.company)
+        self.technician = User.objects.create_user(username='tech', password='x', role='TECHNICIAN')
+        for i, (status, priority) in enumerate([('OPEN', 'HIGH'), ('OPEN', 'LOW'), ('CLOSED', 'HIGH')]):
+            Ticket.objects.create(
+                reference=f'TKT-{i}', title=f'Ticket {i}', description='d',
+                status=status, priority=priority, company=self.company, created_by=self.employee
+            )
+
+    def test_aggregate_uses_single_query(self):
+        """Test that all counters come from one query"""
+        with CaptureQueriesContext(connection) as ctx:
+            stats = aggregate_ticket_stats(Ticket.objects.all())
+
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(stats['total_count'], 3)
+        self.assertEqual(stats['open_count'], 2)
+        self.assertEqual(stats['closed_count'], 1)
+        self.assertEqual(stats['high_priority_count'], 2)
+
+    @override_settings(TICKET_STATS_CACHE_ENABLED=True)
+    def test_cached_counters_follow_saves_and_deletes(self):
+        """Test that cached counters are kept up to date by ticket signals"""
+        get_ticket_stats(self.technician, Ticket.objects.all())
+
+        ticket = Ticket.objects.get(reference='TKT-1')
+        ticket.status = 'RESOLVED'
+        ticket.save()
+        Ticket.objects.get(reference='TKT-2').delete()
+
+        with CaptureQueriesContext(connection) as ctx:
+            stats = get_ticket_stats(self.technician, Ticket.objects.all())
+
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(stats, aggregate_ticket_stats(Ticket.objects.all()))
+
+    @override_settings(TICKET_STATS_CACHE_ENABLED=True)
+    def test_cached_counters_are_scoped(self):
+        """Test that employee counters only include their own tickets"""
+        other = User.objects.create_user(username='other', password='x', company=self.company)
+        Ticket.objects.create(reference='TKT-9', title='Other', description='d', company=self.company, created_by=other)
+
+        stats = get_ticket_stats(other, Ticket.objects.filter(created_by=other))
+        self.assertEqual(stats['total_count'], 1)
+
+        stats = get_ticket_stats(self.technician, Ticket.objects.all())
+        self.assertEqual(stats['total_count'], 4)
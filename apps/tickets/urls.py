@@ -2,6 +2,7 @@ from django.urls import path
 from .views import (
     TicketListView, TicketDetailView, TicketCreateView, TicketEditView, 
     ticket_close, ticket_reopen, ticket_set_in_progress, save_filter, load_filter, delete_filter, clear_filters,
+    ticket_autocomplete,
     pause_escalation, resume_escalation_view, escalation_history
 )
 from .admin_views import (
@@ -9,7 +10,7 @@ from .admin_views import (
     EscalationRuleUpdateView, EscalationRuleDeleteView, EscalationSettingsListView,
     EscalationSettingsCreateView, EscalationSettingsUpdateView, EscalationLogDetailView,
     EscalationReportView, escalation_stats_api, toggle_escalation_rule, bulk_escalation_actions,
-    EmailTestView  # Agregando import para vista de pruebas de email
+    EscalationSimulationView, EmailTestView  # Agregando import para vista de pruebas de email
 )
 
 app_name = 'tickets'
@@ -17,6 +18,7 @@ app_name = 'tickets'
 urlpatterns = [
     path('', TicketListView.as_view(), name='ticket_list'),
     path('create/', TicketCreateView.as_view(), name='ticket_create'),
+    path('autocomplete/', ticket_autocomplete, name='ticket_autocomplete'),
     path('<int:pk>/', TicketDetailView.as_view(), name='ticket_detail'),
     path('<int:pk>/edit/', TicketEditView.as_view(), name='ticket_edit'),
     path('<int:pk>/close/', ticket_close, name='ticket_close'),
@@ -44,5 +46,6 @@ urlpatterns = [
     path('admin/escalation/reports/', EscalationReportView.as_view(), name='admin_escalation_reports'),
     path('admin/escalation/stats/', escalation_stats_api, name='admin_escalation_stats'),
     path('admin/escalation/bulk-actions/', bulk_escalation_actions, name='admin_escalation_bulk_actions'),
+    path('admin/escalation/simulation/', EscalationSimulationView.as_view(), name='admin_escalation_simulation'),
     path('admin/email-test/', EmailTestView.as_view(), name='admin_email_test'),
 ]
@@ -1,6 +1,7 @@
 from django.views.generic import ListView, DetailView, CreateView, UpdateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import redirect, get_object_or_404
+from django.urls import reverse
 from django.core.exceptions import PermissionDenied
 from django.contrib import messages
 from django.http import JsonResponse
@@ -11,6 +12,10 @@ from django.utils.decorators import method_decorator
 from django_filters.views import FilterView
 from .models import Ticket, TicketMessage, TicketAttachment, SavedFilter, EscalationLog
 from .filters import TicketFilter
+from .stats import get_ticket_stats
+from .pagination import CursorPaginationMixin
+from .autocomplete import autocomplete_tickets
+from .search import TicketSearchEngine
 from apps.notifications.utils import notify_ticket_created, notify_ticket_updated, notify_ticket_resolved, notify_message_added
 from .tasks import resume_escalation, pause_escalation_on_response
 from django import forms
@@ -27,18 +32,20 @@ class TicketForm(forms.ModelForm):
 def generate_reference():
     return 'TKT-' + uuid.uuid4().hex[:8].upper()
 
-class TicketListView(LoginRequiredMixin, FilterView):
+class TicketListView(LoginRequiredMixin, CursorPaginationMixin, FilterView):
     model = Ticket
     template_name = 'tickets/ticket_list.html'
     login_url = '/users/login/'
     filterset_class = TicketFilter
     paginate_by = 20
+    cursor_ordering = '-updated_at'
     # Valores permitidos para items por página
     paginate_options = [10, 20, 50, 100]
     
     def get_queryset(self):
         user = self.request.user
-        qs = Ticket.objects.select_related('company','created_by','assigned_to')
+        # Los nombres de empresa y asignado se leen de las columnas desnormalizadas, sin joins
+        qs = Ticket.objects.defer('description', 'search_document')
         
         if user.is_superadmin():
             # SUPERADMIN: Ve todos los tickets de todas las empresas
@@ -60,6 +67,15 @@ class TicketListView(LoginRequiredMixin, FilterView):
         kwargs['request'] = self.request
         return kwargs
 
+    def get(self, request, *args, **kwargs):
+        # Si solo se buscó una referencia exacta, ir directo al detalle del ticket
+        params = {key for key in request.GET if request.GET.get(key)} - {'page', 'per_page'}
+        if params == {'search'}:
+            exact = TicketSearchEngine.find_by_reference(self.get_queryset(), request.GET['search'])
+            if exact is not None:
+                return redirect(exact.get().get_absolute_url())
+        return super().get(request, *args, **kwargs)
+
     def get_paginate_by(self, queryset):
         """Permitir cambiar el tamaño de página con ?per_page=<n> (validado).
 
@@ -83,14 +99,8 @@ class TicketListView(LoginRequiredMixin, FilterView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Agregar estadísticas
-        queryset = self.get_queryset()
-        context['total_count'] = queryset.count()
-        context['open_count'] = queryset.filter(status='OPEN').count()
-        context['in_progress_count'] = queryset.filter(status='IN_PROGRESS').count()
-        context['resolved_count'] = queryset.filter(status='RESOLVED').count()
-        context['closed_count'] = queryset.filter(status='CLOSED').count()
-        context['high_priority_count'] = queryset.filter(priority='HIGH').count()
+        # Agregar estadísticas (una sola consulta agregada o contadores en caché)
+        context.update(get_ticket_stats(self.request.user, self.get_queryset()))
         
         # Agregar filtros guardados del usuario
         context['saved_filters'] = SavedFilter.objects.filter(user=self.request.user)
@@ -178,6 +188,27 @@ def clear_filters(request):
     messages.info(request, 'Filtros limpiados.')
     return redirect('tickets:ticket_list')
 
+@login_required
+def ticket_autocomplete(request):
+    """Sugerencias de tickets por título o referencia mientras el usuario escribe (JSON)"""
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 5)), 10))
+    except (TypeError, ValueError):
+        limit = 5
+    
+    suggestions = autocomplete_tickets(request.user, request.GET.get('q', ''), limit)
+    return JsonResponse({
+        'results': [
+            {
+                'id': row['id'],
+                'reference': row['reference'],
+                'title': row['title'],
+                'url': reverse('tickets:ticket_detail', args=[row['id']]),
+            }
+            for row in suggestions
+        ]
+    })
+
 class TicketDetailView(LoginRequiredMixin, DetailView):
     model = Ticket
     template_name = 'tickets/ticket_detail.html'
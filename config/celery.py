@@ -20,16 +20,23 @@ app.conf.beat_schedule = {
         'task': 'apps.notifications.tasks.cleanup_old_notifications',
         'schedule': 86400.0,  # Run daily (24 hours)
     },
+    'reconcile-unread-notification-counts': {
+        'task': 'apps.notifications.tasks.reconcile_unread_notification_counts',
+        'schedule': 3600.0,  # Run every hour
+        'options': {'expires': 1800}  # Expire after 30 minutes if not executed
+    },
     'send-daily-summary': {
         'task': 'apps.notifications.tasks.send_daily_summary',
         'schedule': 86400.0,  # Run daily
         'options': {'expires': 3600}  # Expire after 1 hour if not executed
     },
+    # Safety net: on-time escalations are fired by dispatch_due_escalations (apps/tickets/scheduler.py)
     'process-ticket-escalations': {
         'task': 'apps.tickets.tasks.process_ticket_escalations',
         'schedule': 900.0,  # Run every 15 minutes
         'options': {'expires': 600}  # Expire after 10 minutes if not executed
     },
+    # Reconciliation sweep in bounded batches; new tickets are scheduled individually
     'update-escalation-times': {
         'task': 'apps.tickets.tasks.update_ticket_escalation_times',
         'schedule': 3600.0,  # Run every hour
@@ -42,7 +49,7 @@ app.conf.beat_schedule = {
     },
     'send-escalation-warnings': {
         'task': 'apps.notifications.tasks.send_escalation_warnings',
-        'schedule': 1800.0,  # Run every 30 minutes
+        'schedule': float(getattr(settings, 'ESCALATION_WARNING_INTERVAL', 1800)),  # Every 30 minutes by default; the sweep looks ahead by this interval
         'options': {'expires': 900}  # Expire after 15 minutes if not executed
     },
     'send-escalation-summary-reports': {
@@ -92,6 +92,66 @@ CHANNEL_LAYERS = {
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# Caché compartida entre procesos (contadores de tickets, etc.)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('CACHE_URL', 'redis://localhost:6379/2'),
+    }
+} if not DEBUG else {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Contadores de estadísticas de la lista de tickets mantenidos en caché por alcance
+TICKET_STATS_CACHE_ENABLED = os.environ.get('TICKET_STATS_CACHE_ENABLED', 'False').lower() == 'true'
+TICKET_STATS_CACHE_TIMEOUT = int(os.environ.get('TICKET_STATS_CACHE_TIMEOUT', '3600'))  # Recalcular cada hora como máximo
+
+# Búsqueda de tickets: ruta del backend (vacío = el primero disponible para la base de datos)
+TICKET_SEARCH_BACKEND = os.environ.get('TICKET_SEARCH_BACKEND', '')
+
+# Caché de resultados de búsqueda (ids ordenados) por consulta, alcance y filtros activos
+TICKET_SEARCH_CACHE_ENABLED = os.environ.get('TICKET_SEARCH_CACHE_ENABLED', 'False').lower() == 'true'
+TICKET_SEARCH_CACHE_TIMEOUT = int(os.environ.get('TICKET_SEARCH_CACHE_TIMEOUT', '300'))
+TICKET_SEARCH_CACHE_MAX_RESULTS = int(os.environ.get('TICKET_SEARCH_CACHE_MAX_RESULTS', '1000'))  # Resultados mayores no se cachean
+
+# Autocompletado: 'auto' (índice en memoria hasta TICKET_AUTOCOMPLETE_MEMORY_LIMIT tickets), 'memory' o 'database'
+TICKET_AUTOCOMPLETE_INDEX = os.environ.get('TICKET_AUTOCOMPLETE_INDEX', 'auto')
+TICKET_AUTOCOMPLETE_MEMORY_LIMIT = int(os.environ.get('TICKET_AUTOCOMPLETE_MEMORY_LIMIT', '20000'))
+TICKET_AUTOCOMPLETE_REFRESH = int(os.environ.get('TICKET_AUTOCOMPLETE_REFRESH', '60'))  # Segundos entre reconstrucciones
+TICKET_AUTOCOMPLETE_MIN_REFRESH = int(os.environ.get('TICKET_AUTOCOMPLETE_MIN_REFRESH', '5'))  # Mínimo tras un cambio
+TICKET_AUTOCOMPLETE_SIZE_RECHECK = int(os.environ.get('TICKET_AUTOCOMPLETE_SIZE_RECHECK', '3600'))  # Segundos hasta revisar si la instalación sigue siendo grande
+TICKET_AUTOCOMPLETE_BACKGROUND_REFRESH = os.environ.get('TICKET_AUTOCOMPLETE_BACKGROUND_REFRESH', 'True').lower() == 'true'  # Reconstruir en un hilo
+
+# Escalamiento: tickets procesados por bloque (una actualización masiva y una tarea de notificaciones por bloque)
+ESCALATION_BATCH_SIZE = int(os.environ.get('ESCALATION_BATCH_SIZE', '500'))
+ESCALATION_SWEEP_MAX_BATCHES = int(os.environ.get('ESCALATION_SWEEP_MAX_BATCHES', '20'))  # Bloques por ejecución del barrido de conciliación
+
+# Escalamiento en paralelo: una partición por empresa repartida entre los workers (chord de Celery)
+ESCALATION_FANOUT_ENABLED = os.environ.get('ESCALATION_FANOUT_ENABLED', 'False').lower() == 'true'
+ESCALATION_PARTITION_LEASE = int(os.environ.get('ESCALATION_PARTITION_LEASE', '600'))  # Segundos
+
+# Planificador de vencimientos de escalamiento: ruta de la clase (ver apps/tickets/scheduler.py)
+ESCALATION_SCHEDULER_BACKEND = os.environ.get('ESCALATION_SCHEDULER_BACKEND', 'apps.tickets.scheduler.DatabaseDeadlineScheduler')
+ESCALATION_SCHEDULER_REDIS_URL = os.environ.get('ESCALATION_SCHEDULER_REDIS_URL', 'redis://localhost:6379/3')
+
+# Advertencias previas al escalamiento (la antelación se define en cada regla, warning_minutes)
+ESCALATION_WARNINGS_ENABLED = os.environ.get('ESCALATION_WARNINGS_ENABLED', 'True').lower() == 'true'
+ESCALATION_WARNING_INTERVAL = int(os.environ.get('ESCALATION_WARNING_INTERVAL', '1800'))  # Segundos entre barridos de advertencias
+
+# Segundos entre consultas a la versión compartida de la configuración de escalamiento compilada
+ESCALATION_CONFIG_CHECK_INTERVAL = int(os.environ.get('ESCALATION_CONFIG_CHECK_INTERVAL', '5'))
+
+# SLA: tickets incumplidos procesados por bloque (una actualización masiva y un envío de notificaciones por bloque)
+SLA_BATCH_SIZE = int(os.environ.get('SLA_BATCH_SIZE', '500'))
+
+# Notificaciones: contadores de no leídas comparados con el conteo real por bloque en la conciliación periódica
+NOTIFICATION_RECONCILE_BATCH_SIZE = int(os.environ.get('NOTIFICATION_RECONCILE_BATCH_SIZE', '1000'))
+
+# Paginación de listas grandes: 'offset' (páginas numeradas) o 'cursor' (keyset, sin COUNT)
+LIST_PAGINATION_MODE = os.environ.get('LIST_PAGINATION_MODE', 'offset')
+
 if DEBUG:
     # 👨‍💻 Modo desarrollo → SQLite
     DATABASES = {
@@ -163,6 +223,14 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
+# Locks de tareas periódicas (apps/tickets/locks.py): ruta del backend y TTL renovable en segundos
+TASK_LOCK_BACKEND = os.environ.get(
+    'TASK_LOCK_BACKEND',
+    'apps.tickets.locks.RedisTaskLock' if not DEBUG else 'apps.tickets.locks.MemoryTaskLock'
+)
+TASK_LOCK_REDIS_URL = os.environ.get('TASK_LOCK_REDIS_URL', 'redis://localhost:6379/3')
+TASK_LOCK_TTL = int(os.environ.get('TASK_LOCK_TTL', '300'))
+
 # Email configuration
 EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.hostinger.com')